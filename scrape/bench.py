@@ -0,0 +1,203 @@
+# scrape/bench.py
+# Benchmark the migration and the stat scripts on synthetic data at several scales.
+#
+# For every scale the synthetic JSON and database are generated once into
+# bench_data/scale-<N> (see synthetic.py) and every stage is run as its own
+# process, so wall time and peak RSS are measured per stage. Each measurement is
+# appended to bench_results.jsonl together with the current git commit, so runs
+# on different commits can be compared with --compare.
+#
+#   python bench.py --scales 1 10 --stages to_csv judgeLike
+#   python bench.py --compare
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import synthetic
+
+# --- Configuration ---
+SCRAPE_DIR = Path(__file__).resolve().parent
+STAT_DIR = SCRAPE_DIR.parent / "stat"
+DATA_DIR = SCRAPE_DIR / "bench_data"
+RESULTS_FILE = SCRAPE_DIR / "bench_results.jsonl"
+STAGES = ("generate", "migrate", "to_csv", "judgeLike", "historical")
+# --- End Configuration ---
+
+
+def git_revision() -> dict:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=SCRAPE_DIR, capture_output=True, text=True).stdout.strip()
+
+    return {"commit": git("rev-parse", "--short", "HEAD") or None, "dirty": bool(git("status", "--porcelain"))}
+
+
+def run_process(command, cwd, report=None, env=None) -> dict:
+    """
+    Run one stage in a child process and measure it.
+
+    os.wait4 gives the resource usage of exactly this child, so the peak RSS
+    is not mixed up with earlier stages.
+    """
+    if report is not None:
+        command = [*command, "--report", str(report)]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = process.stderr.read()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    measurement = {
+        "wall_seconds": wall,
+        "cpu_seconds": usage.ru_utime + usage.ru_stime,
+        "peak_rss_mb": usage.ru_maxrss / scale,
+        "returncode": process.returncode,
+    }
+    if process.returncode != 0:
+        measurement["error"] = stderr.decode(errors="replace").strip().splitlines()[-5:]
+    if report is not None and Path(report).exists():
+        with open(report) as f:
+            run_report = json.load(f)
+        measurement["stages"] = {name: stage["seconds"] for name, stage in run_report["stages"].items()}
+        measurement["statements"] = run_report["statements"]
+    return measurement
+
+
+def prepare_data(scale: float, seed: int, regenerate: bool = False) -> tuple[Path, dict]:
+    """Generate the JSON files and database for a scale unless they already exist."""
+    out = DATA_DIR / f"scale-{scale:g}-seed-{seed}"
+    if regenerate and out.exists():
+        shutil.rmtree(out)
+    if (out / "dev.db").exists() and (out / "competition_data").exists():
+        return out, None
+    measurement = run_process(
+        [sys.executable, "synthetic.py", "--scale", str(scale), "--seed", str(seed),
+         "--out", str(out), "--json", "--db"],
+        cwd=SCRAPE_DIR,
+    )
+    return out, measurement
+
+
+def run_stage(stage: str, data: Path, work: Path) -> dict:
+    """Run one benchmark stage against the prepared data in a scratch directory."""
+    report = work / f"{stage}-report.json"
+    env = dict(os.environ, MPLBACKEND="Agg")  # historical.py must not open a window
+
+    if stage == "migrate":
+        db_file = work / "migrated.db"
+        synthetic.create_schema(db_file).close()
+        return run_process(
+            [sys.executable, "migrate.py", "--data-dir", str(data / "competition_data"), "--db", str(db_file)],
+            cwd=SCRAPE_DIR, report=report, env=env,
+        )
+    if stage == "to_csv":
+        return run_process([sys.executable, str(STAT_DIR / "to_csv.py")], cwd=work, report=report, env=env)
+    if stage == "judgeLike":
+        if not (work / "csv").exists():
+            run_process([sys.executable, str(STAT_DIR / "to_csv.py")], cwd=work)
+        return run_process([sys.executable, str(STAT_DIR / "judgeLike.py")], cwd=work, report=report, env=env)
+    if stage == "historical":
+        return run_process([sys.executable, str(STAT_DIR / "historical.py")], cwd=work, report=report, env=env)
+    raise ValueError(f"Unknown stage '{stage}'")
+
+
+def record(result: dict, results_file: Path) -> None:
+    with open(results_file, "a") as f:
+        f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+def load_results(results_file: Path) -> list[dict]:
+    if not results_file.exists():
+        return []
+    with open(results_file) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(results_file: Path) -> None:
+    """Print the latest measurement of every (scale, stage) next to the one from the previous commit."""
+    latest, previous = {}, {}
+    for result in load_results(results_file):
+        key = (result["scale"], result["stage"])
+        if key in latest and latest[key]["commit"] != result["commit"]:
+            previous[key] = latest[key]
+        latest[key] = result
+
+    print(f"{'scale':>6}  {'stage':<12} {'commit':<10} {'wall s':>9} {'RSS MB':>8}   {'prev commit':<11} {'wall s':>9} {'change':>8}")
+    for key in sorted(latest):
+        now = latest[key]
+        line = (f"{now['scale']:>6g}  {now['stage']:<12} {str(now['commit']):<10} "
+                f"{now['wall_seconds']:>9.2f} {now['peak_rss_mb']:>8.0f}")
+        before = previous.get(key)
+        if before is not None:
+            change = (now["wall_seconds"] - before["wall_seconds"]) / before["wall_seconds"] * 100
+            line += f"   {str(before['commit']):<11} {before['wall_seconds']:>9.2f} {change:>+7.1f}%"
+        print(line)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic data.")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0],
+                        help="Multiples of the real archive size to benchmark (default: 1).")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES),
+                        help="Stages to run (default: all).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data (default: 0).")
+    parser.add_argument("--regenerate", action="store_true", help="Regenerate cached synthetic data.")
+    parser.add_argument("--results", default=str(RESULTS_FILE),
+                        help=f"File the measurements are appended to (default: {RESULTS_FILE}).")
+    parser.add_argument("--compare", action="store_true",
+                        help="Only compare the recorded results, do not run anything.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results_file = Path(args.results)
+    if args.compare:
+        compare(results_file)
+        return
+
+    revision = git_revision()
+    for scale in args.scales:
+        data, generated = prepare_data(scale, args.seed, args.regenerate or "generate" in args.stages)
+        runs = []
+        if generated is not None and "generate" in args.stages:
+            runs.append(("generate", generated))
+
+        work = data / "work"
+        for stage in args.stages:
+            if stage == "generate":
+                continue
+            if work.exists():
+                shutil.rmtree(work)
+            work.mkdir(parents=True)
+            shutil.copy(data / "dev.db", work / "dev.db")
+            runs.append((stage, run_stage(stage, data, work)))
+        shutil.rmtree(work, ignore_errors=True)
+
+        for stage, measurement in runs:
+            result = {
+                **revision,
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "scale": scale,
+                "seed": args.seed,
+                "stage": stage,
+                **measurement,
+            }
+            record(result, results_file)
+            status = "ok" if measurement["returncode"] == 0 else f"failed ({measurement['returncode']})"
+            print(f"scale {scale:g} {stage:<12} {measurement['wall_seconds']:8.2f}s "
+                  f"{measurement['peak_rss_mb']:7.0f} MB  {status}")
+            for line in measurement.get("error", []):
+                print(f"    {line}")
+
+
+if __name__ == "__main__":
+    main()
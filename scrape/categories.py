@@ -0,0 +1,298 @@
+# scrape/categories.py
+# Parse the dance category encoded in a competition title into structured columns.
+#
+# Titles look like "VII. Eraklin Kupa - Ifjúsági E Standard 2017.12.09": the meeting
+# name, then the category (age group, class, style) and the date. The category may
+# itself be split into dash segments ("Kupa - Junior II. - C Standard"), so every
+# segment after the meeting name is searched, the last one first.
+# migrate.py stores the parsed values on Event at ingest time; run
+# `python categories.py --backfill` once to fill them in on an existing dev.db.
+import argparse
+import re
+import sqlite3
+from pathlib import Path
+
+# --- Configuration ---
+DB_FILE = Path(__file__).parent / "dev.db"
+CATEGORY_COLUMNS = ("ageGroup", "danceClass", "style", "date")
+# Same name Prisma generates for @@index([ageGroup, danceClass, style, date])
+INDEX_NAME = "Event_ageGroup_danceClass_style_date_idx"
+DATE_INDEX_NAME = "Event_date_idx"
+# --- End Configuration ---
+
+DATE_RE = re.compile(r"(\d{4})\.(\d{2})\.(\d{2})")
+
+AGE_WORDS = {
+    "gyermek": "Gyermek",
+    "junior": "Junior",
+    "ifjúsági": "Ifjúsági",
+    "felnőtt": "Felnőtt",
+    "senior": "Senior",
+    "u21": "U21",
+    # WDSF titles are in English
+    "youth": "Ifjúsági",
+    "adult": "Felnőtt",
+}
+AGE_WORD = "(?:" + "|".join(AGE_WORDS) + ")"
+ROMAN = r"(?:IV|III|II|I)"
+# "Junior II", "Gyermek I-II", "Ifjúsági-Felnőtt", "Gyermek II-Junior I"
+AGE_RE = re.compile(
+    rf"\b(?P<age>{AGE_WORD}(?:\s+{ROMAN}\b)?(?:\s*-\s*{ROMAN}\b)?(?:-{AGE_WORD}(?:\s+{ROMAN}\b)?)?)",
+    re.IGNORECASE,
+)
+CLASS_RE = re.compile(r"(?<![\w-])(?P<cls>[EDCBAS]|Open|Kezdő|Haladó|Közép-Haladó)(?![\w-])")
+
+STYLES = {
+    "standard": "Standard",
+    "lat": "Latin",
+    "latin": "Latin",
+    "tíztánc": "Tíztánc",
+    "stt": "STT",
+    "hattánc": "Hattánc",
+    "nyolctánc": "Nyolctánc",
+    "6t": "Hattánc",
+    "8t": "Nyolctánc",
+}
+STYLE_RE = re.compile(r"(?<![\w])(" + "|".join(STYLES) + r")(?![\w])", re.IGNORECASE)
+
+# Short forms such as "F-B-LAT", "J2-E-STT", "JN1-E-LAT", "FLN-D-LAT" or "F-OPEN-LAT"
+SHORT_AGE = {"GY": "Gyermek", "J": "Junior", "JN": "Junior", "I": "Ifjúsági", "F": "Felnőtt", "FLN": "Felnőtt",
+             "S": "Senior"}
+SHORT_RE = re.compile(
+    r"^(?P<age>GY|JN|J|I|FLN|F|S)(?P<level>[1-4])?-(?P<cls>[EDCBAS]|OPEN)-(?P<style>\w+)$", re.IGNORECASE
+)
+SHORT_LEVELS = {"1": "I", "2": "II", "3": "III", "4": "IV"}
+# An age range split by a spaced dash, "Gyermek I - II" or "Gyermek II - Junior I"
+SPACED_AGE_RANGE_RE = re.compile(rf"\b({AGE_WORD}(?:\s+{ROMAN})?)\s+-\s+({ROMAN}|{AGE_WORD})\b", re.IGNORECASE)
+
+# Titles from the archive and what --check expects them to parse into
+CHECK_TITLES = {
+    "VII. Eraklin Kupa - Ifjúsági E Standard 2017.12.09": ("Ifjúsági", "E", "Standard", "2017.12.09"),
+    "Kupa - Junior II. - C Standard 2019.01.01": ("Junior II", "C", "Standard", "2019.01.01"),
+    "Meeting - Felnőtt - D LAT": ("Felnőtt", "D", "Latin", None),
+    'Kupa - "Gyermek I-II" E Latin 2018.03.10': ("Gyermek I-II", "E", "Latin", "2018.03.10"),
+    "Kupa - Gyermek I - II E Latin": ("Gyermek I-II", "E", "Latin", None),
+    "Kupa - Gyermek II-Junior I D STT": ("Gyermek II-Junior I", "D", "STT", None),
+    "WDSF OPEN STANDARD SENIOR III 2020.01.01": ("Senior III", None, "Standard", "2020.01.01"),
+    "Kupa - F-B-LAT 2016.05.01": ("Felnőtt", "B", "Latin", "2016.05.01"),
+    "Kupa - J2-E-STT": ("Junior II", "E", "STT", None),
+    "Kupa - JN1-E-LAT": ("Junior I", "E", "Latin", None),
+    "Kupa - FLN-D-LAT": ("Felnőtt", "D", "Latin", None),
+    "Kupa - F-OPEN-LAT": ("Felnőtt", "Open", "Latin", None),
+    "Kupa - Senior - Open Standard 0000.00.00": ("Senior", "Open", "Standard", None),
+}
+
+
+def clean_category(text: str) -> str:
+    """Normalise the spelling variants seen in the archive."""
+    text = text.replace("õ", "ő").replace("û", "ű")
+    text = text.replace('"', " ")
+    text = re.sub(r"\bGyerek\b", "Gyermek", text)
+    # "Junior II." -> "Junior II"
+    text = re.sub(rf"\b({ROMAN})\.", r"\1", text)
+    # "Junior-II-Ifjúsági" -> "Junior II-Ifjúsági"
+    text = re.sub(rf"\b({AGE_WORD})-({ROMAN})\b", r"\1 \2", text, flags=re.IGNORECASE)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def canonical_age_group(text: str) -> str:
+    """Normalise case, language and spacing of a matched age group ("JUNIOR II" -> "Junior II")."""
+    text = re.sub(r"\s*-\s*", "-", text)
+    return re.sub(
+        r"[^\s-]+",
+        lambda word: AGE_WORDS.get(word.group(0).lower(), word.group(0).upper()),
+        text,
+    )
+
+
+def parse_date(title: str):
+    """Return the yyyy.mm.dd date of a title, or None for missing/placeholder dates."""
+    match = DATE_RE.search(title or "")
+    if not match or match.group(1) == "0000":
+        return None
+    return match.group(0)
+
+
+def parse_title(title: str) -> dict:
+    """
+    Parse age group, class, style and date out of a competition title.
+
+    Args:
+        title: Competition or event title as scraped
+
+    Returns:
+        Dictionary with the keys of CATEGORY_COLUMNS, values are None when
+        the title does not contain that part
+    """
+    parsed = {"ageGroup": None, "danceClass": None, "style": None, "date": parse_date(title)}
+    category = SPACED_AGE_RANGE_RE.sub(r"\1-\2", DATE_RE.sub("", title or "").strip())
+    segments = category.split(" - ")
+    if len(segments) > 1:
+        # The first segment is the meeting name
+        segments = segments[1:]
+
+    # The last segment wins, earlier ones only fill in what it lacks
+    for segment in reversed(segments):
+        for column, value in parse_segment(clean_category(segment)).items():
+            if parsed[column] is None:
+                parsed[column] = value
+    return parsed
+
+
+def parse_segment(category: str) -> dict:
+    """Age group, class and style of one dash segment of a title, None where missing."""
+    parsed = {"ageGroup": None, "danceClass": None, "style": None}
+
+    short = SHORT_RE.match(category)
+    if short:
+        parsed["ageGroup"] = SHORT_AGE[short.group("age").upper()]
+        if short.group("level"):
+            parsed["ageGroup"] += " " + SHORT_LEVELS[short.group("level")]
+        cls = short.group("cls").upper()
+        parsed["danceClass"] = "Open" if cls == "OPEN" else cls
+        parsed["style"] = STYLES.get(short.group("style").lower())
+        return parsed
+
+    age = AGE_RE.search(category)
+    if age:
+        parsed["ageGroup"] = canonical_age_group(age.group("age"))
+        rest = category[age.end():]
+    else:
+        rest = category
+
+    style = STYLE_RE.search(rest)
+    if style:
+        parsed["style"] = STYLES[style.group(1).lower()]
+        rest = rest[:style.start()]
+    else:
+        # WDSF titles put the style first: "OPEN STANDARD SENIOR III"
+        style = STYLE_RE.search(category)
+        if style:
+            parsed["style"] = STYLES[style.group(1).lower()]
+
+    cls = CLASS_RE.search(rest)
+    if cls:
+        parsed["danceClass"] = cls.group("cls")
+
+    return parsed
+
+
+def check() -> int:
+    """Parse CHECK_TITLES and print every title that does not give the expected columns."""
+    failures = 0
+    for title, expected in CHECK_TITLES.items():
+        parsed = parse_title(title)
+        got = tuple(parsed[column] for column in CATEGORY_COLUMNS)
+        if got != expected:
+            failures += 1
+            print(f"{title!r}: expected {expected}, got {got}")
+    print(f"{len(CHECK_TITLES) - failures}/{len(CHECK_TITLES)} titles parsed as expected.")
+    return failures
+
+
+def ensure_columns(conn: sqlite3.Connection) -> None:
+    """Add the category columns and indexes to an Event table created before they existed."""
+    existing = {row[1] for row in conn.execute('PRAGMA table_info("Event")')}
+    for column in CATEGORY_COLUMNS:
+        if column not in existing:
+            conn.execute(f'ALTER TABLE "Event" ADD COLUMN "{column}" TEXT')
+    conn.execute(
+        f'CREATE INDEX IF NOT EXISTS "{INDEX_NAME}" ON "Event"("ageGroup", "danceClass", "style", "date")'
+    )
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "{DATE_INDEX_NAME}" ON "Event"("date")')
+
+
+def backfill(conn: sqlite3.Connection, only_missing: bool = False) -> int:
+    """
+    Parse every event name and store the category columns.
+
+    Args:
+        conn: Open connection to dev.db
+        only_missing: Only touch events that have no parsed category yet
+
+    Returns:
+        Number of updated events
+    """
+    ensure_columns(conn)
+    query = 'SELECT id, name FROM "Event"'
+    if only_missing:
+        query += ' WHERE "ageGroup" IS NULL AND "style" IS NULL AND "date" IS NULL'
+    rows = conn.execute(query).fetchall()
+
+    updates = []
+    for event_id, name in rows:
+        parsed = parse_title(name)
+        updates.append((*(parsed[column] for column in CATEGORY_COLUMNS), event_id))
+
+    conn.executemany(
+        'UPDATE "Event" SET "ageGroup" = ?, "danceClass" = ?, "style" = ?, "date" = ? WHERE id = ?',
+        updates,
+    )
+    conn.commit()
+    return len(updates)
+
+
+def find_events(conn: sqlite3.Connection, age_group: str = None, dance_class: str = None,
+                style: str = None, year: int = None) -> list[tuple]:
+    """
+    Look up events by category, e.g. all Junior I B Latin events in 2023.
+
+    Every filter is optional and served by the composite index on Event.
+
+    Returns:
+        List of (event id, event name, date) tuples ordered by date
+    """
+    clauses, params = [], []
+    for column, value in (("ageGroup", age_group), ("danceClass", dance_class), ("style", style)):
+        if value is not None:
+            clauses.append(f'"{column}" = ?')
+            params.append(value)
+    if year is not None:
+        clauses.append('"date" >= ? AND "date" < ?')
+        params.extend([f"{year}.01.01", f"{year + 1}.01.01"])
+
+    query = 'SELECT id, name, "date" FROM "Event"'
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += ' ORDER BY "date"'
+    return conn.execute(query, params).fetchall()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Parse and query the dance category of events.")
+    parser.add_argument("--db", default=str(DB_FILE),
+                        help=f"Path to the SQLite database (default: {DB_FILE}).")
+    parser.add_argument("--backfill", action="store_true",
+                        help="Parse all event names and store the category columns.")
+    parser.add_argument("--check", action="store_true",
+                        help="Parse the example titles of CHECK_TITLES and report mismatches.")
+    parser.add_argument("--only-missing", action="store_true",
+                        help="With --backfill, only parse events without stored categories.")
+    parser.add_argument("-a", "--age-group", help='e.g. "Junior I"')
+    parser.add_argument("-c", "--dance-class", help="e.g. B")
+    parser.add_argument("-s", "--style", help="Standard, Latin, Tíztánc, ...")
+    parser.add_argument("-y", "--year", type=int)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.check:
+        exit(1 if check() else 0)
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.backfill:
+            updated = backfill(conn, only_missing=args.only_missing)
+            print(f"Stored categories for {updated} events.")
+
+        if any(v is not None for v in (args.age_group, args.dance_class, args.style, args.year)):
+            events = find_events(conn, args.age_group, args.dance_class, args.style, args.year)
+            for event_id, name, date in events:
+                print(f"{event_id:>6}  {date}  {name}")
+            print(f"{len(events)} events")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+# scrape/dancers.py
+# Resolve couples ("Leader - Follower" rows in participants) into individual dancers.
+#
+# Every couple name is split into its dancers, names are normalised (accents,
+# case, spacing, word order) and near-duplicate spellings are merged with the
+# help of a trigram blocking index, so only names sharing rare trigrams are ever
+# compared. The result is persisted in the dancers, dancer_aliases and
+# couple_members tables (see schema.prisma). migrate.py reruns the resolver after
+# every migration; `python dancers.py --resolve` does the same for an existing dev.db.
+import argparse
+import re
+import sqlite3
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+
+# --- Configuration ---
+DB_FILE = Path(__file__).parent / "dev.db"
+NGRAM = 3
+# Trigrams shared by more names than this are too common to narrow anything down
+MAX_BLOCK_SIZE = 200
+# Minimum number of shared trigrams before two names are compared at all
+MIN_SHARED_NGRAMS = 4
+# Trigram Jaccard similarity needed to treat two spellings as the same dancer
+SIMILARITY_THRESHOLD = 0.85
+ROLES = ("leader", "follower")
+# Words of formation team and club entries ("Savaria TSE B csapat"), normalised; these
+# entries are not people, so similar spellings of them are never merged
+TEAM_WORDS = {
+    "csapat", "formacio", "formacios", "formation", "team", "csoport", "tanccsoport",
+    "tse", "tsc", "se", "ase", "egyesulet", "klub", "club", "tancklub", "tancsport", "studio",
+}
+# --- End Configuration ---
+
+PROFILE_ID_RE = re.compile(r"par\.php\?id=(\d+)")
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS "dancers" (
+        "id" INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+        "name" TEXT NOT NULL,
+        "normalizedName" TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS "dancer_aliases" (
+        "alias" TEXT NOT NULL PRIMARY KEY,
+        "dancerId" INTEGER NOT NULL,
+        CONSTRAINT "dancer_aliases_dancerId_fkey" FOREIGN KEY ("dancerId") REFERENCES "dancers" ("id") ON DELETE CASCADE ON UPDATE CASCADE
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS "dancer_aliases_dancerId_idx" ON "dancer_aliases"("dancerId")',
+    """
+    CREATE TABLE IF NOT EXISTS "couple_members" (
+        "participantId" INTEGER NOT NULL,
+        "dancerId" INTEGER NOT NULL,
+        "role" TEXT NOT NULL,
+
+        PRIMARY KEY ("participantId", "role"),
+        CONSTRAINT "couple_members_participantId_fkey" FOREIGN KEY ("participantId") REFERENCES "participants" ("id") ON DELETE CASCADE ON UPDATE CASCADE,
+        CONSTRAINT "couple_members_dancerId_fkey" FOREIGN KEY ("dancerId") REFERENCES "dancers" ("id") ON DELETE CASCADE ON UPDATE CASCADE
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS "couple_members_dancerId_idx" ON "couple_members"("dancerId")',
+]
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, strip accents and punctuation and collapse whitespace ("Tóth  Zoltán" -> "toth zoltan")."""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(ch for ch in name if not unicodedata.combining(ch))
+    name = re.sub(r"[^\w\s]", " ", name.lower())
+    return " ".join(name.split())
+
+
+def split_couple(name: str) -> list[str]:
+    """
+    Split a couple name into the names of its dancers.
+
+    "Tóth Zoltán - Dernei Titanilla" gives both names, solo entries ("Elhardt Réka -")
+    give one. Names with more than one separator (double-barrelled foreign names)
+    are split where the two halves are closest in word count.
+    """
+    parts = [part.strip() for part in re.split(r"\s+-\s*|\s*-\s+", name.strip())]
+    parts = [part for part in parts if part]
+    if len(parts) <= 2:
+        return parts
+
+    best = min(
+        range(1, len(parts)),
+        key=lambda i: abs(len(" ".join(parts[:i]).split()) - len(" ".join(parts[i:]).split())),
+    )
+    return [" - ".join(parts[:best]), " - ".join(parts[best:])]
+
+
+def profile_id(link: str):
+    match = PROFILE_ID_RE.search(link or "")
+    return int(match.group(1)) if match else None
+
+
+def ngrams(name: str) -> set[str]:
+    padded = f" {name} "
+    return {padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        self.parent.setdefault(item, item)
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def is_team(name: str) -> bool:
+    """Whether a normalised name is a formation team or club entry rather than a person."""
+    return "csapat" in name or any(token in TEAM_WORDS for token in name.split())
+
+
+def same_person(a: str, b: str, grams: dict, clubs: dict) -> bool:
+    """Decide whether two distinct normalised names belong to the same dancer."""
+    # "savaria tse" and "savaria tse b csapat" are different teams of one club
+    if is_team(a) or is_team(b):
+        return False
+    tokens_a, tokens_b = a.split(), b.split()
+    # Foreign names appear in both orders: "radu constantin muntean" / "muntean radu constantin"
+    if sorted(tokens_a) == sorted(tokens_b):
+        return True
+    # Spelling variants and typos of the same surname
+    if tokens_a[0] == tokens_b[0]:
+        shared = len(grams[a] & grams[b])
+        if shared / len(grams[a] | grams[b]) >= SIMILARITY_THRESHOLD:
+            return True
+        # A dropped middle name ("racz noel" / "racz noel benjamin") only counts
+        # when both spellings danced for the same club
+        shorter, longer = sorted((set(tokens_a), set(tokens_b)), key=len)
+        if len(shorter) >= 2 and shorter < longer and clubs[a] & clubs[b]:
+            return True
+    return False
+
+
+def candidate_pairs(names: list[str], grams: dict):
+    """Yield name pairs sharing enough rare trigrams, using an inverted trigram index."""
+    index = defaultdict(list)
+    for position, name in enumerate(names):
+        for gram in grams[name]:
+            index[gram].append(position)
+
+    for position, name in enumerate(names):
+        shared = Counter()
+        for gram in grams[name]:
+            block = index[gram]
+            if len(block) > MAX_BLOCK_SIZE:
+                continue
+            shared.update(other for other in block if other > position)
+        for other, count in shared.items():
+            if count >= MIN_SHARED_NGRAMS:
+                yield name, names[other]
+
+
+def resolve(participants: list[tuple]) -> tuple[list[dict], list[tuple]]:
+    """
+    Resolve couples into individual dancers.
+
+    Args:
+        participants: (id, name, club, profileLink) rows of the participants table
+
+    Returns:
+        Tuple of (dancers, memberships). Each dancer is a dict with name,
+        normalizedName and the set of aliases; memberships are
+        (participantId, dancer index, role) tuples
+    """
+    uf = UnionFind()
+    slots = []  # (participantId, role, raw name, normalized name)
+    clubs = defaultdict(set)
+    by_profile = defaultdict(list)
+
+    for participant_id, name, club, link in participants:
+        members = split_couple(name)
+        normalized = []
+        for role, member in zip(ROLES, members):
+            key = normalize_name(member)
+            if not key:
+                continue
+            uf.find(key)
+            clubs[key].add(club)
+            slots.append((participant_id, role, member, key))
+            normalized.append(key)
+        key = profile_id(link)
+        if key is not None:
+            by_profile[key].append(normalized)
+
+    # The same couple profile always holds the same two dancers
+    for couples in by_profile.values():
+        first = couples[0]
+        for other in couples[1:]:
+            for a, b in zip(first, other):
+                uf.union(a, b)
+
+    names = sorted(uf.parent)
+    grams = {name: ngrams(name) for name in names}
+    for a, b in candidate_pairs(names, grams):
+        if same_person(a, b, grams, clubs):
+            uf.union(a, b)
+
+    groups = defaultdict(list)
+    for participant_id, role, raw, key in slots:
+        groups[uf.find(key)].append((participant_id, role, raw, key))
+
+    dancers, memberships = [], []
+    for root in sorted(groups):
+        entries = groups[root]
+        display = Counter(raw for _, _, raw, _ in entries).most_common(1)[0][0]
+        dancers.append({
+            "name": display,
+            "normalizedName": normalize_name(display),
+            "aliases": {key for _, _, _, key in entries},
+        })
+        index = len(dancers) - 1
+        memberships.extend((participant_id, index, role) for participant_id, role, _, _ in entries)
+    return dancers, memberships
+
+
+def ensure_tables(conn: sqlite3.Connection) -> None:
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+
+def store(conn: sqlite3.Connection, dancers: list[dict], memberships: list[tuple]) -> None:
+    """Replace the contents of the dancer tables with a fresh resolution."""
+    ensure_tables(conn)
+    conn.execute('DELETE FROM "couple_members"')
+    conn.execute('DELETE FROM "dancer_aliases"')
+    conn.execute('DELETE FROM "dancers"')
+    conn.execute("DELETE FROM sqlite_sequence WHERE name = 'dancers'")
+
+    conn.executemany(
+        'INSERT INTO "dancers" ("id", "name", "normalizedName") VALUES (?, ?, ?)',
+        [(index + 1, dancer["name"], dancer["normalizedName"]) for index, dancer in enumerate(dancers)],
+    )
+    conn.executemany(
+        'INSERT INTO "dancer_aliases" ("alias", "dancerId") VALUES (?, ?)',
+        [(alias, index + 1) for index, dancer in enumerate(dancers) for alias in dancer["aliases"]],
+    )
+    conn.executemany(
+        'INSERT OR IGNORE INTO "couple_members" ("participantId", "dancerId", "role") VALUES (?, ?, ?)',
+        [(participant_id, index + 1, role) for participant_id, index, role in memberships],
+    )
+    conn.commit()
+
+
+def resolve_database(conn: sqlite3.Connection) -> dict:
+    """
+    Rebuild the dancer tables from the participants table.
+
+    Returns:
+        Dictionary with the number of couples, dancers and aliases
+    """
+    participants = conn.execute('SELECT id, name, club, profileLink FROM "participants"').fetchall()
+    dancers, memberships = resolve(participants)
+    store(conn, dancers, memberships)
+    return {
+        "couples": len(participants),
+        "dancers": len(dancers),
+        "aliases": sum(len(dancer["aliases"]) for dancer in dancers),
+    }
+
+
+def find_dancer(conn: sqlite3.Connection, name: str):
+    """Look up a dancer by any known spelling of their name, returns (id, name) or None."""
+    return conn.execute(
+        """
+        SELECT d.id, d.name FROM "dancer_aliases" a
+        JOIN "dancers" d ON d.id = a.dancerId
+        WHERE a.alias = ?
+        """,
+        (normalize_name(name),),
+    ).fetchone()
+
+
+def dancer_history(conn: sqlite3.Connection, dancer_id: int) -> list[tuple]:
+    """
+    All results of a dancer across every partner they danced with.
+
+    Returns:
+        List of (date, event name, couple name, role, position, section) tuples ordered by date
+    """
+    return conn.execute(
+        """
+        SELECT c.date, e.name, p.name, cm.role, r.position, r.section
+        FROM "couple_members" cm
+        JOIN "participants" p ON p.id = cm.participantId
+        JOIN "Result" r ON r.participantId = cm.participantId
+        JOIN "Event" e ON e.id = r.eventId
+        JOIN "Competition" c ON c.id = e.competitionId
+        WHERE cm.dancerId = ?
+        ORDER BY c.date
+        """,
+        (dancer_id,),
+    ).fetchall()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Resolve couples into individual dancers.")
+    parser.add_argument("name", nargs="*", help="Show the competition history of this dancer.")
+    parser.add_argument("--db", default=str(DB_FILE),
+                        help=f"Path to the SQLite database (default: {DB_FILE}).")
+    parser.add_argument("--resolve", action="store_true",
+                        help="Rebuild the dancer tables from the participants table.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.resolve:
+            counts = resolve_database(conn)
+            print(f"Resolved {counts['couples']} couples into {counts['dancers']} dancers "
+                  f"({counts['aliases']} name spellings).")
+
+        if args.name:
+            dancer = find_dancer(conn, " ".join(args.name))
+            if dancer is None:
+                print(f"No dancer found for '{' '.join(args.name)}'.")
+                return
+            print(f"{dancer[1]} (ID: {dancer[0]})")
+            for date, event, couple, role, position, section in dancer_history(conn, dancer[0]):
+                print(f"  {date}  {position:<6} {section:<12} {couple} [{role}]  {event}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+# scrape/db_tables.py
+# Which tables of dev.db hold data, shared by the tools that copy the database
+# table by table (replica_sync.py, stat/to_csv.py).
+import sqlite3
+
+
+def data_tables(conn: sqlite3.Connection) -> list[tuple[str, str]]:
+    """
+    (name, CREATE statement) of the tables holding data, in creation order.
+
+    SQLite's own tables (sqlite_sequence, sqlite_stat1, ...) are left out, and so
+    are virtual tables like the search index with their shadow tables
+    (SearchIndex_data, SearchIndex_idx, ...), which are rebuilt rather than copied.
+    """
+    rows = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table' ORDER BY rowid").fetchall()
+    virtual = [name for name, sql in rows if sql and sql.upper().startswith("CREATE VIRTUAL TABLE")]
+    return [
+        (name, sql) for name, sql in rows
+        if not name.startswith("sqlite_")
+        and name not in virtual
+        and not any(name.startswith(f"{table}_") for table in virtual)
+    ]
@@ -1,15 +1,18 @@
 import requests
 import json
 import os
+import argparse
 from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 import time
-# Create output directory if it doesn't exist
+
+import metrics as run_metrics
+# Output directory, created in download()
 output_dir = "competition_data"
-os.makedirs(output_dir, exist_ok=True)
 
-# Base URL for the API
-base_url = "http://localhost:3000/api/competition-marks"
+# Base URL for the API, point it at replay_server.py with --base-url for offline runs
+endpoint = "competition-marks"
+base_url = f"http://localhost:3000/api/{endpoint}"
 
 # ID range to scrape
 start_id = 1
@@ -18,44 +21,112 @@ end_id = 12300
 # Number of workers for parallel processing
 num_workers = 1
 
+# File with the IDs to download when no --range is given
+ids_file = "real_failed_ids.txt"
+
+# Pause after each request (seconds) and retries of 429/5xx responses and connection errors
+delay = 1
+retries = 0
+
+# Collects request latencies and saved files, replaced in main()
+metrics = run_metrics.RunMetrics(os.path.splitext(os.path.basename(__file__))[0])
+
+def backoff(attempt, retry_after=None):
+    """Seconds to wait before the next attempt, honouring a Retry-After header"""
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return 0.5 * 2 ** attempt
+
 def fetch_and_save(id):
     """Fetch data for a given ID and save it if not empty"""
     url = f"{base_url}?id={id}"
-    try:
-        response = requests.get(url, timeout=10)
+    for attempt in range(retries + 1):
+        start = time.perf_counter()
+        try:
+            response = requests.get(url, timeout=10)
+        except Exception as e:
+            metrics.observe_request(time.perf_counter() - start, "error")
+            if attempt < retries:
+                metrics.add_rows("retries")
+                time.sleep(backoff(attempt))
+                continue
+            print(f"Error fetching ID {id}: {str(e)}")
+            time.sleep(delay)
+            #save failed id to a file
+            with open("failed_ids.txt", "a") as f:
+                f.write(f"{id}\n") 
+            return False
+
+        metrics.observe_request(time.perf_counter() - start, response.status_code)
         if response.status_code == 200:
             #assume its a html file and save it to the output directory
             output_file = os.path.join(output_dir, f"competition_marks_{id}.json")
             with open(output_file, 'w') as f:
                 f.write(response.text)
-            time.sleep(1)
+            metrics.add_rows("files")
+            time.sleep(delay)
             return True
-        else:
-            return False
-
-        return False
-    except Exception as e:
-        print(f"Error fetching ID {id}: {str(e)}")
-        time.sleep(1)
-        #save failed id to a file
-        with open("failed_ids.txt", "a") as f:
-            f.write(f"{id}\n") 
+        if (response.status_code == 429 or response.status_code >= 500) and attempt < retries:
+            metrics.add_rows("retries")
+            time.sleep(backoff(attempt, response.headers.get("Retry-After")))
+            continue
         return False
+    return False
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download competition data from the local API.")
+    parser.add_argument("--base-url", default=None,
+                        help="Root URL of the API, e.g. http://localhost:3001 for replay_server.py (default: http://localhost:3000).")
+    parser.add_argument("-o", "--output-dir", default=output_dir,
+                        help=f"Directory the responses are saved to (default: {output_dir}).")
+    parser.add_argument("--range", nargs=2, type=int, metavar=("START", "END"), default=None,
+                        help=f"Download IDs START..END-1 instead of the IDs in {ids_file}.")
+    parser.add_argument("--ids-file", default=ids_file, help=f"File with one ID per line (default: {ids_file}).")
+    parser.add_argument("-w", "--workers", type=int, default=num_workers,
+                        help=f"Number of parallel requests (default: {num_workers}).")
+    parser.add_argument("--delay", type=float, default=delay,
+                        help=f"Seconds to pause after each request (default: {delay}).")
+    parser.add_argument("--retries", type=int, default=retries,
+                        help=f"Retries of 429/5xx responses and connection errors (default: {retries}).")
+    run_metrics.add_arguments(parser)
+    return parser.parse_args()
 
 def main():
     """Main function to parallelize the scraping process"""
-    #read the failed ids from the file
-    with open("real_failed_ids.txt", "r") as f:
-        failed_ids = f.readlines()
-    #remove the \n from the ids
-    ids = [int(id.strip()) for id in failed_ids]
-    #ids = range(start_id, end_id)
+    global metrics, base_url, output_dir, num_workers, delay, retries
+    args = parse_args()
+    if args.base_url:
+        base_url = f"{args.base_url.rstrip('/')}/api/{endpoint}"
+    output_dir = args.output_dir
+    num_workers = args.workers
+    delay = args.delay
+    retries = args.retries
+
+    if args.range:
+        ids = range(*args.range)
+    else:
+        #read the failed ids from the file
+        with open(args.ids_file, "r") as f:
+            failed_ids = f.readlines()
+        #remove the \n from the ids
+        ids = [int(id.strip()) for id in failed_ids if id.strip()]
+
+    with run_metrics.instrument(metrics.name, args.report, args.profile) as metrics:
+        download(ids)
+
+def download(ids):
+    """Download every ID and report how many non-empty responses were saved"""
+    # Create output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
     successful = 0
     
     print(f"Starting to download data for {len(ids)} IDs...")
     
     # Use ThreadPoolExecutor for parallel processing
-    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+    with ThreadPoolExecutor(max_workers=num_workers) as executor, metrics.stage("download"):
         # Use tqdm for progress bar
         results = list(tqdm(executor.map(fetch_and_save, ids), total=len(ids)))
     
@@ -0,0 +1,244 @@
+# scrape/metrics.py
+# Run instrumentation shared by the scrapers, the migration and the stat scripts.
+#
+# A RunMetrics object collects per-stage wall time, request latency histograms,
+# rows written/read per table, database statement counts and peak RSS, and
+# writes them as a JSON or CSV run report. `instrument()` wires this up to the
+# --report/--profile command line options added by `add_arguments()`.
+import atexit
+import csv
+import json
+import logging
+import resource
+import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# --- Configuration ---
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+PROFILERS = ("cprofile", "pyinstrument")
+# --- End Configuration ---
+
+
+def peak_rss_mb() -> dict:
+    """Peak resident set size of this process and of its finished children, in MB."""
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    }
+
+
+class RunMetrics:
+    """Thread-safe collector for one run of a script."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages = {}  # name -> {"seconds": float, "calls": int}
+        self.rows = {}  # table -> count
+        self.statements = 0
+        self.requests = {"count": 0, "statuses": {}, "buckets": [0] * len(LATENCY_BUCKETS), "seconds": 0.0}
+        self._checkpoint = None
+
+    # --- Stages ---
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block of code and add it to the stage total."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(name, time.perf_counter() - start)
+
+    def add_stage_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            stage = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            stage["seconds"] += seconds
+            stage["calls"] += 1
+
+    def checkpoint(self, name: str = None) -> None:
+        """
+        Start a new stage and close the previous one.
+
+        Meant for top-to-bottom scripts where wrapping each step in
+        `with metrics.stage(...)` would mean re-indenting the whole file.
+        Call with no name to close the last stage.
+        """
+        now = time.perf_counter()
+        if self._checkpoint is not None:
+            previous, started = self._checkpoint
+            self.add_stage_time(previous, now - started)
+        self._checkpoint = (name, now) if name else None
+
+    # --- Counters ---
+    def observe_request(self, seconds: float, status=None) -> None:
+        """Record the latency and outcome (HTTP status or "error") of one request."""
+        with self._lock:
+            self.requests["count"] += 1
+            self.requests["seconds"] += seconds
+            key = str(status)
+            self.requests["statuses"][key] = self.requests["statuses"].get(key, 0) + 1
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    self.requests["buckets"][i] += 1
+                    break
+
+    def add_rows(self, table: str, count: int = 1) -> None:
+        with self._lock:
+            self.rows[table] = self.rows.get(table, 0) + count
+
+    def count_statement(self, count: int = 1) -> None:
+        with self._lock:
+            self.statements += count
+
+    def trace_connection(self, conn) -> None:
+        """Count every statement executed on an sqlite3 connection."""
+        conn.set_trace_callback(lambda statement: self.count_statement())
+
+    # --- Reporting ---
+    def report(self) -> dict:
+        self.checkpoint()
+        elapsed = time.perf_counter() - self._start
+        with self._lock:
+            requests = dict(self.requests)
+            requests["histogram"] = {
+                ("+inf" if bound == float("inf") else f"<={bound}s"): count
+                for bound, count in zip(LATENCY_BUCKETS, requests.pop("buckets"))
+            }
+            requests["mean_seconds"] = requests["seconds"] / requests["count"] if requests["count"] else 0.0
+            return {
+                "name": self.name,
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "wall_seconds": elapsed,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "rows": {
+                    table: {"count": count, "per_second": count / elapsed if elapsed else 0.0}
+                    for table, count in self.rows.items()
+                },
+                "statements": self.statements,
+                "requests": requests,
+                "peak_rss_mb": peak_rss_mb(),
+            }
+
+    def write_report(self, path) -> dict:
+        """Write the report as JSON, or as flat metric,key,value rows when the path ends in .csv."""
+        report = self.report()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix == ".csv":
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["metric", "key", "value"])
+                for key in ("name", "started_at", "wall_seconds", "statements"):
+                    writer.writerow([key, "", report[key]])
+                for name, stage in report["stages"].items():
+                    writer.writerow(["stage_seconds", name, stage["seconds"]])
+                    writer.writerow(["stage_calls", name, stage["calls"]])
+                for table, rows in report["rows"].items():
+                    writer.writerow(["rows", table, rows["count"]])
+                    writer.writerow(["rows_per_second", table, rows["per_second"]])
+                for status, count in report["requests"]["statuses"].items():
+                    writer.writerow(["requests", status, count])
+                for bucket, count in report["requests"]["histogram"].items():
+                    writer.writerow(["request_latency", bucket, count])
+                for process, mb in report["peak_rss_mb"].items():
+                    writer.writerow(["peak_rss_mb", process, mb])
+        else:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+        return report
+
+    def summary(self) -> str:
+        report = self.report()
+        stages = ", ".join(f"{name} {stage['seconds']:.2f}s" for name, stage in report["stages"].items())
+        return (f"{self.name}: {report['wall_seconds']:.2f}s wall"
+                + (f" ({stages})" if stages else "")
+                + f", peak RSS {report['peak_rss_mb']['self']:.0f} MB")
+
+
+# --- Profiling ---
+@contextmanager
+def profiled(profiler: str, output):
+    """Run the block under cProfile or pyinstrument and write the result to `output`."""
+    if profiler is None:
+        yield
+        return
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    if profiler == "cprofile":
+        import cProfile
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(output.with_suffix(".prof"))
+    elif profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logging.error("pyinstrument is not installed, run 'pip install pyinstrument' or use --profile cprofile.")
+            exit(1)
+
+        profile = Profiler(async_mode="enabled")
+        profile.start()
+        try:
+            yield
+        finally:
+            profile.stop()
+            output.with_suffix(".html").write_text(profile.output_html())
+    else:
+        raise ValueError(f"Unknown profiler '{profiler}', expected one of {PROFILERS}")
+
+
+# --- Command line integration ---
+def add_arguments(parser) -> None:
+    parser.add_argument("--report", metavar="PATH", default=None,
+                        help="Write a run report with stage timings, row counts and peak memory (.json or .csv).")
+    parser.add_argument("--profile", choices=PROFILERS, default=None,
+                        help="Profile the run, the output is written next to the report.")
+
+
+@contextmanager
+def instrument(name: str, report=None, profile=None):
+    """
+    Collect metrics for the enclosed run and write the report when it ends.
+
+    Args:
+        name: Name of the run, used in the report and for default file names
+        report: Path of the JSON/CSV report, or None to only print a summary
+        profile: One of PROFILERS, or None
+    """
+    metrics = RunMetrics(name)
+    profile_output = Path(report).with_suffix("") if report else Path(f"{name}-profile")
+    try:
+        with profiled(profile, profile_output):
+            yield metrics
+    finally:
+        if report:
+            metrics.write_report(report)
+            print(f"Run report written to {report}")
+        print(metrics.summary())
+
+
+def instrument_script(name: str, report=None, profile=None) -> RunMetrics:
+    """
+    Like `instrument()`, for scripts that do their work at module level.
+
+    The report is written when the interpreter exits, including early exit() calls.
+    """
+    stack = ExitStack()
+    metrics = stack.enter_context(instrument(name, report, profile))
+    atexit.register(stack.close)
+    return metrics
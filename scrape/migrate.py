@@ -1,11 +1,33 @@
 # scrape/migrate.py
-import json
+#
+# The migration runs as a pipeline of three stages connected by bounded queues:
+#
+#   parse    -> reads competition JSON files and turns them into plain rows
+#               (optionally in worker processes, see --workers)
+#   resolve  -> decides which judges/participants already exist and which are new
+#   write    -> the only stage that talks to the database, commits in batches
+#
+# Each stage has its own tqdm bar; a full queue shows up as the bar in front of
+# it stalling while the bar behind it keeps up, so the slowest stage is visible.
 import os
-import re
+import time
 import asyncio
+import argparse
+import logging
+import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
 from pathlib import Path
 from tqdm.asyncio import tqdm # Import tqdm for async
 
+import metrics as run_metrics
+from categories import parse_title
+from dancers import resolve_database as resolve_dancers
+from search_index import rebuild_index as rebuild_search_index
+from records import iter_files, read_competition, source_id_of
+from validate import DATE_RE, ERROR, check_competition
+
 # Assuming Prisma client is generated in ./generated/prisma relative to this script
 # Adjust the import path if your generated client is elsewhere
 try:
@@ -29,211 +51,432 @@ except ImportError:
 # --- Configuration ---
 DATA_DIR = Path(__file__).parent / "competition_data"
 DATABASE_URL = "file:./dev.db" # Matches schema.prisma
+DB_FILE = Path(__file__).parent / "dev.db"
+QUEUE_SIZE = 64 # Parsed competitions waiting between two stages
+BATCH_SIZE = 50 # Competitions committed per transaction
+TX_TIMEOUT = timedelta(minutes=2)
+# Progress of the tables the stat tools derive incrementally from Result (head_to_head.py,
+# club_cube.py); reset when competitions are removed so their next update rebuilds them
+DERIVED_PROGRESS_TABLES = ("HeadToHeadProgress", "ClubCubeProgress")
+# --- End Configuration ---
+
+# --- Argument Parsing ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Migrate scraped competition JSON into the SQLite database.")
+    parser.add_argument("--data-dir", default=str(DATA_DIR),
+                        help=f"Directory with the competition JSON files (default: {DATA_DIR}).")
+    parser.add_argument("--db", default=str(DB_FILE),
+                        help=f"SQLite database to write to (default: {DB_FILE}).")
+    parser.add_argument("-w", "--workers", type=int, default=0,
+                        help="Parse competitions in this many worker processes (default: 0, parse in the main process).")
+    parser.add_argument("-b", "--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"Competitions committed per transaction (default: {BATCH_SIZE}).")
+    parser.add_argument("-q", "--queue-size", type=int, default=QUEUE_SIZE,
+                        help=f"Maximum competitions buffered between stages (default: {QUEUE_SIZE}).")
+    parser.add_argument("--ids-file",
+                        help="Only (re-)ingest the competitions with these sourceIds, one per line "
+                             "(e.g. from validate.py --ids-out); their previous rows are removed first.")
+    run_metrics.add_arguments(parser)
+    return parser.parse_args()
+# --- End Argument Parsing ---
+
+db = None
+# Stage timings, rows per table and statement counts, replaced in main()
+metrics = run_metrics.RunMetrics("migrate")
 
-# --- Load data ---
-competitions = []
-for file in DATA_DIR.glob("*.json"):
-    with open(file, "r") as f:
-        competitions.append(json.load(f))
-#competitions = competitions[1285:]
-# --- Create database ---
-db = Prisma()
+# Identity caches shared by the resolve and write stages: name -> database id
+judge_ids = {}
+participant_ids = {}
 
 # --- Main async function ---
-async def main():
+async def main(args):
+    global metrics
+    with run_metrics.instrument("migrate", args.report, args.profile) as metrics:
+        await migrate(args)
+
+async def migrate(args):
+    global db
+    db_file = Path(args.db).resolve()
+    files = list(iter_files(args.data_dir))
+    if args.ids_file:
+        with open(args.ids_file, "r") as f:
+            source_ids = {int(line) for line in f if line.strip()}
+        files = [path for path in files if source_id_of(path) in source_ids]
+        with metrics.stage("remove"):
+            print(f"Removed {remove_competitions(db_file, files)} competitions to re-ingest")
+    db = Prisma(datasource={"url": f"file:{db_file}"})
     await db.connect()
     try:
-        await create_judges()
-        await create_participants()
-        await create_competitions()
+        parsed_queue = asyncio.Queue(maxsize=args.queue_size)
+        resolved_queue = asyncio.Queue(maxsize=args.queue_size)
+        seen = {"judges": set(), "participants": set()}
+
+        parse_bar = tqdm(total=len(files), desc="Parsing competitions", position=0)
+        resolve_bar = tqdm(total=len(files), desc="Resolving identities", position=1)
+        write_bar = tqdm(total=len(files), desc="Writing competitions", position=2)
 
-        await check_participants()
-        await check_judges()
+        tasks = [
+            asyncio.create_task(parse_stage(files, parsed_queue, args.workers, parse_bar)),
+            asyncio.create_task(resolve_stage(parsed_queue, resolved_queue, seen, resolve_bar)),
+            asyncio.create_task(write_stage(resolved_queue, args.batch_size, write_bar)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            for bar in (parse_bar, resolve_bar, write_bar):
+                bar.close()
+
+        with metrics.stage("check"):
+            await check_participants(seen["participants"])
+            await check_judges(seen["judges"])
     finally:
         await db.disconnect()
+    with metrics.stage("search_index"):
+        update_search_index(db_file)
+    with metrics.stage("dancers"):
+        update_dancers(db_file)
 
-# --- Create competitions ---
-async def create_competitions():
-    for competition in tqdm(competitions, desc="Creating competitions"):
-        
-        competitionTitle = competition["title"]
-        #date is the last part as a yyyy.mm.dd, finding it with regex
-        competitionDate = re.search(r'\d{4}\.\d{2}\.\d{2}', competition["title"]).group(0) + ""
+# --- Re-ingesting ---
+def remove_competitions(db_file, files):
+    """
+    Delete the competitions of these files and everything below them, return how many were removed.
 
-        competitionEntity = await db.competition.create(
-            data={
-                "title": competitionTitle,
-                "date": competitionDate,
-                "location": competition["location"]
-            }
-        )
-        await create_event(competitionEntity, competition)
+    Competitions are found by sourceId. Rows migrated before sourceId was stored
+    have none and are matched by title and date instead, so they are replaced
+    rather than duplicated.
+    """
+    conn = sqlite3.connect(db_file)
+    try:
+        removed = 0
+        for path in files:
+            competition = read_competition(path)
+            rows = conn.execute('SELECT id FROM "Competition" WHERE sourceId = ?', (competition.sourceId,)).fetchall()
+            if not rows:
+                date = DATE_RE.search(competition.title)
+                rows = conn.execute(
+                    'SELECT id FROM "Competition" WHERE sourceId IS NULL AND title = ? AND date IS ?',
+                    (competition.title, date.group(0) if date else None),
+                ).fetchall()
+            for row in rows:
+                events = 'SELECT id FROM "Event" WHERE competitionId = ?'
+                conn.execute(f'DELETE FROM "Mark" WHERE roundId IN (SELECT id FROM "Round" WHERE eventId IN ({events}))', row)
+                conn.execute(f'DELETE FROM "_ParticipantToRound" WHERE B IN (SELECT id FROM "Round" WHERE eventId IN ({events}))', row)
+                conn.execute(f'DELETE FROM "Round" WHERE eventId IN ({events})', row)
+                conn.execute(f'DELETE FROM "Result" WHERE eventId IN ({events})', row)
+                conn.execute(f'DELETE FROM "_EventToJudge" WHERE A IN ({events})', row)
+                conn.execute('DELETE FROM "Event" WHERE competitionId = ?', row)
+                conn.execute('DELETE FROM "Competition" WHERE id = ?', row)
+                removed += 1
+        if removed:
+            # The re-ingested events get new ids, counts past a high-water mark would be added twice
+            tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for table in DERIVED_PROGRESS_TABLES:
+                if table in tables:
+                    conn.execute(f'DELETE FROM "{table}"')
+        conn.commit()
+    finally:
+        conn.close()
+    return removed
 
-async def create_event(competitionEntity, competition):
-        judges = competition["judges"]
-        #create evenet and add judges
-        eventEntity =await db.event.create(
-            data={
-                "name": competitionEntity.title,
-                "competitionId": competitionEntity.id
-            }
-        )
-        #add judges to event
-        for judge in judges:
-            judgeEntity = await db.judge.find_first(where={"name": judge["name"]})
-            await db.event.update(where={"id": eventEntity.id}, data={"judges": {'connect': {"id": judgeEntity.id}}})
-        
-        await create_results(competition["results"], eventEntity)
-        await create_rounds(eventEntity, competition)
-
-async def create_rounds(eventEntity, competition):
-    rounds = competition["sections"]
-    for _round in rounds:
-        roundEntity = await db.round.create(
-            data={
-                "name": _round["title"],
-                "eventId": eventEntity.id
-            }
-        )
-        await create_marks(roundEntity, _round, competition)
-
-async def create_marks(roundEntity, _round, competition):
-    danceHeaders = _round["headers"][2:-3]
-    judgeChars = competition["judges"]
-    judgeCharString = "".join([judge["id"] for judge in judgeChars])
-    judges = []
-    for judge in judgeChars:
-        judgeEntity = await db.judge.find_first(where={"name": judge["name"]})
-        judges.append(judgeEntity)
-    eventEntity = await db.event.find_first(where={"name": competition["title"]})
+# --- Keep the full-text search index in sync ---
+def update_search_index(db_file=DB_FILE):
+    conn = sqlite3.connect(db_file)
     try:
-        for row in _round["rows"]:
-            participantId = row["FordulóRsz."]
-            #find name in compeition results based on id 
-        participantName = ""
-        for result in competition["results"]:
-            if result["number"] == participantId:
-                participantName = result["name"]
-                break
-        
-        participantEntity = await db.participant.find_first(where={"name": participantName})
-        resultEntity = await db.result.find_first(where={"participantId": participantEntity.id, "eventId": eventEntity.id})
-        
-        for danceHeader in danceHeaders:
+        counts = rebuild_search_index(conn)
+    finally:
+        conn.close()
+    print(f"Search index rebuilt: {counts}")
+
+# --- Split couples into individual dancers ---
+def update_dancers(db_file=DB_FILE):
+    conn = sqlite3.connect(db_file)
+    try:
+        counts = resolve_dancers(conn)
+    finally:
+        conn.close()
+    print(f"Dancers resolved: {counts}")
+
+# --- Stage 1: parse ---
+def parse_competition(path):
+    """
+    Read one competition JSON file and flatten it into rows ready for writing.
+
+    Runs in worker processes when --workers is set, so it must not touch the database.
+    """
+    start = time.perf_counter()
+    competition = read_competition(path)
+
+    competitionTitle = competition.title
+
+    # Reason codes of everything inconsistent, see validate.py
+    issues = check_competition(competition)
+    falseData = any(issue["severity"] == ERROR for issue in issues)
+    if falseData:
+        print(competitionTitle, ", ".join(sorted({issue["code"] for issue in issues if issue["severity"] == ERROR})))
+
+    #date is the last part as a yyyy.mm.dd; without one (NO_DATE above) it is stored as NULL
+    date = DATE_RE.search(competitionTitle)
+    competitionDate = date.group(0) if date else None
+    rounds = []
+    for section in competition.sections:
+        try:
+            marks = parse_marks(section, competition.judges, competition.results)
+        except (KeyError, IndexError, TypeError):
+            # Already reported by check_competition(), the round is stored without marks
+            falseData = True
+            marks = []
+        rounds.append({"name": section.title, "marks": marks})
+
+    return {
+        "sourceId": competition.sourceId,
+        "title": competitionTitle,
+        "date": competitionDate,
+        "location": competition.location,
+        "category": parse_title(competitionTitle),
+        "judges": competition.judges,
+        "results": competition.results,
+        "rounds": rounds,
+        "falseData": falseData,
+        "issues": issues,
+        "parseSeconds": time.perf_counter() - start,
+    }
+
+def parse_marks(section, judges, results):
+    """Turn every row of a round into (participant name, judge index, sign, X, placement, dance) tuples."""
+    judgeCharString = "".join([judge.sign for judge in judges])
+    names = {}
+    for result in results:
+        names.setdefault(result.number, result.name)
+
+    marks = []
+    for row in section.rows:
+        #find name in compeition results based on id
+        participantName = names[row.number]
+
+        for danceType, danceMarks in zip(section.danceTypes, row.marks):
             for i in range(len(judgeCharString)):
-                
                 try:
-                    proposedPlacement = int(row[danceHeader][i])
+                    proposedPlacement = int(danceMarks[i])
                     mark = False
-                except:
-                    mark = row[danceHeader][i] == "X"
+                except ValueError:
+                    mark = danceMarks[i] == "X"
                     proposedPlacement = 0
-                
-                markEntity = await db.mark.create(
-                    data={
-                        "round": {
-                            "connect": {"id": roundEntity.id}
-                        },
-                        "participant": {
-                            "connect": {"id": participantEntity.id}
-                        },
-                        "judge": {
-                            "connect": {"id": judges[i].id}
-                        },
-                        "judgeSign": judgeCharString[i],
-                        "mark": mark,
-                        "proposedPlacement": proposedPlacement,
-                        "danceType": danceHeader.split("/")[0],
-                        "result": {
-                            "connect": {"id": resultEntity.id}
-                        }
-                    }
-                )
-    except:
-        print(eventEntity.id, competition["title"],)
-        eventEntity.falseData = True
-        await db.event.update(where={"id": eventEntity.id}, data={"falseData": True})
-        
-    
-
-    
-
-
-
-async def create_participants():
-    list_of_participants = []
-    for competition in tqdm(competitions, desc="Creating participants"):
-        results = competition["results"]
-        for result in results:
-            if result["name"] not in list_of_participants:
-                participantEntity = await db.participant.create(
-                    data={
-                        "name": result["name"],
-                        "club": result["club"],
-                        "profileLink": result["profileLink"]
-                    }
-                )
-                list_of_participants.append(participantEntity.name)
-        
-async def check_participants():
-    participants = await db.participant.find_many()
-    namesOfParticipants = [participant.name for participant in participants]
-    notThere = 0
-    for competition in competitions:
-        results = competition["results"]
-        for result in results:
-            if result["name"] not in namesOfParticipants:
-                print(result["name"])
-                notThere += 1
-    print(notThere)
+                marks.append((participantName, i, judgeCharString[i], mark, proposedPlacement, danceType))
+    return marks
 
-async def create_results(results, eventEntity):
-    for result in results:
-        participantEntity = await db.participant.find_first(where={"name": result["name"]})
-       
-        resultEntity = await db.result.create(
+async def parse_stage(files, out_queue, workers, bar):
+    loop = asyncio.get_running_loop()
+    if workers > 0:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Keep a few files in flight per worker, in order, so the output order is stable
+            pending = deque()
+            for path in files:
+                pending.append(loop.run_in_executor(executor, parse_competition, path))
+                if len(pending) >= workers * 2:
+                    await emit_parsed(await pending.popleft(), out_queue, bar)
+            while pending:
+                await emit_parsed(await pending.popleft(), out_queue, bar)
+    else:
+        for path in files:
+            await emit_parsed(parse_competition(path), out_queue, bar)
+            # let the other stages run between files
+            await asyncio.sleep(0)
+    await out_queue.put(None)
+
+async def emit_parsed(competition, out_queue, bar):
+    # Parse time is measured inside the (possibly remote) worker
+    metrics.add_stage_time("parse", competition["parseSeconds"])
+    await out_queue.put(competition)
+    bar.update(1)
+
+# --- Stage 2: resolve identities ---
+async def resolve_stage(in_queue, out_queue, seen, bar):
+    """Mark the judges and participants of each competition that still have to be created."""
+    with metrics.stage("resolve"):
+        for judge in await db.judge.find_many():
+            judge_ids.setdefault(judge.name, judge.id)
+        for participant in await db.participant.find_many():
+            participant_ids.setdefault(participant.name, participant.id)
+        metrics.count_statement(2)
+    planned_judges = set(judge_ids)
+    planned_participants = set(participant_ids)
+
+    while True:
+        competition = await in_queue.get()
+        if competition is None:
+            break
+        start = time.perf_counter()
+
+        newJudges = []
+        for judge in competition["judges"]:
+            seen["judges"].add(judge.name)
+            if judge.name not in planned_judges:
+                planned_judges.add(judge.name)
+                newJudges.append({"name": judge.name, "location": judge.location, "link": judge.link})
+
+        newParticipants = []
+        for result in competition["results"]:
+            seen["participants"].add(result.name)
+            if result.name not in planned_participants:
+                planned_participants.add(result.name)
+                newParticipants.append({"name": result.name, "club": result.club, "profileLink": result.profileLink})
+
+        competition["newJudges"] = newJudges
+        competition["newParticipants"] = newParticipants
+        metrics.add_stage_time("resolve", time.perf_counter() - start)
+        await out_queue.put(competition)
+        bar.update(1)
+        bar.set_postfix(waiting=in_queue.qsize())
+    await out_queue.put(None)
+
+# --- Stage 3: write ---
+async def write_stage(in_queue, batch_size, bar):
+    batch = []
+    while True:
+        competition = await in_queue.get()
+        if competition is None:
+            break
+        batch.append(competition)
+        if len(batch) >= batch_size:
+            with metrics.stage("write"):
+                await write_batch(batch)
+            bar.update(len(batch))
+            bar.set_postfix(waiting=in_queue.qsize())
+            batch = []
+    if batch:
+        with metrics.stage("write"):
+            await write_batch(batch)
+        bar.update(len(batch))
+
+async def write_batch(batch):
+    """Write a batch of resolved competitions and their marks in one transaction."""
+    marks = []
+    async with db.tx(timeout=TX_TIMEOUT) as tx:
+        for competition in batch:
+            for judge in competition["newJudges"]:
+                judgeEntity = await tx.judge.create(data=judge)
+                judge_ids[judgeEntity.name] = judgeEntity.id
+            for participant in competition["newParticipants"]:
+                participantEntity = await tx.participant.create(data=participant)
+                participant_ids[participantEntity.name] = participantEntity.id
+            metrics.add_rows("judges", len(competition["newJudges"]))
+            metrics.add_rows("participants", len(competition["newParticipants"]))
+            metrics.count_statement(len(competition["newJudges"]) + len(competition["newParticipants"]))
+
+            marks.extend(await create_competition(tx, competition))
+
+        # Inside the transaction, so a batch is never committed without its marks
+        async with tx.batch_() as batcher:
+            for mark in marks:
+                batcher.mark.create(data=mark)
+    metrics.add_rows("Mark", len(marks))
+    metrics.count_statement(len(marks))
+
+async def create_competition(tx, competition):
+    """Create the competition, its event, results and rounds, return the mark rows to insert."""
+    competitionEntity = await tx.competition.create(
+        data={
+            "sourceId": competition["sourceId"],
+            "title": competition["title"],
+            "date": competition["date"],
+            "location": competition["location"]
+        }
+    )
+
+    category = competition["category"]
+    eventJudgeIds = list(dict.fromkeys(judge_ids[judge.name] for judge in competition["judges"]))
+    eventEntity = await tx.event.create(
+        data={
+            "name": competitionEntity.title,
+            "competitionId": competitionEntity.id,
+            "falseData": competition["falseData"],
+            "ageGroup": category["ageGroup"],
+            "danceClass": category["danceClass"],
+            "style": category["style"],
+            "date": category["date"],
+            "judges": {"connect": [{"id": judgeId} for judgeId in eventJudgeIds]}
+        }
+    )
+
+    resultIds = {}
+    for result in competition["results"]:
+        participantId = participant_ids[result.name]
+        resultEntity = await tx.result.create(
             data={
                 "event": {
                     "connect": {"id": eventEntity.id}
                 },
                 "participant": {
-                    "connect": {"id": participantEntity.id}
+                    "connect": {"id": participantId}
                 },
-                "position": result["position"],
-                "number": result["number"],
-                "section": result["section"],
+                "position": result.position,
+                "number": result.number,
+                "section": result.section,
             }
         )
+        resultIds.setdefault(result.name, resultEntity.id)
+
+    metrics.add_rows("Competition")
+    metrics.add_rows("Event")
+    metrics.add_rows("Result", len(competition["results"]))
+    metrics.add_rows("Round", len(competition["rounds"]))
+    metrics.count_statement(2 + len(competition["results"]) + len(competition["rounds"]))
 
-async def create_judges():
-    list_of_judges = []
-    for competition in tqdm(competitions, desc="Creating judges"):
-        for judges in competition["judges"]:
-            #print(list_of_judges)
-
-            judgeName = "-".join(judges["name"].split("-"))
-            if judges["name"] not in list_of_judges:
-                judgeEntity = await db.judge.create(
-                    data={
-                        "name": judges["name"],
-                        "location": judges["location"],
-                        "link": judges["link"]
-                    }
-                )
-                list_of_judges.append(judgeEntity.name)
-
-
-async def check_judges():
+    judgeIds = [judge_ids[judge.name] for judge in competition["judges"]]
+    marks = []
+    for _round in competition["rounds"]:
+        roundEntity = await tx.round.create(
+            data={
+                "name": _round["name"],
+                "eventId": eventEntity.id
+            }
+        )
+        for participantName, judgeIndex, judgeSign, mark, proposedPlacement, danceType in _round["marks"]:
+            marks.append({
+                "round": {
+                    "connect": {"id": roundEntity.id}
+                },
+                "participant": {
+                    "connect": {"id": participant_ids[participantName]}
+                },
+                "judge": {
+                    "connect": {"id": judgeIds[judgeIndex]}
+                },
+                "judgeSign": judgeSign,
+                "mark": mark,
+                "proposedPlacement": proposedPlacement,
+                "danceType": danceType,
+                "result": {
+                    "connect": {"id": resultIds[participantName]}
+                }
+            })
+    return marks
+
+# --- Checks ---
+async def check_participants(names):
+    participants = await db.participant.find_many()
+    namesOfParticipants = {participant.name for participant in participants}
+    notThere = 0
+    for name in names:
+        if name not in namesOfParticipants:
+            print(name)
+            notThere += 1
+    print(notThere)
+
+async def check_judges(names):
     #check alll competitions that the judges are in the database
     judges = await db.judge.find_many()
-    namesOfJudges = [judge.name for judge in judges]
+    namesOfJudges = {judge.name for judge in judges}
     notThere = 0
-    for competition in competitions:
-        for judge in competition["judges"]:
-            if judge["name"] not in namesOfJudges:
-                print(judge["name"])
-                notThere += 1
+    for name in names:
+        if name not in namesOfJudges:
+            print(name)
+            notThere += 1
     print(notThere)
-  
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main(parse_args()))
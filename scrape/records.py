@@ -0,0 +1,148 @@
+# scrape/records.py
+# Typed records of a scraped competition, streamed from competition_data/.
+#
+# The merged competition JSON (see download_marks.py) is a nest of dicts with
+# Hungarian keys like row["FordulóRsz."]. read_competition() turns one payload
+# into slotted dataclasses: no per-instance __dict__, attribute access instead
+# of string-keyed lookups, and repeated values (clubs, locations, round names,
+# dances, positions, judge letters) interned so every record shares one copy.
+# iter_competitions() chains file listing, JSON loading and conversion as
+# generators, so only one payload is held at a time.
+#
+# Records are tolerant of broken payloads: missing values become None (or an
+# empty string for text), so validate.py can report them instead of failing.
+import json
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, Optional
+
+# --- Configuration ---
+NUMBER_COLUMN = "FordulóRsz."
+# Columns around the dances: placement and number before, totals/advanced/remark after
+LEADING_COLUMNS = 2
+TRAILING_COLUMNS = 3
+# --- End Configuration ---
+
+SOURCE_ID_RE = re.compile(r"(\d+)\.json$")
+
+
+def intern(value) -> str:
+    """Shared copy of a repeated string, "" for missing values."""
+    return sys.intern(value) if isinstance(value, str) else ""
+
+
+@dataclass(slots=True)
+class Judge:
+    sign: str  # A, B, C... position of the judge in every mark string
+    name: str
+    location: str
+    link: str
+
+
+@dataclass(slots=True)
+class Result:
+    name: str
+    club: str
+    profileLink: str
+    position: str
+    number: str
+    section: str  # last round the couple danced
+
+
+@dataclass(slots=True)
+class MarkRow:
+    number: str
+    # One mark string per dance of the section (one character per judge), None when missing
+    marks: tuple
+
+
+@dataclass(slots=True)
+class Section:
+    title: str
+    dances: tuple  # dance headers, e.g. "S/Samba"
+    danceTypes: tuple  # as stored in Mark.danceType, e.g. "S"
+    rows: list = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Competition:
+    sourceId: Optional[int]
+    title: str
+    date: str
+    location: str
+    judges: list
+    results: list
+    sections: list
+
+
+def judge_from(payload: dict) -> Judge:
+    return Judge(
+        sign=intern(payload.get("id")),
+        name=intern(payload.get("name")),
+        location=intern(payload.get("location")),
+        link=payload.get("link") or "",
+    )
+
+
+def result_from(payload: dict) -> Result:
+    return Result(
+        name=intern(payload.get("name")),
+        club=intern(payload.get("club")),
+        profileLink=intern(payload.get("profileLink")),
+        position=intern(payload.get("position")),
+        number=intern(payload.get("number")),
+        section=intern(payload.get("section")),
+    )
+
+
+def section_from(payload: dict) -> Section:
+    headers = payload.get("headers") or []
+    dances = tuple(intern(header) for header in headers[LEADING_COLUMNS:len(headers) - TRAILING_COLUMNS])
+    rows = [
+        MarkRow(number=intern(row.get(NUMBER_COLUMN)), marks=tuple(row.get(dance) for dance in dances))
+        for row in payload.get("rows") or []
+    ]
+    return Section(
+        title=intern(payload.get("title")),
+        dances=dances,
+        danceTypes=tuple(intern(dance.split("/")[0]) for dance in dances),
+        rows=rows,
+    )
+
+
+def competition_from(payload: dict, sourceId: Optional[int] = None) -> Competition:
+    """Convert one merged competition payload into records."""
+    return Competition(
+        sourceId=sourceId,
+        title=payload.get("title") or "",
+        date=intern(payload.get("date")),
+        location=intern(payload.get("location")),
+        judges=[judge_from(judge) for judge in payload.get("judges") or []],
+        results=[result_from(result) for result in payload.get("results") or []],
+        sections=[section_from(section) for section in payload.get("sections") or []],
+    )
+
+
+def source_id_of(path) -> Optional[int]:
+    #the ksis id is the number in the file name (competition_marks_<id>.json)
+    match = SOURCE_ID_RE.search(str(path))
+    return int(match.group(1)) if match else None
+
+
+def read_competition(path) -> Competition:
+    """Load one competition_marks_<id>.json file as records."""
+    with open(path, "r") as f:
+        payload = json.load(f)
+    return competition_from(payload, source_id_of(path))
+
+
+def iter_files(data_dir) -> Iterator[Path]:
+    yield from sorted(Path(data_dir).glob("*.json"))
+
+
+def iter_competitions(data_dir) -> Iterator[Competition]:
+    """Stream the competitions of a directory, one payload in memory at a time."""
+    for path in iter_files(data_dir):
+        yield read_competition(path)
@@ -0,0 +1,292 @@
+# scrape/replay_server.py
+# Offline stand-in for the Next.js competition API used by the download scripts.
+#
+# Serves /api/competition-results and /api/competition-marks from recorded JSON
+# files (the competition_data/ layout written by download_judges.py and
+# download_marks.py) or from synthetic.py data, with configurable latency,
+# error rate, 404 gaps and rate limiting. With --upstream, ids that are not
+# recorded yet are fetched from the real API and saved (record mode).
+#
+#   python replay_server.py --synthetic --scale 0.1 --latency 80 --error-rate 0.02
+#   python download_marks.py --base-url http://localhost:3001 --range 1 1230 --workers 16 --delay 0
+import argparse
+import hashlib
+import json
+import random
+import signal
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import metrics as run_metrics
+
+# --- Configuration ---
+HOST = "localhost"
+PORT = 3001
+DATA_DIR = Path(__file__).parent / "competition_data"
+UPSTREAM_TIMEOUT = 30
+ENDPOINTS = ("competition-results", "competition-marks")
+# --- End Configuration ---
+
+# Collects the served requests, replaced in main()
+metrics = run_metrics.RunMetrics("replay_server")
+
+
+def split_payload(payload: dict, endpoint: str) -> dict:
+    """Cut a merged competition payload down to what one API endpoint returns."""
+    if endpoint == "competition-marks":
+        return {"title": payload.get("title", ""), "sections": payload.get("sections", [])}
+    return {key: value for key, value in payload.items() if key != "sections"}
+
+
+class RecordedSource:
+    """
+    Responses recorded by the download scripts.
+
+    Marks live in <dir>/competition_marks_<id>.json and results in
+    <dir>/results/competition_marks_<id>.json. A merged file in the top-level
+    directory (as read by migrate.py) can answer both endpoints.
+    """
+
+    def __init__(self, data_dir, upstream=None):
+        self.data_dir = Path(data_dir)
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self._lock = threading.Lock()
+
+    def path(self, endpoint: str, competition_id: int) -> Path:
+        folder = self.data_dir / "results" if endpoint == "competition-results" else self.data_dir
+        return folder / f"competition_marks_{competition_id}.json"
+
+    def get(self, endpoint: str, competition_id: int):
+        """Return the response body for an id, or None when nothing is recorded."""
+        path = self.path(endpoint, competition_id)
+        if path.exists():
+            return path.read_bytes()
+
+        merged = self.path("competition-marks", competition_id)
+        if endpoint == "competition-results" and merged.exists():
+            payload = json.loads(merged.read_bytes())
+            if "results" in payload:
+                return json.dumps(split_payload(payload, endpoint), ensure_ascii=False).encode()
+
+        if self.upstream is not None:
+            return self.record(endpoint, competition_id)
+        return None
+
+    def record(self, endpoint: str, competition_id: int):
+        """Fetch an id from the real API and save it where the download scripts would."""
+        url = f"{self.upstream}/api/{endpoint}?id={competition_id}"
+        try:
+            with urllib.request.urlopen(url, timeout=UPSTREAM_TIMEOUT) as response:
+                body = response.read()
+        except (urllib.error.URLError, TimeoutError) as e:
+            print(f"Error recording {url}: {e}")
+            return None
+
+        path = self.path(endpoint, competition_id)
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(body)
+        metrics.add_rows("recorded")
+        return body
+
+
+class SyntheticSource:
+    """Responses generated by synthetic.py, rendered once at startup."""
+
+    def __init__(self, scale: float, seed: int):
+        import synthetic
+
+        self.bodies = {}
+        for competition_id, payload in synthetic.generate(scale, seed):
+            self.bodies[competition_id] = {
+                endpoint: json.dumps(split_payload(payload, endpoint), ensure_ascii=False).encode()
+                for endpoint in ENDPOINTS
+            }
+
+    def get(self, endpoint: str, competition_id: int):
+        bodies = self.bodies.get(competition_id)
+        return bodies[endpoint] if bodies is not None else None
+
+
+class RateLimiter:
+    """Token bucket shared by all handler threads; `rate` requests per second, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, return 0 on success or the seconds until the next token is available."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class Faults:
+    """
+    Latency and failure injection.
+
+    Gaps are chosen by hashing the id, so the same ids are missing on every run
+    (like the holes in the real id range); errors are random per request.
+    """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, gap_rate=0.0, seed=0):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.gap_rate = gap_rate
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def is_gap(self, competition_id: int) -> bool:
+        if self.gap_rate <= 0:
+            return False
+        digest = hashlib.blake2b(f"{self.seed}:{competition_id}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") / 2 ** 64 < self.gap_rate
+
+    def draw(self) -> tuple[float, bool]:
+        """Return (delay in seconds, whether to fail) for one request."""
+        with self._lock:
+            delay = max(0.0, self._rng.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+            return delay, self._rng.random() < self.error_rate
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    # Set on a per-server subclass by make_server()
+    source = None
+    faults = None
+    limiter = None
+
+    def do_GET(self):
+        start = time.perf_counter()
+        status = self.handle_api()
+        metrics.observe_request(time.perf_counter() - start, status)
+
+    def handle_api(self) -> int:
+        url = urlparse(self.path)
+        endpoint = url.path.rstrip("/").removeprefix("/api/")
+        if endpoint not in ENDPOINTS:
+            return self.send_json(404, {"error": "Not found"})
+
+        ids = parse_qs(url.query).get("id")
+        if not ids or not ids[0].isdigit():
+            return self.send_json(400, {"error": "Competition ID is required"})
+        competition_id = int(ids[0])
+
+        if self.limiter is not None:
+            wait = self.limiter.acquire()
+            if wait > 0:
+                return self.send_json(429, {"error": "Too many requests"}, {"Retry-After": f"{wait:.3f}"})
+
+        delay, fail = self.faults.draw()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            # Same shape as the Next.js route when the upstream fetch throws
+            return self.send_json(500, {"error": f"Failed to fetch {endpoint.replace('-', ' ')}",
+                                        "message": "Injected error"})
+        if self.faults.is_gap(competition_id):
+            return self.send_json(404, {"error": "Competition not found"})
+
+        body = self.source.get(endpoint, competition_id)
+        if body is None:
+            return self.send_json(404, {"error": "Competition not found"})
+        return self.send_body(200, body)
+
+    def send_json(self, status: int, payload: dict, headers=None) -> int:
+        return self.send_body(status, json.dumps(payload).encode(), headers)
+
+    def send_body(self, status: int, body: bytes, headers=None) -> int:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (timeout), that is part of the test
+        return status
+
+    def log_message(self, format, *args):
+        pass  # one line per request would drown the scraper's progress bar
+
+
+def make_server(source, faults: Faults, limiter: RateLimiter = None, host=HOST, port=PORT) -> ThreadingHTTPServer:
+    handler = type("Handler", (ReplayHandler,), {"source": source, "faults": faults, "limiter": limiter})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve recorded or synthetic competition API responses.")
+    parser.add_argument("--host", default=HOST, help=f"Interface to listen on (default: {HOST}).")
+    parser.add_argument("-p", "--port", type=int, default=PORT, help=f"Port to listen on (default: {PORT}).")
+    parser.add_argument("--data-dir", default=str(DATA_DIR),
+                        help=f"Directory with recorded responses (default: {DATA_DIR}).")
+    parser.add_argument("--upstream", default=None,
+                        help="Record mode: fetch ids missing from --data-dir from this API (e.g. http://localhost:3000).")
+    parser.add_argument("--synthetic", action="store_true", help="Serve synthetic.py data instead of recordings.")
+    parser.add_argument("-s", "--scale", type=float, default=1.0, help="Scale of the synthetic data (default: 1).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for synthetic data and faults (default: 0).")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean response latency in ms (default: 0).")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Standard deviation of the latency in ms (default: 0).")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with a 500 (default: 0).")
+    parser.add_argument("--gap-rate", type=float, default=0.0,
+                        help="Fraction of ids that always answer 404 (default: 0).")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="Requests per second before answering 429, 0 for no limit (default: 0).")
+    parser.add_argument("--burst", type=int, default=10, help="Burst size of the rate limit (default: 10).")
+    run_metrics.add_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    global metrics
+    args = parse_args()
+    if args.synthetic:
+        print(f"Generating synthetic data (scale {args.scale}, seed {args.seed})...")
+        source = SyntheticSource(args.scale, args.seed)
+        print(f"Serving {len(source.bodies)} synthetic competitions.")
+    else:
+        source = RecordedSource(args.data_dir, args.upstream)
+        print(f"Serving recordings from {args.data_dir}" + (f", recording from {args.upstream}" if args.upstream else ""))
+
+    faults = Faults(args.latency, args.jitter, args.error_rate, args.gap_rate, args.seed)
+    limiter = RateLimiter(args.rate_limit, args.burst) if args.rate_limit > 0 else None
+    server = make_server(source, faults, limiter, args.host, args.port)
+
+    # Stop cleanly (and write the report) when killed by a benchmark script as well as on Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    with run_metrics.instrument(metrics.name, args.report, args.profile) as metrics:
+        print(f"Listening on http://{args.host}:{args.port}/api/{{{','.join(ENDPOINTS)}}}?id=N (Ctrl-C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            statuses = ", ".join(f"{status}: {count}" for status, count in sorted(metrics.requests["statuses"].items()))
+            print(f"\nServed {metrics.requests['count']} requests ({statuses or 'none'}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+# scrape/replica_sync.py
+# Sync dev.db to the hosted SQLite replica by shipping only the changed row ranges.
+#
+# Every table is cut into ranges by its key: ranges of RANGE_SIZE rowids, or
+# for WITHOUT ROWID tables (HeadToHead, ClubCube, ...) HASH_BUCKETS buckets by a
+# hash of the primary key. Each range gets a checksum: the row count plus the
+# sum of a 32 bit hash of every row, including its key. The checksums of the
+# last sync are kept in the replica, in the _sync_checksums table. A sync
+# computes the local checksums and compares them with the stored ones. Every
+# range that differs is replaced in one transaction: its rows in the replica are
+# deleted, the local rows inserted and its _sync_checksums row updated, so an
+# interrupted sync leaves whole ranges behind and ships the rest next time. A
+# row whose rowid moved to another range (tables rebuilt by delete and insert,
+# like dancer_aliases) replaces its old copy if that range is not shipped yet.
+# Transactions are only committed between ranges, every BATCH_ROWS rows.
+#
+# --verify recomputes the checksums from the replica's own rows instead of
+# trusting _sync_checksums. That catches writes made to the replica by anything
+# else, at the cost of reading every row back.
+#
+# The replica is either a second SQLite file (for testing) or a
+# sqlitecloud:// connection string (needs `pip install sqlitecloud`).
+#
+#   python replica_sync.py replica.db
+#   python replica_sync.py "sqlitecloud://host:8860/dev.db?apikey=..." --verify
+import argparse
+import hashlib
+import logging
+import sqlite3
+import time
+from pathlib import Path
+
+import metrics as run_metrics
+from db_tables import data_tables
+
+# --- Configuration ---
+DB_FILE = Path(__file__).parent / "dev.db"
+# Rowids per checksum range; smaller ranges ship less per change but store more checksums
+RANGE_SIZE = 4096
+# Checksum buckets of a WITHOUT ROWID table
+HASH_BUCKETS = 256
+# Rows written per replica transaction
+BATCH_ROWS = 20000
+CHECKSUM_TABLE = "_sync_checksums"
+# Bookkeeping tables that stay local: the sequences follow the explicit rowids,
+# the change log belongs to to_csv.py
+SKIP_TABLES = {"sqlite_sequence", "ChangeLog", CHECKSUM_TABLE}
+# --- End Configuration ---
+
+# Collects stage timings and shipped rows, replaced in main()
+metrics = run_metrics.RunMetrics("replica_sync")
+
+
+def row_hash(*values) -> int:
+    """32 bit hash of a row; small enough that a range's sum cannot overflow SQLite integers."""
+    return int.from_bytes(hashlib.blake2b(repr(values).encode(), digest_size=4).digest(), "big")
+
+
+def connect_replica(target: str):
+    """Open the replica: a sqlitecloud:// URL or the path of a local SQLite file."""
+    if target.startswith("sqlitecloud://"):
+        try:
+            import sqlitecloud
+        except ImportError:
+            logging.error("sqlitecloud is not installed, run 'pip install sqlitecloud' to sync to SQLite Cloud.")
+            exit(1)
+        return sqlitecloud.connect(target)
+    conn = sqlite3.connect(target)
+    conn.create_function("row_hash", -1, row_hash, deterministic=True)
+    return conn
+
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def synced_tables(conn) -> list[tuple[str, str]]:
+    """(name, CREATE statement) of the ordinary tables to sync, parents before children."""
+    return [(name, sql) for name, sql in data_tables(conn) if name not in SKIP_TABLES]
+
+
+def columns(conn, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({quote(table)})").fetchall()]
+
+
+def ensure_schema(local, replica) -> list[str]:
+    """Create missing tables, columns and indexes in the replica, return the synced table names."""
+    replica_tables = {row[0] for row in replica.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()}
+    tables = []
+    for name, sql in synced_tables(local):
+        if name not in replica_tables:
+            replica.execute(sql)
+        else:
+            existing = set(columns(replica, name))
+            for row in local.execute(f"PRAGMA table_info({quote(name)})").fetchall():
+                if row[1] not in existing:
+                    column_type = row[2] or ""
+                    replica.execute(f"ALTER TABLE {quote(name)} ADD COLUMN {quote(row[1])} {column_type}")
+        tables.append(name)
+
+    replica_indexes = {row[0] for row in replica.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()}
+    for name, table, sql in local.execute("SELECT name, tbl_name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchall():
+        if table in tables and name not in replica_indexes:
+            replica.execute(sql)
+
+    replica.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {CHECKSUM_TABLE} (
+            "tableName" TEXT NOT NULL,
+            "bucket" INTEGER NOT NULL,
+            "rows" INTEGER NOT NULL,
+            "checksum" INTEGER NOT NULL,
+            PRIMARY KEY ("tableName", "bucket")
+        )
+        """
+    )
+    replica.commit()
+    return tables
+
+
+# Key of the tables that are stored by rowid
+ROWID_KEY = ["rowid"]
+
+
+def key_columns(conn, table: str) -> list[str]:
+    """The columns rows are stored by: rowid, or the primary key of a WITHOUT ROWID table."""
+    try:
+        conn.execute(f"SELECT rowid FROM {quote(table)} LIMIT 0")
+        return ROWID_KEY
+    except sqlite3.OperationalError:
+        rows = conn.execute("SELECT name FROM pragma_table_info(?) WHERE pk > 0 ORDER BY pk", (table,)).fetchall()
+        return [name for (name,) in rows]
+
+
+def key_names(key: list[str]) -> list[str]:
+    return ["rowid" if key == ROWID_KEY else quote(name) for name in key]
+
+
+def bucket_sql(key: list[str]) -> str:
+    """SQL expression of the checksum range of a row, see bucket_of()."""
+    if key == ROWID_KEY:
+        return f"rowid / {RANGE_SIZE}"
+    return f"row_hash({', '.join(key_names(key))}) % {HASH_BUCKETS}"
+
+
+def bucket_of(key: list[str], key_values: tuple) -> int:
+    """Checksum range of a row from its key values, the same as bucket_sql() computes."""
+    if key == ROWID_KEY:
+        return key_values[0] // RANGE_SIZE
+    return row_hash(*key_values) % HASH_BUCKETS
+
+
+def select_columns(key: list[str], column_names: list[str]) -> list[str]:
+    """Selected names of a row: the rowid in front of the columns, or just the columns (the key is among them)."""
+    if key == ROWID_KEY:
+        return ["rowid", *map(quote, column_names)]
+    return list(map(quote, column_names))
+
+
+def range_checksums(conn, table: str, column_names: list[str], key: list[str], computed_in_sql: bool = True) -> dict:
+    """
+    Checksums of every key range of a table.
+
+    Returns:
+        bucket -> (row count, sum of row hashes)
+    """
+    values = ", ".join(select_columns(key, column_names))
+    if computed_in_sql:
+        rows = conn.execute(
+            f"SELECT {bucket_sql(key)}, COUNT(*), SUM(row_hash({values})) FROM {quote(table)} GROUP BY 1"
+        ).fetchall()
+        return {bucket: (count, checksum) for bucket, count, checksum in rows}
+
+    # Remote connections cannot run row_hash(), fetch the rows and hash them here
+    positions = key_positions(key, column_names)
+    checksums = {}
+    cursor = conn.execute(f"SELECT {values} FROM {quote(table)}")
+    while True:
+        rows = cursor.fetchmany(10000)
+        if not rows:
+            break
+        for row in rows:
+            bucket = bucket_of(key, tuple(row[i] for i in positions))
+            count, checksum = checksums.get(bucket, (0, 0))
+            checksums[bucket] = (count + 1, checksum + row_hash(*row))
+    return checksums
+
+
+def key_positions(key: list[str], column_names: list[str]) -> list[int]:
+    """Where the key values are in a row of select_columns()."""
+    if key == ROWID_KEY:
+        return [0]
+    return [column_names.index(name) for name in key]
+
+
+def stored_checksums(replica, table: str) -> dict:
+    rows = replica.execute(
+        f'SELECT "bucket", "rows", "checksum" FROM {CHECKSUM_TABLE} WHERE "tableName" = ?', (table,)
+    ).fetchall()
+    return {bucket: (count, checksum) for bucket, count, checksum in rows}
+
+
+def diff_ranges(local: dict, remote: dict) -> list[int]:
+    """Buckets whose rows differ, including buckets that only exist on one side."""
+    return sorted(bucket for bucket in local.keys() | remote.keys() if local.get(bucket) != remote.get(bucket))
+
+
+def bucket_rows(conn, table: str, names: list[str], key: list[str], buckets: list[int],
+                computed_in_sql: bool = True) -> dict:
+    """
+    Rows of the given hash buckets of a WITHOUT ROWID table, read in one pass over the table.
+
+    Args:
+        names: Selected (quoted) column names, the key columns among them
+
+    Returns:
+        bucket -> list of rows
+    """
+    grouped = {bucket: [] for bucket in buckets}
+    if computed_in_sql:
+        cursor = conn.execute(
+            f"SELECT {bucket_sql(key)}, {', '.join(names)} FROM {quote(table)} "
+            f"WHERE {bucket_sql(key)} IN ({', '.join('?' * len(buckets))})",
+            buckets,
+        )
+    else:
+        # Remote connections cannot run row_hash(), bucket the rows here
+        positions = [names.index(name) for name in key_names(key)]
+        cursor = conn.execute(f"SELECT {', '.join(names)} FROM {quote(table)}")
+    while True:
+        rows = cursor.fetchmany(10000)
+        if not rows:
+            break
+        for row in rows:
+            if computed_in_sql:
+                bucket, *row = row
+            else:
+                bucket = bucket_of(key, tuple(row[i] for i in positions))
+                if bucket not in grouped:
+                    continue
+            grouped[bucket].append(tuple(row))
+    return grouped
+
+
+def ship_ranges(local, replica, table: str, column_names: list[str], key: list[str], buckets: list[int],
+                checksums: dict, dry_run: bool = False) -> int:
+    """Replace the given key ranges of the replica with the local rows, return the rows shipped."""
+    names = select_columns(key, column_names)
+    # OR REPLACE: a row whose rowid moved takes the place of its old copy in a range not shipped yet
+    insert = f"INSERT OR REPLACE INTO {quote(table)} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+    if key != ROWID_KEY:
+        # Hash buckets are not contiguous, read every changed bucket in one pass rather than a scan each
+        local_rows = bucket_rows(local, table, names, key, buckets)
+        replica_keys = {} if dry_run else bucket_rows(
+            replica, table, key_names(key), key, buckets, computed_in_sql=isinstance(replica, sqlite3.Connection)
+        )
+        delete_key = f"DELETE FROM {quote(table)} WHERE {' AND '.join(f'{name} = ?' for name in key_names(key))}"
+
+    shipped, pending = 0, 0
+    for bucket in buckets:
+        if key == ROWID_KEY:
+            rows = local.execute(
+                f"SELECT {', '.join(names)} FROM {quote(table)} WHERE rowid >= ? AND rowid < ? ORDER BY rowid",
+                (bucket * RANGE_SIZE, (bucket + 1) * RANGE_SIZE),
+            ).fetchall()
+        else:
+            rows = local_rows[bucket]
+        shipped += len(rows)
+        if dry_run:
+            continue
+
+        # The range and its checksum are replaced in the same transaction
+        if key == ROWID_KEY:
+            replica.execute(f"DELETE FROM {quote(table)} WHERE rowid >= ? AND rowid < ?",
+                            (bucket * RANGE_SIZE, (bucket + 1) * RANGE_SIZE))
+        elif replica_keys[bucket]:
+            replica.executemany(delete_key, replica_keys[bucket])
+        replica.execute(f'DELETE FROM {CHECKSUM_TABLE} WHERE "tableName" = ? AND "bucket" = ?', (table, bucket))
+        if rows:
+            replica.executemany(insert, rows)
+        if bucket in checksums:
+            count, checksum = checksums[bucket]
+            replica.execute(
+                f'INSERT INTO {CHECKSUM_TABLE} ("tableName", "bucket", "rows", "checksum") VALUES (?, ?, ?, ?)',
+                (table, bucket, count, checksum),
+            )
+
+        pending += len(rows) + 1
+        if pending >= BATCH_ROWS:
+            replica.commit()
+            metrics.count_statement()
+            pending = 0
+    if not dry_run:
+        replica.commit()
+    return shipped
+
+
+def sync(local, replica, verify: bool = False, dry_run: bool = False) -> dict:
+    """
+    Bring the replica in line with the local database.
+
+    Args:
+        local: sqlite3 connection to dev.db
+        replica: Connection from connect_replica()
+        verify: Compare against checksums recomputed from the replica's rows
+            rather than the ones stored by the last sync
+        dry_run: Only report what would be shipped
+
+    Returns:
+        table -> {"ranges": changed ranges, "rows": rows shipped}
+    """
+    local.create_function("row_hash", -1, row_hash, deterministic=True)
+    with metrics.stage("schema"):
+        tables = ensure_schema(local, replica) if not dry_run else [name for name, _ in synced_tables(local)]
+    replica.execute("PRAGMA foreign_keys = OFF")  # ranges of parents and children arrive in any order
+
+    summary = {}
+    for table in tables:
+        column_names = columns(local, table)
+        key = key_columns(local, table)
+        with metrics.stage("checksum"):
+            local_checksums = range_checksums(local, table, column_names, key)
+            if verify:
+                remote_checksums = range_checksums(replica, table, column_names, key,
+                                                   computed_in_sql=isinstance(replica, sqlite3.Connection))
+            else:
+                try:
+                    remote_checksums = stored_checksums(replica, table)
+                except sqlite3.OperationalError:
+                    remote_checksums = {}  # dry run against a replica that was never synced
+        buckets = diff_ranges(local_checksums, remote_checksums)
+        with metrics.stage("ship"):
+            rows = ship_ranges(local, replica, table, column_names, key, buckets, local_checksums, dry_run) \
+                if buckets else 0
+        metrics.add_rows(table, rows)
+        summary[table] = {"ranges": len(buckets), "rows": rows, "totalRanges": len(local_checksums)}
+    return summary
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sync dev.db to a SQLite replica by shipping changed row ranges.")
+    parser.add_argument("replica", help="Replica: path of a SQLite file or a sqlitecloud:// connection string.")
+    parser.add_argument("--db", default=str(DB_FILE), help=f"Path to the local database (default: {DB_FILE}).")
+    parser.add_argument("--verify", action="store_true",
+                        help="Recompute the replica checksums from its rows instead of trusting the stored ones.")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="Only report the ranges that would be shipped.")
+    run_metrics.add_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    global metrics
+    args = parse_args()
+    local = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    replica = connect_replica(args.replica)
+    start = time.perf_counter()
+    try:
+        with run_metrics.instrument(metrics.name, args.report, args.profile) as metrics:
+            summary = sync(local, replica, args.verify, args.dry_run)
+    finally:
+        local.close()
+        replica.close()
+
+    verb = "Would ship" if args.dry_run else "Shipped"
+    for table, counts in summary.items():
+        if counts["ranges"]:
+            print(f"  {table:<22} {counts['ranges']:>5}/{counts['totalRanges']} ranges, {counts['rows']} rows")
+    print(f"{verb} {sum(c['rows'] for c in summary.values())} rows in "
+          f"{sum(c['ranges'] for c in summary.values())} ranges ({time.perf_counter() - start:.2f}s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# scrape/search_index.py
+# Full-text search over participants (couples), clubs, judges and competitions.
+#
+# The index is an SQLite FTS5 table living next to the Prisma tables in dev.db.
+# It is rebuilt at the end of every migration (see migrate.py) and can be
+# rebuilt by hand for an existing database with `python search_index.py --rebuild`.
+import argparse
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+# --- Configuration ---
+DB_FILE = Path(__file__).parent / "dev.db"
+INDEX_TABLE = "SearchIndex"
+KINDS = ("participant", "club", "judge", "competition")
+# unicode61 with remove_diacritics 2 folds Hungarian accents (á, é, ő, ű, ...)
+# so "Horvath" finds "Horváth". Prefix indexes keep "sza*" style queries fast.
+TOKENIZER = "unicode61 remove_diacritics 2"
+PREFIX_LENGTHS = "2 3 4"
+# bm25 column weights for (name, detail)
+NAME_WEIGHT = 10.0
+DETAIL_WEIGHT = 1.0
+# --- End Configuration ---
+
+
+def create_index(conn: sqlite3.Connection) -> None:
+    """Drop and recreate the empty FTS5 table."""
+    conn.execute(f'DROP TABLE IF EXISTS "{INDEX_TABLE}"')
+    conn.execute(
+        f"""
+        CREATE VIRTUAL TABLE "{INDEX_TABLE}" USING fts5(
+            kind UNINDEXED,
+            refId UNINDEXED,
+            name,
+            detail,
+            tokenize = '{TOKENIZER}',
+            prefix = '{PREFIX_LENGTHS}'
+        )
+        """
+    )
+
+
+def rebuild_index(conn: sqlite3.Connection) -> dict:
+    """
+    Rebuild the search index from the current contents of the database.
+
+    Args:
+        conn: Open connection to dev.db
+
+    Returns:
+        Dictionary with the number of indexed rows per kind
+    """
+    create_index(conn)
+
+    # Couples are stored as "Leader - Follower", the tokenizer splits on the
+    # dash so either partner's name matches on its own.
+    conn.execute(
+        f"""
+        INSERT INTO "{INDEX_TABLE}" (kind, refId, name, detail)
+        SELECT 'participant', id, name, club FROM participants
+        """
+    )
+    # Clubs have no table of their own, the lowest participant id stands in as reference.
+    conn.execute(
+        f"""
+        INSERT INTO "{INDEX_TABLE}" (kind, refId, name, detail)
+        SELECT 'club', MIN(id), club, COUNT(*) || ' couples' FROM participants
+        WHERE club != '' GROUP BY club
+        """
+    )
+    conn.execute(
+        f"""
+        INSERT INTO "{INDEX_TABLE}" (kind, refId, name, detail)
+        SELECT 'judge', id, name, location FROM judges
+        """
+    )
+    conn.execute(
+        f"""
+        INSERT INTO "{INDEX_TABLE}" (kind, refId, name, detail)
+        SELECT 'competition', id, title, COALESCE(location, '') || ' ' || COALESCE(date, '')
+        FROM Competition
+        """
+    )
+    conn.execute(f"INSERT INTO \"{INDEX_TABLE}\"(\"{INDEX_TABLE}\") VALUES ('optimize')")
+    conn.commit()
+
+    counts = dict(
+        conn.execute(f'SELECT kind, COUNT(*) FROM "{INDEX_TABLE}" GROUP BY kind').fetchall()
+    )
+    return counts
+
+
+def build_match_query(query: str) -> str:
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term, so "szabo ani" matches
+    "Szabó Anita" and FTS syntax characters in the input are harmless.
+    """
+    terms = re.findall(r"\w+", query)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search(conn: sqlite3.Connection, query: str, kind: str = None, limit: int = 20) -> list[dict]:
+    """
+    Search the index for participants, clubs, judges and competitions.
+
+    Args:
+        conn: Open connection to dev.db
+        query: Free text, accents are optional
+        kind: Restrict hits to one of KINDS (default: all)
+        limit: Maximum number of hits to return
+
+    Returns:
+        List of hits ordered by relevance, best first
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    sql = f"""
+        SELECT kind, refId, name, detail,
+               bm25("{INDEX_TABLE}", 0, 0, {NAME_WEIGHT}, {DETAIL_WEIGHT}) AS score
+        FROM "{INDEX_TABLE}"
+        WHERE "{INDEX_TABLE}" MATCH ?
+    """
+    params = [match]
+    if kind is not None:
+        sql += " AND kind = ?"
+        params.append(kind)
+    sql += " ORDER BY score LIMIT ?"
+    params.append(limit)
+
+    return [
+        {"kind": row[0], "id": row[1], "name": row[2], "detail": row[3], "score": row[4]}
+        for row in conn.execute(sql, params)
+    ]
+
+
+def index_exists(conn: sqlite3.Connection) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (INDEX_TABLE,)
+    ).fetchone() is not None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Search participants, clubs, judges and competitions.")
+    parser.add_argument("query", nargs="*", help="Words to search for, accents are optional.")
+    parser.add_argument("-k", "--kind", choices=KINDS, default=None,
+                        help="Only return hits of this kind.")
+    parser.add_argument("-n", "--limit", type=int, default=20,
+                        help="Maximum number of hits (default: 20).")
+    parser.add_argument("--db", default=str(DB_FILE),
+                        help=f"Path to the SQLite database (default: {DB_FILE}).")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Rebuild the index from the database before searching.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.rebuild or not index_exists(conn):
+            start = time.perf_counter()
+            counts = rebuild_index(conn)
+            elapsed = time.perf_counter() - start
+            print(f"Indexed {sum(counts.values())} rows {counts} in {elapsed:.2f}s")
+
+        if not args.query:
+            return
+
+        start = time.perf_counter()
+        hits = search(conn, " ".join(args.query), kind=args.kind, limit=args.limit)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        for hit in hits:
+            print(f"[{hit['kind']:<11}] {hit['id']:>6}  {hit['name']}  ({hit['detail']})")
+        print(f"{len(hits)} hits in {elapsed_ms:.1f} ms")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
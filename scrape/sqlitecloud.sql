@@ -1,5 +1,6 @@
 CREATE TABLE "Competition" (
     "id" INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    "sourceId" INTEGER,
     "title" TEXT NOT NULL,
     "date" TEXT,
     "location" TEXT
@@ -10,6 +11,10 @@ CREATE TABLE "Event" (
     "name" TEXT NOT NULL,
     "competitionId" INTEGER NOT NULL,
     "falseData" BOOLEAN NOT NULL DEFAULT false,
+    "ageGroup" TEXT,
+    "danceClass" TEXT,
+    "style" TEXT,
+    "date" TEXT,
     CONSTRAINT "Event_competitionId_fkey" FOREIGN KEY ("competitionId") REFERENCES "Competition" ("id") ON DELETE RESTRICT ON UPDATE CASCADE
 )
 CREATE TABLE "Result" (
@@ -67,7 +72,36 @@ CREATE TABLE "_ParticipantToRound" (
     CONSTRAINT "_ParticipantToRound_A_fkey" FOREIGN KEY ("A") REFERENCES "participants" ("id") ON DELETE CASCADE ON UPDATE CASCADE,
     CONSTRAINT "_ParticipantToRound_B_fkey" FOREIGN KEY ("B") REFERENCES "Round" ("id") ON DELETE CASCADE ON UPDATE CASCADE
 )
+CREATE TABLE "dancers" (
+    "id" INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    "name" TEXT NOT NULL,
+    "normalizedName" TEXT NOT NULL
+)
+CREATE TABLE "dancer_aliases" (
+    "alias" TEXT NOT NULL PRIMARY KEY,
+    "dancerId" INTEGER NOT NULL,
+    CONSTRAINT "dancer_aliases_dancerId_fkey" FOREIGN KEY ("dancerId") REFERENCES "dancers" ("id") ON DELETE CASCADE ON UPDATE CASCADE
+)
+CREATE TABLE "couple_members" (
+    "participantId" INTEGER NOT NULL,
+    "dancerId" INTEGER NOT NULL,
+    "role" TEXT NOT NULL,
+
+    PRIMARY KEY ("participantId", "role"),
+    CONSTRAINT "couple_members_participantId_fkey" FOREIGN KEY ("participantId") REFERENCES "participants" ("id") ON DELETE CASCADE ON UPDATE CASCADE,
+    CONSTRAINT "couple_members_dancerId_fkey" FOREIGN KEY ("dancerId") REFERENCES "dancers" ("id") ON DELETE CASCADE ON UPDATE CASCADE
+)
+CREATE INDEX "Event_ageGroup_danceClass_style_date_idx" ON "Event"("ageGroup", "danceClass", "style", "date")
+CREATE INDEX "Event_date_idx" ON "Event"("date")
+CREATE INDEX "Event_competitionId_idx" ON "Event"("competitionId")
+CREATE INDEX "Result_eventId_idx" ON "Result"("eventId")
+CREATE INDEX "Result_participantId_idx" ON "Result"("participantId")
+CREATE INDEX "Round_eventId_idx" ON "Round"("eventId")
+CREATE INDEX "Mark_roundId_idx" ON "Mark"("roundId")
+CREATE UNIQUE INDEX "Competition_sourceId_key" ON "Competition"("sourceId")
 CREATE UNIQUE INDEX "_EventToJudge_AB_unique" ON "_EventToJudge"("A", "B")
 CREATE INDEX "_EventToJudge_B_index" ON "_EventToJudge"("B")
+CREATE INDEX "dancer_aliases_dancerId_idx" ON "dancer_aliases"("dancerId")
+CREATE INDEX "couple_members_dancerId_idx" ON "couple_members"("dancerId")
 CREATE UNIQUE INDEX "_ParticipantToRound_AB_unique" ON "_ParticipantToRound"("A", "B")
 CREATE INDEX "_ParticipantToRound_B_index" ON "_ParticipantToRound"("B")
\ No newline at end of file
@@ -0,0 +1,400 @@
+# scrape/synthetic.py
+# Generate realistic synthetic competition data at a multiple of the real archive size.
+#
+# The generator produces the same merged competition JSON that migrate.py reads
+# (title, location, judges, results, sections with X/placement rows) and, from
+# the same stream, a ready-made SQLite database in the dev.db schema. Everything
+# is derived from a seed, so a given (scale, seed) always produces identical data.
+#
+#   python synthetic.py --scale 10 --out bench_data/scale-10 --json --db
+import argparse
+import json
+import math
+import random
+import re
+import sqlite3
+from pathlib import Path
+
+from categories import parse_title
+
+# --- Configuration ---
+SCHEMA_FILE = Path(__file__).parent / "sqlitecloud.sql"
+# Size of the real archive at scale 1
+ARCHIVE_COMPETITIONS = 12300
+ARCHIVE_COUPLES = 6900
+ARCHIVE_JUDGES = 480
+EVENTS_PER_MEETING = 6
+FINALISTS = 6
+DB_BATCH_SIZE = 5000
+# --- End Configuration ---
+
+SURNAMES = [
+    "Nagy", "Kovács", "Tóth", "Szabó", "Horváth", "Varga", "Kiss", "Molnár", "Németh", "Farkas",
+    "Balogh", "Papp", "Takács", "Juhász", "Lakatos", "Mészáros", "Oláh", "Simon", "Rácz", "Fekete",
+    "Szilágyi", "Török", "Fehér", "Balázs", "Gál", "Kis", "Szűcs", "Kocsis", "Orsós", "Pintér",
+    "Fodor", "Szalai", "Sipos", "Magyar", "Lukács", "Gulyás", "Biró", "Király", "Katona", "László",
+]
+MALE_NAMES = [
+    "Bence", "Máté", "Levente", "Dávid", "Dániel", "Ádám", "Balázs", "Zoltán", "Péter", "Gábor",
+    "Tamás", "Márk", "Noel", "Barnabás", "Zsombor", "Botond", "Áron", "Marcell", "Olivér", "Milán",
+]
+FEMALE_NAMES = [
+    "Hanna", "Anna", "Luca", "Zoé", "Léna", "Lili", "Emma", "Réka", "Fanni", "Boglárka",
+    "Dorina", "Eszter", "Petra", "Titanilla", "Zsófia", "Jázmin", "Nóra", "Adél", "Kata", "Villő",
+]
+CLUBS = [
+    "Valcer TáncSport Egyesület", "Eraklin Táncklub Egyesület", "PresiDance TSE", "Lorigo Táncsport Egyesület",
+    "Flamenco 2001 Táncsport Egyesület", "Spirit Tánc Sport Egyesület", "Forma Táncsport Egyesület",
+    "Szigó KTSE", "Kapronczai AMI Komló", "Miskolcz-Revital TSE", "Stúdió 2000 TSE", "Quality Dance TSE",
+    "Corso Tánc Sportegyesület", "Pro-Art Táncstúdió", "Szilver Táncsport Egyesület", "DanceNet TSE",
+]
+LOCATIONS = [
+    "Budapest", "Debrecen", "Szeged", "Nagykanizsa", "Miskolc", "Pécs", "Győr", "Orosháza",
+    "Hatvan", "Csongrád", "Érd", "Siófok", "Komló", "Eger", "Kecskemét", "Nyíregyháza",
+]
+MEETINGS = ["Kupa", "Területi Bajnokság", "Országos Bajnokság", "Klubközi Táncverseny", "Ranglista verseny"]
+AGE_GROUPS = [
+    ("Gyermek I", 3), ("Gyermek II", 8), ("Junior I", 13), ("Junior II", 16),
+    ("Ifjúsági", 19), ("Felnőtt", 21), ("Senior I", 4), ("Senior II", 3), ("Senior III", 2),
+]
+CLASSES = [("E", 28), ("D", 26), ("C", 19), ("B", 9), ("A", 3)]
+STYLES = [("LAT", 57), ("Standard", 43)]
+DANCES = {
+    "LAT": ["S/Samba", "C/Cha-cha-cha", "R/Rumba", "P/Paso doble", "J/Jive"],
+    "Standard": ["W/Angolkeringő", "T/Tangó", "V/Bécsi keringő", "F/Slowfox", "Q/Quickstep"],
+}
+DANCES_PER_CLASS = {"E": 3, "D": 4, "C": 5, "B": 5, "A": 5}
+JUDGE_SIGNS = "ABCDEFGHIJKLM"
+
+
+def weighted(rng: random.Random, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+
+def unique_names(rng: random.Random, count: int, make) -> list[str]:
+    names, seen = [], set()
+    while len(names) < count:
+        name = make()
+        if name in seen:
+            # Disambiguate like the archive does with second given names
+            name = f"{name} {rng.choice(MALE_NAMES + FEMALE_NAMES)}"
+            if name in seen:
+                continue
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def build_pools(scale: float, seed: int) -> dict:
+    """Create the judges and the couples (bucketed by age group) shared by all competitions."""
+    rng = random.Random(seed)
+    judge_count = max(len(JUDGE_SIGNS), int(ARCHIVE_JUDGES * scale))
+    couple_count = max(len(AGE_GROUPS) * FINALISTS, int(ARCHIVE_COUPLES * scale))
+
+    judge_names = unique_names(
+        rng, judge_count, lambda: f"{rng.choice(SURNAMES)} {rng.choice(MALE_NAMES + FEMALE_NAMES)}"
+    )
+    judges = []
+    for name in judge_names:
+        location = rng.choice(LOCATIONS)
+        judges.append({"name": name, "location": location, "link": f"rozhodca.php?meno={name}&mesto={location}"})
+
+    couple_names = unique_names(
+        rng, couple_count,
+        lambda: (f"{rng.choice(SURNAMES)} {rng.choice(MALE_NAMES)} - "
+                 f"{rng.choice(SURNAMES)} {rng.choice(FEMALE_NAMES)}"),
+    )
+    couples_by_age = {age: [] for age, _ in AGE_GROUPS}
+    couples = []
+    for index, name in enumerate(couple_names):
+        couple = {
+            "name": name,
+            "club": rng.choice(CLUBS),
+            "profileLink": f"par.php?id={index + 1}",
+            "skill": rng.gauss(0, 1),
+        }
+        couples.append(couple)
+        couples_by_age[weighted(rng, AGE_GROUPS)].append(couple)
+    return {"judges": judges, "couples": couples, "couples_by_age": couples_by_age}
+
+
+def round_names(couple_count: int) -> list[tuple[str, int]]:
+    """Rounds of an event as (title, couples advancing), ending with the final."""
+    sizes = [couple_count]
+    while sizes[-1] > FINALISTS + 1:
+        sizes.append(max(FINALISTS, math.ceil(sizes[-1] / 2)))
+    rounds = []
+    for index, size in enumerate(sizes):
+        if index == len(sizes) - 1:
+            rounds.append(("Döntő", 0))
+        elif index == len(sizes) - 2:
+            rounds.append(("Elődöntő", sizes[index + 1]))
+        else:
+            rounds.append((f"{index + 1}.Forduló", sizes[index + 1]))
+    return rounds
+
+
+def judge_round(rng, couples, judges, dances, advancing, final):
+    """
+    Let every judge mark every couple in every dance.
+
+    Returns the mark strings per couple and dance, and the couples ordered by result.
+    """
+    marks = {id(couple): {} for couple in couples}
+    totals = {id(couple): 0.0 for couple in couples}
+    for dance in dances:
+        for _ in judges:
+            perceived = sorted(couples, key=lambda couple: -(couple["skill"] + rng.gauss(0, 0.7)))
+            for place, couple in enumerate(perceived):
+                if final:
+                    marks[id(couple)].setdefault(dance, []).append(str(place + 1))
+                    totals[id(couple)] += place
+                else:
+                    marked = place < advancing
+                    marks[id(couple)].setdefault(dance, []).append("X" if marked else "-")
+                    totals[id(couple)] -= marked
+    ranked = sorted(couples, key=lambda couple: totals[id(couple)])
+    return {key: {dance: "".join(values) for dance, values in per_dance.items()} for key, per_dance in marks.items()}, ranked
+
+
+def generate_competition(rng: random.Random, pools: dict, meeting: dict) -> dict:
+    """Generate one competition payload in the merged format read by migrate.py."""
+    age = weighted(rng, AGE_GROUPS)
+    cls = weighted(rng, CLASSES)
+    style = weighted(rng, STYLES)
+    title = f"{meeting['name']} - {age} {cls} {style} {meeting['date']}"
+
+    pool = pools["couples_by_age"][age] or pools["couples"]
+    couple_count = min(len(pool), max(1, int(rng.expovariate(1 / 5.5)) + 1))
+    couples = rng.sample(pool, couple_count)
+    judge_count = rng.choice([3, 5, 5, 5, 7, 7, 9])
+    judges = [
+        dict(judge, id=JUDGE_SIGNS[index])
+        for index, judge in enumerate(rng.sample(meeting["judges"], min(judge_count, len(meeting["judges"]))))
+    ]
+    dances = DANCES[style][:DANCES_PER_CLASS[cls]]
+    headers = ["Helyezés", "FordulóRsz.", *dances, "Összesen", "Továbbjutott", "Megjegyzés"]
+    numbers = {id(couple): str(100 + index) for index, couple in enumerate(couples)}
+
+    sections, results = [], []
+    remaining = couples
+    for round_title, advancing in round_names(couple_count):
+        final = advancing == 0
+        marks, ranked = judge_round(rng, remaining, judges, dances, advancing, final)
+        sections.append({
+            "title": round_title,
+            "headers": headers,
+            "rows": [
+                {"FordulóRsz.": numbers[id(couple)], **marks[id(couple)]}
+                for couple in remaining
+            ],
+        })
+        if final:
+            placed = ranked
+            first_place = 1
+        else:
+            placed = ranked[advancing:]
+            first_place = advancing + 1
+        for offset, couple in enumerate(placed):
+            if final or len(placed) == 1:
+                position = f"{first_place + offset}."
+            else:
+                position = f"{first_place}. - {first_place + len(placed) - 1}."
+            results.append({
+                "position": position,
+                "number": numbers[id(couple)],
+                "name": couple["name"],
+                "club": couple["club"],
+                "section": round_title,
+                "profileLink": couple["profileLink"],
+            })
+        remaining = ranked[:advancing] if not final else []
+
+    results.sort(key=lambda result: int(re.match(r"\d+", result["position"]).group(0)))
+    return {
+        "title": title,
+        "date": meeting["date"],
+        "location": meeting["location"],
+        "judges": judges,
+        "results": results,
+        "sections": sections,
+    }
+
+
+def generate(scale: float = 1.0, seed: int = 0):
+    """
+    Yield synthetic competitions for `scale` times the real archive.
+
+    Args:
+        scale: Multiple of the real archive size (1, 10, 100, or fractions for quick runs)
+        seed: Random seed, the same (scale, seed) always gives the same data
+
+    Yields:
+        (competition id, payload) tuples, ids start at 1
+    """
+    pools = build_pools(scale, seed)
+    rng = random.Random(seed + 1)
+    total = max(1, int(ARCHIVE_COMPETITIONS * scale))
+    meeting = None
+    for competition_id in range(1, total + 1):
+        if meeting is None or competition_id % EVENTS_PER_MEETING == 1:
+            location = rng.choice(LOCATIONS)
+            meeting = {
+                "name": f"{rng.randint(1, 30)}. {location} {rng.choice(MEETINGS)}",
+                "date": f"{rng.randint(2014, 2025)}.{rng.randint(1, 12):02d}.{rng.randint(1, 28):02d}",
+                "location": location,
+                "judges": rng.sample(pools["judges"], min(len(pools["judges"]), 11)),
+            }
+        yield competition_id, generate_competition(rng, pools, meeting)
+
+
+# --- Output ---
+def load_schema() -> list[str]:
+    """CREATE statements of the dev.db schema, as mirrored in sqlitecloud.sql."""
+    statements = re.split(r"\n(?=CREATE )", SCHEMA_FILE.read_text())
+    return [statement for statement in statements if "sqlite_sequence" not in statement]
+
+
+def create_schema(path) -> sqlite3.Connection:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        path.unlink()
+    conn = sqlite3.connect(path)
+    for statement in load_schema():
+        conn.execute(statement)
+    return conn
+
+
+def write_json(competitions, out_dir) -> int:
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for competition_id, payload in competitions:
+        with open(out_dir / f"competition_marks_{competition_id}.json", "w") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        count += 1
+    return count
+
+
+class DatabaseWriter:
+    """Write generated competitions into a fresh database the way migrate.py lays them out."""
+
+    def __init__(self, path):
+        self.conn = create_schema(path)
+        self.judge_ids = {}
+        self.participant_ids = {}
+        self.ids = {"Result": 0, "Round": 0, "Mark": 0}
+        self.pending = {}
+
+    def _insert(self, table, columns, row):
+        self.pending.setdefault((table, columns), []).append(row)
+        if len(self.pending[(table, columns)]) >= DB_BATCH_SIZE:
+            self._flush(table, columns)
+
+    def _flush(self, table, columns):
+        rows = self.pending.pop((table, columns), [])
+        if rows:
+            placeholders = ", ".join("?" * len(columns))
+            quoted = ", ".join(f'"{column}"' for column in columns)
+            self.conn.executemany(f'INSERT INTO "{table}" ({quoted}) VALUES ({placeholders})', rows)
+
+    def _judge_id(self, judge):
+        if judge["name"] not in self.judge_ids:
+            self.judge_ids[judge["name"]] = len(self.judge_ids) + 1
+            self._insert("judges", ("id", "name", "location", "link"),
+                         (self.judge_ids[judge["name"]], judge["name"], judge["location"], judge["link"]))
+        return self.judge_ids[judge["name"]]
+
+    def _participant_id(self, result):
+        if result["name"] not in self.participant_ids:
+            self.participant_ids[result["name"]] = len(self.participant_ids) + 1
+            self._insert("participants", ("id", "name", "club", "profileLink"),
+                         (self.participant_ids[result["name"]], result["name"], result["club"], result["profileLink"]))
+        return self.participant_ids[result["name"]]
+
+    def add(self, competition_id, payload):
+        category = parse_title(payload["title"])
+        self._insert("Competition", ("id", "sourceId", "title", "date", "location"),
+                     (competition_id, competition_id, payload["title"], payload["date"], payload["location"]))
+        self._insert("Event", ("id", "name", "competitionId", "falseData", "ageGroup", "danceClass", "style", "date"),
+                     (competition_id, payload["title"], competition_id, False,
+                      category["ageGroup"], category["danceClass"], category["style"], category["date"]))
+
+        judge_ids = [self._judge_id(judge) for judge in payload["judges"]]
+        for judge_id in dict.fromkeys(judge_ids):
+            self._insert("_EventToJudge", ("A", "B"), (competition_id, judge_id))
+
+        result_ids, participant_by_number = {}, {}
+        for result in payload["results"]:
+            participant_id = self._participant_id(result)
+            self.ids["Result"] += 1
+            result_ids[result["number"]] = self.ids["Result"]
+            participant_by_number[result["number"]] = participant_id
+            self._insert("Result", ("id", "eventId", "participantId", "number", "section", "position"),
+                         (self.ids["Result"], competition_id, participant_id,
+                          result["number"], result["section"], result["position"]))
+
+        signs = "".join(judge["id"] for judge in payload["judges"])
+        for section in payload["sections"]:
+            self.ids["Round"] += 1
+            round_id = self.ids["Round"]
+            self._insert("Round", ("id", "name", "eventId"), (round_id, section["title"], competition_id))
+            for row in section["rows"]:
+                number = row["FordulóRsz."]
+                for dance in section["headers"][2:-3]:
+                    for i, value in enumerate(row[dance]):
+                        mark = value == "X"
+                        placement = int(value) if value.isdigit() else 0
+                        self.ids["Mark"] += 1
+                        self._insert("Mark", ("id", "roundId", "participantId", "judgeId", "judgeSign", "mark",
+                                              "proposedPlacement", "danceType", "resultId"),
+                                     (self.ids["Mark"], round_id, participant_by_number[number], judge_ids[i],
+                                      signs[i], mark, placement, dance.split("/")[0], result_ids[number]))
+
+    def close(self):
+        for table, columns in list(self.pending):
+            self._flush(table, columns)
+        self.conn.commit()
+        self.conn.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic competition JSON and databases.")
+    parser.add_argument("-s", "--scale", type=float, default=1.0,
+                        help="Multiple of the real archive size (default: 1).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+    parser.add_argument("-o", "--out", required=True, help="Output directory.")
+    parser.add_argument("--json", action="store_true",
+                        help="Write competition JSON files to <out>/competition_data.")
+    parser.add_argument("--db", action="store_true", help="Write a populated database to <out>/dev.db.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not (args.json or args.db):
+        print("Nothing to do, pass --json and/or --db.")
+        return
+
+    out = Path(args.out)
+    writer = DatabaseWriter(out / "dev.db") if args.db else None
+    json_dir = out / "competition_data"
+    if args.json:
+        json_dir.mkdir(parents=True, exist_ok=True)
+
+    count = 0
+    for competition_id, payload in generate(args.scale, args.seed):
+        if args.json:
+            write_json([(competition_id, payload)], json_dir)
+        if writer is not None:
+            writer.add(competition_id, payload)
+        count += 1
+    if writer is not None:
+        writer.close()
+    print(f"Generated {count} competitions (scale {args.scale}, seed {args.seed}) in {out}")
+
+
+if __name__ == "__main__":
+    main()
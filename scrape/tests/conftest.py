@@ -0,0 +1,38 @@
+# scrape/tests/conftest.py
+# Fixtures shared by the scraper tests: a small synthetic dev.db built with
+# synthetic.py once per session, copied for every test that changes it.
+#
+#   python -m pytest -q scrape/tests
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRAPE_DIR = Path(__file__).resolve().parent.parent
+if str(SCRAPE_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRAPE_DIR))
+
+import synthetic  # noqa: E402
+
+# Share of the real archive to generate, about 250 competitions
+SCALE = 0.02
+SEED = 1
+
+
+@pytest.fixture(scope="session")
+def synthetic_db(tmp_path_factory) -> Path:
+    path = tmp_path_factory.mktemp("synthetic") / "dev.db"
+    writer = synthetic.DatabaseWriter(path)
+    for competition_id, payload in synthetic.generate(SCALE, SEED):
+        writer.add(competition_id, payload)
+    writer.close()
+    return path
+
+
+@pytest.fixture
+def db_file(synthetic_db, tmp_path) -> Path:
+    """A private copy of the synthetic database."""
+    path = tmp_path / "dev.db"
+    shutil.copy(synthetic_db, path)
+    return path
@@ -0,0 +1,20 @@
+import sqlite3
+
+import pytest
+
+import categories
+
+
+@pytest.mark.parametrize("title, expected", categories.CHECK_TITLES.items())
+def test_parse_title(title, expected):
+    parsed = categories.parse_title(title)
+    assert tuple(parsed[column] for column in categories.CATEGORY_COLUMNS) == expected
+
+
+def test_synthetic_events_are_categorised(db_file):
+    conn = sqlite3.connect(db_file)
+    missing = conn.execute(
+        'SELECT COUNT(*) FROM "Event" WHERE "ageGroup" IS NULL OR "danceClass" IS NULL OR "style" IS NULL'
+    ).fetchone()[0]
+    conn.close()
+    assert missing == 0
@@ -0,0 +1,61 @@
+import sqlite3
+
+import dancers
+
+
+def dancer_of(resolved, participant_id, role):
+    """Name of the dancer a participant's leader or follower was resolved to."""
+    people, memberships = resolved
+    for member_id, index, member_role in memberships:
+        if member_id == participant_id and member_role == role:
+            return people[index]["name"]
+    return None
+
+
+def test_shared_profile_joins_spellings():
+    resolved = dancers.resolve([
+        (1, "Tóth Zoltán - Dernei Titanilla", "Klub", "par.php?id=7"),
+        (2, "Toth Zoltan - Dernei Titánia", "Klub", "par.php?id=7"),
+    ])
+    assert dancer_of(resolved, 1, "follower") == dancer_of(resolved, 2, "follower")
+    assert len(resolved[0]) == 2
+
+
+def test_reordered_foreign_names_are_one_dancer():
+    resolved = dancers.resolve([
+        (1, "Radu Constantin Muntean - Kiss Anna", "A", None),
+        (2, "Muntean Radu Constantin - Nagy Éva", "B", None),
+    ])
+    assert dancer_of(resolved, 1, "leader") == dancer_of(resolved, 2, "leader")
+
+
+def test_dropped_middle_name_needs_a_shared_club():
+    resolved = dancers.resolve([
+        (1, "Rácz Noel - Kiss Anna", "A", None),
+        (2, "Rácz Noel Benjámin - Nagy Éva", "A", None),
+        (3, "Rácz Noel Benjámin - Szabó Dóra", "A", None),
+        (4, "Rácz Noel Bence - Tóth Lili", "B", None),
+    ])
+    assert dancer_of(resolved, 1, "leader") == dancer_of(resolved, 2, "leader")
+    assert dancer_of(resolved, 1, "leader") != dancer_of(resolved, 4, "leader")
+
+
+def test_formation_teams_are_never_merged():
+    resolved = dancers.resolve([
+        (1, "Savaria TSE -", "Savaria TSE", None),
+        (2, "Savaria TSE B csapat -", "Savaria TSE", None),
+        (3, "Savaria TSE A csapat -", "Savaria TSE", None),
+    ])
+    names = {dancer_of(resolved, participant_id, "leader") for participant_id in (1, 2, 3)}
+    assert len(names) == 3
+
+
+def test_resolve_database_is_repeatable(db_file):
+    conn = sqlite3.connect(db_file)
+    first = dancers.resolve_database(conn)
+    second = dancers.resolve_database(conn)
+    members = conn.execute('SELECT COUNT(DISTINCT "participantId") FROM "couple_members"').fetchone()[0]
+    couples = conn.execute('SELECT COUNT(*) FROM "participants"').fetchone()[0]
+    conn.close()
+    assert first == second
+    assert members == couples
@@ -0,0 +1,168 @@
+import sqlite3
+
+import pytest
+
+import dancers
+import replica_sync
+
+
+class RemoteReplica:
+    """A SQLite file behind an object that is not a sqlite3.Connection, like a sqlitecloud connection."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+
+    def execute(self, *args):
+        return self.conn.execute(*args)
+
+    def executemany(self, *args):
+        return self.conn.executemany(*args)
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class FailingReplica(RemoteReplica):
+    """Loses the connection at the given executemany() call."""
+
+    def __init__(self, path, fail_at):
+        super().__init__(path)
+        self.calls, self.fail_at = 0, fail_at
+
+    def executemany(self, *args):
+        self.calls += 1
+        if self.calls == self.fail_at:
+            raise ConnectionError("connection lost")
+        return super().executemany(*args)
+
+
+def open_replica(path, kind):
+    return replica_sync.connect_replica(str(path)) if kind == "sqlite" else RemoteReplica(path)
+
+
+def dump(path) -> dict:
+    """Table -> sorted rows, with the rowid of tables stored by rowid."""
+    conn = sqlite3.connect(path)
+    tables = {}
+    for name, _ in replica_sync.synced_tables(conn):
+        key = replica_sync.key_columns(conn, name)
+        names = replica_sync.select_columns(key, replica_sync.columns(conn, name))
+        tables[name] = sorted(map(repr, conn.execute(f"SELECT {', '.join(names)} FROM {replica_sync.quote(name)}")))
+    conn.close()
+    return tables
+
+
+def sync(local_file, replica_file, kind, verify=False):
+    local = sqlite3.connect(local_file)
+    replica = open_replica(replica_file, kind)
+    try:
+        return replica_sync.sync(local, replica, verify=verify)
+    finally:
+        local.close()
+        replica.close()
+
+
+def shipped(summary) -> int:
+    return sum(counts["rows"] for counts in summary.values())
+
+
+@pytest.fixture
+def local_db(db_file):
+    """Synthetic database with the dancer tables and a WITHOUT ROWID table filled."""
+    conn = sqlite3.connect(db_file)
+    dancers.resolve_database(conn)
+    conn.execute(
+        'CREATE TABLE "PairCounts" ("a" INTEGER NOT NULL, "b" INTEGER NOT NULL, "events" INTEGER NOT NULL, '
+        'PRIMARY KEY ("a", "b")) WITHOUT ROWID'
+    )
+    conn.execute(
+        'INSERT INTO "PairCounts" SELECT r1."participantId", r2."participantId", COUNT(*) '
+        'FROM "Result" r1 JOIN "Result" r2 ON r1."eventId" = r2."eventId" AND r1."participantId" != r2."participantId" '
+        'GROUP BY 1, 2'
+    )
+    conn.commit()
+    conn.close()
+    return db_file
+
+
+@pytest.fixture(autouse=True)
+def small_ranges(monkeypatch):
+    # Many ranges even on the small synthetic database
+    monkeypatch.setattr(replica_sync, "RANGE_SIZE", 256)
+    monkeypatch.setattr(replica_sync, "BATCH_ROWS", 2000)
+
+
+@pytest.mark.parametrize("kind", ["sqlite", "remote"])
+def test_first_sync_copies_everything(local_db, tmp_path, kind):
+    replica_file = tmp_path / "replica.db"
+    sync(local_db, replica_file, kind)
+    assert dump(replica_file) == dump(local_db)
+    assert shipped(sync(local_db, replica_file, kind)) == 0
+    assert shipped(sync(local_db, replica_file, kind, verify=True)) == 0
+
+
+@pytest.mark.parametrize("kind", ["sqlite", "remote"])
+def test_changed_and_moved_rows(local_db, tmp_path, kind):
+    replica_file = tmp_path / "replica.db"
+    sync(local_db, replica_file, kind)
+
+    conn = sqlite3.connect(local_db)
+    # dancer_aliases is rebuilt by delete and insert: every alias lands in another range
+    aliases = conn.execute('SELECT rowid, "alias", "dancerId" FROM "dancer_aliases"').fetchall()
+    conn.execute('DELETE FROM "dancer_aliases"')
+    conn.executemany('INSERT INTO "dancer_aliases" (rowid, "alias", "dancerId") VALUES (?, ?, ?)',
+                     [(len(aliases) * 3 - rowid, alias, dancer_id) for rowid, alias, dancer_id in aliases])
+    conn.execute('UPDATE "PairCounts" SET "events" = "events" + 1 WHERE "a" = 1')
+    conn.execute('DELETE FROM "PairCounts" WHERE "a" = 2')
+    conn.execute('UPDATE "Result" SET "position" = \'1.\' WHERE id = 7')
+    conn.commit()
+    total_pairs = conn.execute('SELECT COUNT(*) FROM "PairCounts"').fetchone()[0]
+    conn.close()
+
+    summary = sync(local_db, replica_file, kind)
+    assert dump(replica_file) == dump(local_db)
+    assert summary["Result"]["ranges"] == 1
+    assert 0 < summary["PairCounts"]["rows"] < total_pairs
+    assert shipped(sync(local_db, replica_file, kind, verify=True)) == 0
+
+
+def test_interrupted_sync_resumes(local_db, tmp_path):
+    replica_file = tmp_path / "replica.db"
+    sync(local_db, replica_file, "remote")
+    conn = sqlite3.connect(local_db)
+    conn.execute('UPDATE "Mark" SET "mark" = NOT "mark"')
+    conn.commit()
+    conn.close()
+
+    local, replica = sqlite3.connect(local_db), FailingReplica(replica_file, fail_at=20)
+    with pytest.raises(ConnectionError):
+        replica_sync.sync(local, replica)
+    replica.conn.rollback()
+    # Every range holds either the old or the new rows, none was left empty
+    marks = replica.execute('SELECT COUNT(*) FROM "Mark"').fetchone()[0]
+    replica.close()
+    local.close()
+    assert marks == sqlite3.connect(local_db).execute('SELECT COUNT(*) FROM "Mark"').fetchone()[0]
+
+    # Ranges committed before the failure are not shipped again, the others are
+    summary = sync(local_db, replica_file, "remote")
+    assert 0 < summary["Mark"]["ranges"] < summary["Mark"]["totalRanges"]
+    assert dump(replica_file) == dump(local_db)
+
+
+@pytest.mark.parametrize("kind", ["sqlite", "remote"])
+def test_verify_repairs_writes_to_the_replica(local_db, tmp_path, kind):
+    replica_file = tmp_path / "replica.db"
+    sync(local_db, replica_file, kind)
+    replica = sqlite3.connect(replica_file)
+    replica.execute('DELETE FROM "Result" WHERE id = 11')
+    replica.execute('DELETE FROM "PairCounts" WHERE "a" = 3')
+    replica.commit()
+    replica.close()
+
+    assert shipped(sync(local_db, replica_file, kind)) == 0
+    assert shipped(sync(local_db, replica_file, kind, verify=True)) > 0
+    assert dump(replica_file) == dump(local_db)
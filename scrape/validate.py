@@ -0,0 +1,310 @@
+# scrape/validate.py
+# Check every competition for consistency and report structured reason codes.
+#
+# migrate.py only notices broken data when parse_marks() raises, and then sets
+# Event.falseData without saying why. This validator runs the same checks over
+# either the raw JSON in competition_data/ or the events already in dev.db. Both
+# sources are read into the records of records.py first, so they go through
+# one set of checks. Competitions are checked in a process pool.
+#
+# Every problem is reported with a code from REASONS and a severity: "error"
+# means migrate.py cannot ingest the competition correctly (it sets falseData),
+# "warning" means the data was ingested but is inconsistent. The report is a
+# JSON line per competition with problems. --ids-out writes the sourceIds with
+# errors, one per line, so only those competitions are downloaded again
+# (download_marks.py --ids-file) and re-ingested (migrate.py --ids-file).
+#
+#   python validate.py --data-dir competition_data -w 8
+#   python validate.py --db dev.db --ids-out broken_ids.txt
+import argparse
+import json
+import re
+import sqlite3
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from tqdm import tqdm
+
+import metrics as run_metrics
+from records import (NUMBER_COLUMN, Competition, Section, competition_from, iter_files, read_competition,
+                     source_id_of)
+
+# --- Configuration ---
+DATA_DIR = Path(__file__).parent / "competition_data"
+DB_FILE = Path(__file__).parent / "dev.db"
+REPORT_FILE = "validation.jsonl"
+FINAL_ROUND = "Döntő"
+# Rounds that bring back couples without an X in the previous round
+HOPE_ROUNDS = ("Redance", "Reményfutam")
+# --- End Configuration ---
+
+ERROR = "error"
+WARNING = "warning"
+REASONS = {
+    "UNREADABLE": (ERROR, "the file is not valid JSON"),
+    "NO_DATE": (ERROR, "the title has no yyyy.mm.dd date"),
+    "NO_JUDGES": (ERROR, "the competition lists no judges"),
+    "NO_RESULTS": (ERROR, "the competition lists no results"),
+    "DUPLICATE_JUDGE_SIGN": (ERROR, "two judges share a letter"),
+    "JUDGE_COUNT": (ERROR, "a mark string is not one character per judge"),
+    "MISSING_PARTICIPANT": (ERROR, "a round row has a number missing from the results"),
+    "MISSING_DANCE": (ERROR, "a round row has no marks for a dance of the round"),
+    "EMPTY_ROUND": (WARNING, "a round has no rows"),
+    # migrate.py stores such a character as "no mark", as it always did
+    "UNKNOWN_MARK": (WARNING, "a mark is not X, - or a placement"),
+    "UNPARSEABLE_POSITION": (WARNING, "a result position is not a number"),
+    "MARK_COUNT": (WARNING, "judges gave different numbers of X in one dance of a round"),
+    "ADVANCING_MISMATCH": (WARNING, "the number of X differs from the couples reaching the next round"),
+    "FINAL_PLACEMENTS": (WARNING, "a judge's final placements are not 1..n"),
+}
+
+DATE_RE = re.compile(r"\d{4}\.\d{2}\.\d{2}")
+POSITION_RE = re.compile(r"^\s*\d+\.?(\s*-\s*\d+\.?)?\s*$")
+
+# Worker state: the read-only database connection of --db runs
+conn = None
+
+
+class Issues:
+    """Problems of one competition, merged per (code, round) with a count and the first example."""
+
+    def __init__(self):
+        self.by_key = {}
+
+    def add(self, code: str, round_name: str = None, detail: str = ""):
+        key = (code, round_name)
+        if key in self.by_key:
+            self.by_key[key]["count"] += 1
+            return
+        self.by_key[key] = {"code": code, "severity": REASONS[code][0], "round": round_name,
+                            "detail": detail, "count": 1}
+
+    def as_list(self) -> list[dict]:
+        return list(self.by_key.values())
+
+
+def check_competition(competition: Competition) -> list[dict]:
+    """
+    Check one competition, see records.py.
+
+    Returns:
+        List of issues, dicts with code, severity, round, detail and count
+    """
+    issues = Issues()
+    if not DATE_RE.search(competition.title):
+        issues.add("NO_DATE", detail=competition.title)
+
+    if not competition.judges:
+        issues.add("NO_JUDGES")
+    for sign, count in Counter(judge.sign for judge in competition.judges).items():
+        if count > 1:
+            issues.add("DUPLICATE_JUDGE_SIGN", detail=f"{sign} x{count}")
+
+    if not competition.results:
+        issues.add("NO_RESULTS")
+    # The section of a result is the last round the couple danced
+    last_round = {result.number: result.section for result in competition.results}
+    for result in competition.results:
+        if not POSITION_RE.match(result.position):
+            issues.add("UNPARSEABLE_POSITION", detail=f"{result.number}: {result.position!r}")
+
+    # A hope round brings back couples that got no X, so X counts say nothing about who advanced
+    hope = any(hope_round in section.title for section in competition.sections for hope_round in HOPE_ROUNDS)
+    for section in competition.sections:
+        check_round(issues, section, len(competition.judges), last_round, check_advancing=not hope)
+    return issues.as_list()
+
+
+def check_round(issues: Issues, section: Section, judge_count: int, last_round: dict, check_advancing: bool = True):
+    """
+    Check the rows of one round against the judges and the results.
+
+    Args:
+        last_round: Result number -> last round danced
+        check_advancing: Compare the X given with the couples that danced a later round
+    """
+    name = section.title
+    rows = section.rows
+    if not rows:
+        issues.add("EMPTY_ROUND", name)
+        return
+    dances = section.dances
+    final = name == FINAL_ROUND
+
+    x_counts = defaultdict(Counter)  # dance -> judge index -> X given
+    placements = defaultdict(lambda: defaultdict(list))  # dance -> judge index -> placements
+    for row in rows:
+        number = row.number
+        if number not in last_round:
+            issues.add("MISSING_PARTICIPANT", name, f"number {number}")
+        for dance, cell in zip(dances, row.marks):
+            if cell is None:
+                issues.add("MISSING_DANCE", name, f"number {number}, {dance}")
+                continue
+            if len(cell) != judge_count:
+                issues.add("JUDGE_COUNT", name, f"number {number}, {dance}: {cell!r} for {judge_count} judges")
+            for judge, mark in enumerate(cell):
+                if mark == "X":
+                    x_counts[dance][judge] += 1
+                elif mark.isdigit():
+                    placements[dance][judge].append(int(mark))
+                elif mark != "-":
+                    issues.add("UNKNOWN_MARK", name, f"number {number}, {dance}: {mark!r}")
+
+    if final:
+        for dance, per_judge in placements.items():
+            for judge, given in per_judge.items():
+                if len(rows) <= 9 and sorted(given) != list(range(1, len(rows) + 1)):
+                    issues.add("FINAL_PLACEMENTS", name, f"{dance}, judge {judge + 1}: {sorted(given)}")
+        return
+
+    given_counts = {dance: {x_counts[dance][judge] for judge in range(judge_count)} for dance in dances}
+    for dance, counts in given_counts.items():
+        if len(counts) > 1:
+            issues.add("MARK_COUNT", name, f"{dance}: {sorted(counts)}")
+
+    if not check_advancing:
+        return
+    advancing = sum(last_round.get(row.number, name) != name for row in rows)
+    for dance, counts in given_counts.items():
+        if len(counts) == 1 and advancing not in counts:
+            issues.add("ADVANCING_MISMATCH", name, f"{dance}: {counts.pop()} X, {advancing} advanced")
+
+
+def report_entry(competition: Competition, issues: list[dict], **keys) -> dict:
+    return {**keys, "title": competition.title, "issues": issues}
+
+
+# --- Raw JSON ---
+def validate_file(path) -> dict:
+    """Check one competition_marks_<id>.json file."""
+    keys = {"sourceId": source_id_of(path), "file": str(path)}
+    try:
+        competition = read_competition(path)
+    except (OSError, ValueError) as e:
+        issues = Issues()
+        issues.add("UNREADABLE", detail=str(e))
+        return {**keys, "title": None, "issues": issues.as_list()}
+    return report_entry(competition, check_competition(competition), **keys)
+
+
+# --- Database ---
+def init_worker(db_file):
+    global conn
+    conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+
+
+def load_event(event_id: int) -> Competition:
+    """Rebuild the records of an event from its database rows."""
+    title, source_id = conn.execute(
+        'SELECT e.name, c.sourceId FROM "Event" e JOIN "Competition" c ON c.id = e.competitionId WHERE e.id = ?',
+        (event_id,),
+    ).fetchone()
+    results = conn.execute(
+        'SELECT id, number, position, section FROM "Result" WHERE eventId = ?', (event_id,)
+    ).fetchall()
+    number_of = {result_id: number for result_id, number, _, _ in results}
+    connected = conn.execute('SELECT COUNT(*) FROM "_EventToJudge" WHERE A = ?', (event_id,)).fetchone()[0]
+
+    signs = {}
+    sections = []
+    for round_id, round_name in conn.execute('SELECT id, name FROM "Round" WHERE eventId = ? ORDER BY id', (event_id,)):
+        cells = defaultdict(lambda: defaultdict(dict))  # number -> dance -> sign -> character
+        dances = []
+        for result_id, participant_id, judge_id, sign, mark, placement, dance in conn.execute(
+            'SELECT resultId, participantId, judgeId, judgeSign, mark, proposedPlacement, danceType '
+            'FROM "Mark" WHERE roundId = ?',
+            (round_id,),
+        ):
+            signs.setdefault(sign, judge_id)
+            if dance not in dances:
+                dances.append(dance)
+            number = number_of.get(result_id, f"participant {participant_id}")
+            cells[number][dance][sign] = "X" if mark else (str(placement) if placement else "-")
+        order = sorted(signs)
+        rows = [
+            {NUMBER_COLUMN: number, **{dance: "".join(marks[sign] for sign in order if sign in marks)
+                                       for dance, marks in per_dance.items()}}
+            for number, per_dance in cells.items()
+        ]
+        sections.append({"title": round_name, "headers": ["", NUMBER_COLUMN, *dances, "", "", ""], "rows": rows})
+
+    judges = [{"id": sign} for sign in sorted(signs)]
+    # Judges linked to the event without marks still count, as they would in the JSON
+    judges.extend({"id": f"unmarked {index}"} for index in range(max(0, connected - len(judges))))
+    payload = {
+        "title": title,
+        "judges": judges,
+        "results": [{"number": number, "position": position, "section": section}
+                    for _, number, position, section in results],
+        "sections": sections,
+    }
+    return competition_from(payload, source_id)
+
+
+def validate_event(event_id: int) -> dict:
+    competition = load_event(event_id)
+    return report_entry(competition, check_competition(competition),
+                        sourceId=competition.sourceId, eventId=event_id)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check competitions for consistency and report reason codes.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--db", help=f"Check the events of this database (default: {DB_FILE}).")
+    source.add_argument("--data-dir", help="Check the raw competition JSON files in this directory instead.")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Worker processes (default: 4).")
+    parser.add_argument("-o", "--output", default=REPORT_FILE,
+                        help=f"JSON lines report of the competitions with problems (default: {REPORT_FILE}).")
+    parser.add_argument("--ids-out", help="Write the sourceIds of competitions with errors to this file.")
+    parser.add_argument("--warnings", action="store_true", help="Also list competitions that only have warnings in --ids-out.")
+    run_metrics.add_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with run_metrics.instrument("validate", args.report, args.profile) as metrics:
+        start = time.perf_counter()
+        if args.data_dir:
+            items = list(iter_files(args.data_dir))
+            check, initializer, initargs = validate_file, None, ()
+        else:
+            db_file = args.db or str(DB_FILE)
+            with sqlite3.connect(f"file:{db_file}?mode=ro", uri=True) as db:
+                items = [row[0] for row in db.execute('SELECT id FROM "Event" ORDER BY id')]
+            check, initializer, initargs = validate_event, init_worker, (db_file,)
+
+        codes = Counter()
+        broken = set()
+        checked = 0
+        with metrics.stage("validate"), open(args.output, "w") as report, \
+                ProcessPoolExecutor(max_workers=args.workers, initializer=initializer, initargs=initargs) as executor:
+            for entry in tqdm(executor.map(check, items, chunksize=16), total=len(items), desc="Validating"):
+                checked += 1
+                if not entry["issues"]:
+                    continue
+                report.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                for issue in entry["issues"]:
+                    codes[issue["code"]] += 1
+                if entry["sourceId"] is not None and (
+                        args.warnings or any(issue["severity"] == ERROR for issue in entry["issues"])):
+                    broken.add(entry["sourceId"])
+        metrics.add_rows("checked", checked)
+
+    if args.ids_out:
+        with open(args.ids_out, "w") as f:
+            f.writelines(f"{source_id}\n" for source_id in sorted(broken))
+
+    print(f"Checked {checked} competitions in {time.perf_counter() - start:.1f}s, report in {args.output}.")
+    for code, count in codes.most_common():
+        severity, description = REASONS[code]
+        print(f"  {code:<22} {severity:<8} {count:>6}  {description}")
+    if args.ids_out:
+        print(f"{len(broken)} competitions to re-ingest listed in {args.ids_out}.")
+
+
+if __name__ == "__main__":
+    main()
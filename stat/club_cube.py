@@ -0,0 +1,272 @@
+# stat/club_cube.py
+# Materialized club statistics per season, style and age group.
+#
+# The ClubCube table holds one row per (club, season, style, ageGroup) with the
+# number of entries, the finals reached and the sum and count of the relative
+# placements (position / couples in the event). All measures are additive, so
+# any roll-up (a club over all seasons, a season over all clubs, ...) is a
+# GROUP BY over the cube instead of a scan of Result joined to participants
+# and Competition.
+#
+# The cube is built with pandas group-bys. Later runs only aggregate the events
+# added since the last run and add them to the stored rows. ClubCubeProgress
+# keeps the id of the last processed event and a fingerprint of the results up
+# to it; when results of processed events were deleted or changed (e.g. by
+# migrate.py --ids-file) the cube is rebuilt. The fingerprint only covers
+# Result: after changing clubs or event categories (categories.py --backfill),
+# rebuild with --full.
+#
+#   python club_cube.py --update
+#   python club_cube.py --club "Flamenco 2001 Táncsport Egyesület"
+#   python club_cube.py --season 2018 --style Latin --by club
+import argparse
+import sqlite3
+import time
+
+import pandas as pd
+
+from prepared import FINAL_ROUND, parse_date, parse_position, results_fingerprint
+
+# --- Configuration ---
+DB_FILE = "dev.db"
+TABLE = "ClubCube"
+PROGRESS_TABLE = "ClubCubeProgress"
+DIMENSIONS = ["club", "season", "style", "ageGroup"]
+# --- End Configuration ---
+
+SCHEMA = [
+    f"""
+    CREATE TABLE IF NOT EXISTS "{TABLE}" (
+        "club" TEXT NOT NULL,
+        "season" INTEGER NOT NULL,
+        "style" TEXT NOT NULL,
+        "ageGroup" TEXT NOT NULL,
+        "entries" INTEGER NOT NULL,
+        "finals" INTEGER NOT NULL,
+        "relativeSum" REAL NOT NULL,
+        "relativeCount" INTEGER NOT NULL,
+        PRIMARY KEY ("club", "season", "style", "ageGroup")
+    ) WITHOUT ROWID
+    """,
+    f'CREATE INDEX IF NOT EXISTS "{TABLE}_season_idx" ON "{TABLE}" ("season", "style", "ageGroup")',
+    f"""
+    CREATE TABLE IF NOT EXISTS "{PROGRESS_TABLE}" (
+        "lastEventId" INTEGER NOT NULL,
+        "resultCount" INTEGER,
+        "resultChecksum" INTEGER
+    )
+    """,
+]
+
+
+def ensure_tables(conn: sqlite3.Connection) -> None:
+    for statement in SCHEMA:
+        conn.execute(statement)
+    # Progress tables created before the fingerprint columns; their NULLs force one rebuild
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info("{PROGRESS_TABLE}")')}
+    for column in ("resultCount", "resultChecksum"):
+        if column not in existing:
+            conn.execute(f'ALTER TABLE "{PROGRESS_TABLE}" ADD COLUMN "{column}" INTEGER')
+
+
+def load_progress(conn: sqlite3.Connection):
+    """(last processed event id, (result count, checksum) up to it), or None before the first run."""
+    row = conn.execute(f'SELECT "lastEventId", "resultCount", "resultChecksum" FROM "{PROGRESS_TABLE}"').fetchone()
+    return (row[0], (row[1], row[2])) if row else None
+
+
+def load_results(conn: sqlite3.Connection, after_event: int = 0) -> pd.DataFrame:
+    """Results of the events past `after_event` with their club, dates and categories."""
+    return pd.read_sql_query(
+        """
+        SELECT r.eventId, r.participantId, r.section, r.position, p.club,
+               e.date AS eventDate, c.date AS competitionDate, e.style, e.ageGroup
+        FROM "Result" r
+        JOIN "Event" e ON e.id = r.eventId
+        JOIN "Competition" c ON c.id = e.competitionId
+        JOIN "participants" p ON p.id = r.participantId
+        WHERE r.eventId > ?
+        """,
+        conn,
+        params=(after_event,),
+    )
+
+
+def aggregate(results: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cube rows of a results frame from load_results().
+
+    Returns:
+        DataFrame with the DIMENSIONS columns and the entries, finals,
+        relativeSum and relativeCount measures
+    """
+    if results.empty:
+        return pd.DataFrame(columns=[*DIMENSIONS, "entries", "finals", "relativeSum", "relativeCount"])
+
+    # Dates repeat for every result of an event, parse each distinct value once
+    dates = results["eventDate"].fillna(results["competitionDate"])
+    years = {value: getattr(parse_date(value), "year", 0) for value in dates.dropna().unique()}
+    places = {value: parse_position(value) for value in results["position"].unique()}
+
+    frame = pd.DataFrame({
+        "club": results["club"].fillna("").str.strip(),
+        "season": dates.map(years).fillna(0).astype(int),
+        "style": results["style"].fillna(""),
+        "ageGroup": results["ageGroup"].fillna(""),
+        "final": (results["section"] == FINAL_ROUND).astype(int),
+        "place": results["position"].map(places).astype(float),
+    })
+    sizes = results.groupby("eventId")["participantId"].transform("nunique")
+    frame["relative"] = frame["place"] / sizes
+
+    cube = frame.groupby(DIMENSIONS, sort=False).agg(
+        entries=("final", "size"),
+        finals=("final", "sum"),
+        relativeSum=("relative", "sum"),
+        relativeCount=("relative", "count"),
+    )
+    return cube.reset_index()
+
+
+def update(conn: sqlite3.Connection, full: bool = False) -> dict:
+    """
+    Add the events created since the last run to the cube.
+
+    The cube is rebuilt instead when the results of the events processed
+    before no longer match their stored fingerprint.
+
+    Args:
+        full: Empty the cube and aggregate every event again
+
+    Returns:
+        Dictionary with the number of new results, updated cube rows and
+        whether the cube was rebuilt because processed results changed
+    """
+    ensure_tables(conn)
+    progress = load_progress(conn)
+    after, fingerprint = progress if progress is not None else (0, (0, 0))
+    # Only a stored fingerprint that no longer matches counts as a rebuild, not the first run or --full
+    rebuilt = not full and progress is not None and results_fingerprint(conn, 0, after) != fingerprint
+    if full or rebuilt or progress is None:
+        conn.execute(f'DELETE FROM "{TABLE}"')
+        conn.execute(f'DELETE FROM "{PROGRESS_TABLE}"')
+        after, fingerprint = 0, (0, 0)
+    newest = conn.execute('SELECT COALESCE(MAX(eventId), 0) FROM "Result"').fetchone()[0]
+    if newest <= after:
+        conn.commit()
+        return {"results": 0, "rows": 0, "rebuilt": rebuilt}
+
+    results = load_results(conn, after)
+    cube = aggregate(results)
+    conn.executemany(
+        f"""
+        INSERT INTO "{TABLE}" ("club", "season", "style", "ageGroup", "entries", "finals", "relativeSum", "relativeCount")
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT ("club", "season", "style", "ageGroup") DO UPDATE SET
+            "entries" = "entries" + excluded."entries",
+            "finals" = "finals" + excluded."finals",
+            "relativeSum" = "relativeSum" + excluded."relativeSum",
+            "relativeCount" = "relativeCount" + excluded."relativeCount"
+        """,
+        [
+            (row.club, int(row.season), row.style, row.ageGroup,
+             int(row.entries), int(row.finals), float(row.relativeSum), int(row.relativeCount))
+            for row in cube.itertuples(index=False)
+        ],
+    )
+    added = results_fingerprint(conn, after, newest)
+    conn.execute(f'DELETE FROM "{PROGRESS_TABLE}"')
+    conn.execute(
+        f'INSERT INTO "{PROGRESS_TABLE}" ("lastEventId", "resultCount", "resultChecksum") VALUES (?, ?, ?)',
+        (newest, fingerprint[0] + added[0], fingerprint[1] + added[1]),
+    )
+    conn.commit()
+    return {"results": len(results), "rows": len(cube), "rebuilt": rebuilt}
+
+
+def query(conn: sqlite3.Connection, by: list[str], **filters) -> list[dict]:
+    """
+    Roll the cube up to the given dimensions.
+
+    Args:
+        by: Dimensions to group by, a subset of DIMENSIONS
+        **filters: Dimension -> value to restrict to, e.g. season=2018
+
+    Returns:
+        List of dicts with the `by` columns, entries, finals, finalRate and
+        averageRelative, most entries first
+    """
+    unknown = (set(by) | set(filters)) - set(DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Unknown dimensions: {', '.join(sorted(unknown))}")
+    where = [f'"{name}" = ?' for name in filters]
+    group = ", ".join(f'"{name}"' for name in by)
+    rows = conn.execute(
+        f"""
+        SELECT {group + "," if group else ""} SUM("entries"), SUM("finals"), SUM("relativeSum"), SUM("relativeCount")
+        FROM "{TABLE}"
+        {"WHERE " + " AND ".join(where) if where else ""}
+        {"GROUP BY " + group if group else ""}
+        ORDER BY {len(by) + 1} DESC
+        """,
+        list(filters.values()),
+    ).fetchall()
+    rolled = []
+    for row in rows:
+        entries, finals, relative_sum, relative_count = row[len(by):]
+        if not entries:
+            continue
+        rolled.append({
+            **dict(zip(by, row)),
+            "entries": entries,
+            "finals": finals,
+            "finalRate": finals / entries,
+            "averageRelative": relative_sum / relative_count if relative_count else None,
+        })
+    return rolled
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Club statistics per season, style and age group.")
+    parser.add_argument("--db", default=DB_FILE, help=f"Path to the SQLite database (default: {DB_FILE}).")
+    parser.add_argument("--update", action="store_true", help="Add events created since the last update.")
+    parser.add_argument("--full", action="store_true",
+                        help="Rebuild the cube from every event, e.g. after clubs or event categories changed "
+                             "(--update does so by itself when results of processed events changed).")
+    parser.add_argument("--club", help="Only this club.")
+    parser.add_argument("--season", type=int, help="Only this season (year).")
+    parser.add_argument("--style", help="Only this style (Latin, Standard, ...).")
+    parser.add_argument("--age-group", dest="ageGroup", help="Only this age group.")
+    parser.add_argument("--by", nargs="+", choices=DIMENSIONS,
+                        help="Dimensions to group by (default: season, style and ageGroup that are not filtered on).")
+    parser.add_argument("-n", "--limit", type=int, default=20, help="Number of rows to print (default: 20).")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.update or args.full:
+            start = time.perf_counter()
+            counts = update(conn, args.full)
+            if counts["rebuilt"]:
+                print("Results of processed events changed, rebuilt the cube.")
+            print(f"Aggregated {counts['results']} new results into {counts['rows']} cube rows "
+                  f"in {time.perf_counter() - start:.2f}s.")
+
+        filters = {name: getattr(args, name) for name in DIMENSIONS if getattr(args, name) is not None}
+        if not filters and not args.by:
+            return
+        by = args.by or [name for name in ("season", "style", "ageGroup") if name not in filters]
+        for row in query(conn, by, **filters)[:args.limit]:
+            label = " / ".join(str(row[name]) or "-" for name in by) or "total"
+            average = f"{row['averageRelative']:.2f}" if row["averageRelative"] is not None else "-"
+            print(f"{label:<50} {row['entries']:>6} entries {row['finals']:>5} finals "
+                  f"({row['finalRate']:.0%})  avg relative {average}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
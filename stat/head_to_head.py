@@ -0,0 +1,277 @@
+# stat/head_to_head.py
+# Precomputed head-to-head records between couples.
+#
+# For every pair of couples that met in an event, the HeadToHead table holds
+# wins, losses, ties and the number of shared events. Each pair is stored once
+# per direction, so a lookup or a rivals list is a single indexed range read
+# instead of a self-join of Result on eventId.
+#
+# The pairs of all events are generated and counted in one vectorized numpy
+# pass. Later runs only process events added since the last run and add their
+# counts to the stored rows. HeadToHeadProgress keeps the id of the last
+# processed event and a fingerprint of the results up to it. When results of
+# processed events were deleted or changed (migrate.py --ids-file re-ingests
+# competitions under new event ids), the fingerprint no longer matches and the
+# table is rebuilt, as --full does.
+#
+#   python head_to_head.py --update           # build, or add new events
+#   python head_to_head.py 2038 2041          # record of 2038 against 2041
+#   python head_to_head.py --rivals 2038 -n 10
+import argparse
+import sqlite3
+import time
+
+import numpy as np
+
+from prepared import parse_position, results_fingerprint
+
+# --- Configuration ---
+DB_FILE = "dev.db"
+TABLE = "HeadToHead"
+PROGRESS_TABLE = "HeadToHeadProgress"
+# Rivals need at least this many shared events
+MIN_SHARED_EVENTS = 2
+# --- End Configuration ---
+
+SCHEMA = [
+    f"""
+    CREATE TABLE IF NOT EXISTS "{TABLE}" (
+        "participantId" INTEGER NOT NULL,
+        "opponentId" INTEGER NOT NULL,
+        "wins" INTEGER NOT NULL,
+        "losses" INTEGER NOT NULL,
+        "ties" INTEGER NOT NULL,
+        "events" INTEGER NOT NULL,
+        PRIMARY KEY ("participantId", "opponentId")
+    ) WITHOUT ROWID
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS "{PROGRESS_TABLE}" (
+        "lastEventId" INTEGER NOT NULL,
+        "resultCount" INTEGER,
+        "resultChecksum" INTEGER
+    )
+    """,
+]
+
+
+def ensure_tables(conn: sqlite3.Connection) -> None:
+    for statement in SCHEMA:
+        conn.execute(statement)
+    # Progress tables created before the fingerprint columns; their NULLs force one rebuild
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info("{PROGRESS_TABLE}")')}
+    for column in ("resultCount", "resultChecksum"):
+        if column not in existing:
+            conn.execute(f'ALTER TABLE "{PROGRESS_TABLE}" ADD COLUMN "{column}" INTEGER')
+
+
+def load_progress(conn: sqlite3.Connection):
+    """(last processed event id, (result count, checksum) up to it), or None before the first run."""
+    row = conn.execute(f'SELECT "lastEventId", "resultCount", "resultChecksum" FROM "{PROGRESS_TABLE}"').fetchone()
+    return (row[0], (row[1], row[2])) if row else None
+
+
+def load_results(conn: sqlite3.Connection, after_event: int = 0):
+    """(eventId, participantId, place) arrays of the results with a numeric position, sorted by event."""
+    rows = conn.execute(
+        'SELECT eventId, participantId, position FROM "Result" WHERE eventId > ? ORDER BY eventId', (after_event,)
+    ).fetchall()
+    places = [parse_position(position) for _, _, position in rows]
+    keep = [place is not None for place in places]
+    events = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))[keep]
+    participants = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))[keep]
+    places = np.array([place for place in places if place is not None], dtype=np.int64)
+    return events, participants, places
+
+
+def event_pairs(events: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Index pairs (i, j), i < j, of all results that share an event.
+
+    `events` must be sorted. Events of equal size share one np.triu_indices
+    template, shifted to each event's offset, so there is no per-event loop
+    in Python.
+    """
+    if len(events) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, events[1:] != events[:-1]])
+    sizes = np.diff(np.r_[starts, len(events)])
+    left, right = [], []
+    for size in np.unique(sizes):
+        if size < 2:
+            continue
+        i, j = np.triu_indices(size, k=1)
+        offsets = starts[sizes == size][:, None]
+        left.append((offsets + i).ravel())
+        right.append((offsets + j).ravel())
+    if not left:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(left), np.concatenate(right)
+
+
+def count_pairs(events: np.ndarray, participants: np.ndarray, places: np.ndarray) -> np.ndarray:
+    """
+    Aggregate wins, losses, ties and shared events per ordered couple pair.
+
+    Returns:
+        Array of (participantId, opponentId, wins, losses, ties, events) rows,
+        with both directions of every pair
+    """
+    i, j = event_pairs(events)
+    a, b = participants[i], participants[j]
+    distinct = a != b  # the same couple listed twice in one event
+    a, b = a[distinct], b[distinct]
+    place_a, place_b = places[i][distinct], places[j][distinct]
+
+    wins = (place_a < place_b).astype(np.int64)
+    losses = (place_a > place_b).astype(np.int64)
+    ties = (place_a == place_b).astype(np.int64)
+    first = np.concatenate([a, b])
+    second = np.concatenate([b, a])
+    win = np.concatenate([wins, losses])
+    loss = np.concatenate([losses, wins])
+    tie = np.concatenate([ties, ties])
+
+    pairs, inverse = np.unique(np.stack([first, second], axis=1), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    return np.column_stack([
+        pairs,
+        np.bincount(inverse, weights=win, minlength=len(pairs)).astype(np.int64),
+        np.bincount(inverse, weights=loss, minlength=len(pairs)).astype(np.int64),
+        np.bincount(inverse, weights=tie, minlength=len(pairs)).astype(np.int64),
+        np.bincount(inverse, minlength=len(pairs)).astype(np.int64),
+    ]) if len(pairs) else np.empty((0, 6), dtype=np.int64)
+
+
+def update(conn: sqlite3.Connection, full: bool = False) -> dict:
+    """
+    Add the events created since the last run to the head-to-head table.
+
+    The table is rebuilt instead when the results of the events processed
+    before no longer match their stored fingerprint.
+
+    Args:
+        full: Drop the table and process every event again
+
+    Returns:
+        Dictionary with the number of new events, updated pair rows and
+        whether the table was rebuilt because processed results changed
+    """
+    ensure_tables(conn)
+    progress = load_progress(conn)
+    after, fingerprint = progress if progress is not None else (0, (0, 0))
+    # Only a stored fingerprint that no longer matches counts as a rebuild, not the first run or --full
+    rebuilt = not full and progress is not None and results_fingerprint(conn, 0, after) != fingerprint
+    if full or rebuilt or progress is None:
+        conn.execute(f'DELETE FROM "{TABLE}"')
+        conn.execute(f'DELETE FROM "{PROGRESS_TABLE}"')
+        after, fingerprint = 0, (0, 0)
+    newest = conn.execute('SELECT COALESCE(MAX(eventId), 0) FROM "Result"').fetchone()[0]
+    if newest <= after:
+        conn.commit()
+        return {"events": 0, "pairs": 0, "rebuilt": rebuilt}
+
+    events, participants, places = load_results(conn, after)
+    rows = count_pairs(events, participants, places)
+    conn.executemany(
+        f"""
+        INSERT INTO "{TABLE}" ("participantId", "opponentId", "wins", "losses", "ties", "events")
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT ("participantId", "opponentId") DO UPDATE SET
+            "wins" = "wins" + excluded."wins",
+            "losses" = "losses" + excluded."losses",
+            "ties" = "ties" + excluded."ties",
+            "events" = "events" + excluded."events"
+        """,
+        rows.tolist(),
+    )
+    added = results_fingerprint(conn, after, newest)
+    conn.execute(f'DELETE FROM "{PROGRESS_TABLE}"')
+    conn.execute(
+        f'INSERT INTO "{PROGRESS_TABLE}" ("lastEventId", "resultCount", "resultChecksum") VALUES (?, ?, ?)',
+        (newest, fingerprint[0] + added[0], fingerprint[1] + added[1]),
+    )
+    conn.commit()
+    return {"events": len(np.unique(events)), "pairs": len(rows), "rebuilt": rebuilt}
+
+
+def head_to_head(conn: sqlite3.Connection, participant_id: int, opponent_id: int):
+    """Returns (wins, losses, ties, shared events) of the first couple against the second, or None."""
+    return conn.execute(
+        f'SELECT wins, losses, ties, events FROM "{TABLE}" WHERE participantId = ? AND opponentId = ?',
+        (participant_id, opponent_id),
+    ).fetchone()
+
+
+def closest_rivals(conn: sqlite3.Connection, participant_id: int, limit: int = 10,
+                   min_events: int = MIN_SHARED_EVENTS) -> list[tuple]:
+    """
+    Opponents met most often with the most even record.
+
+    Returns:
+        List of (opponentId, name, wins, losses, ties, events) tuples
+    """
+    return conn.execute(
+        f"""
+        SELECT h.opponentId, p.name, h.wins, h.losses, h.ties, h.events
+        FROM "{TABLE}" h
+        JOIN "participants" p ON p.id = h.opponentId
+        WHERE h.participantId = ? AND h.events >= ?
+        ORDER BY CAST(ABS(h.wins - h.losses) AS REAL) / h.events, h.events DESC
+        LIMIT ?
+        """,
+        (participant_id, min_events, limit),
+    ).fetchall()
+
+
+def participant_name(conn: sqlite3.Connection, participant_id: int) -> str:
+    row = conn.execute('SELECT name FROM "participants" WHERE id = ?', (participant_id,)).fetchone()
+    return row[0] if row else f"#{participant_id}"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Head-to-head records between couples.")
+    parser.add_argument("ids", type=int, nargs="*", help="Two participant ids to compare.")
+    parser.add_argument("--db", default=DB_FILE, help=f"Path to the SQLite database (default: {DB_FILE}).")
+    parser.add_argument("--update", action="store_true", help="Add events created since the last update.")
+    parser.add_argument("--full", action="store_true",
+                        help="Rebuild the table from every event (--update does so by itself when "
+                             "results of processed events changed).")
+    parser.add_argument("--rivals", type=int, metavar="ID", help="List the closest rivals of this participant.")
+    parser.add_argument("-n", "--limit", type=int, default=10, help="Number of rivals to list (default: 10).")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.update or args.full:
+            start = time.perf_counter()
+            counts = update(conn, args.full)
+            if counts["rebuilt"]:
+                print("Results of processed events changed, rebuilt the table.")
+            print(f"Processed {counts['events']} new events into {counts['pairs']} pair rows "
+                  f"in {time.perf_counter() - start:.2f}s.")
+
+        if len(args.ids) == 2:
+            record = head_to_head(conn, *args.ids)
+            a, b = (participant_name(conn, participant_id) for participant_id in args.ids)
+            if record is None:
+                print(f"{a} and {b} never met.")
+            else:
+                wins, losses, ties, events = record
+                print(f"{a} vs {b}: {wins} wins, {losses} losses, {ties} ties in {events} shared events")
+        elif args.ids:
+            print("Pass two participant ids to compare them.")
+
+        if args.rivals is not None:
+            print(f"Closest rivals of {participant_name(conn, args.rivals)}:")
+            for opponent_id, name, wins, losses, ties, events in closest_rivals(conn, args.rivals, args.limit):
+                print(f"  {wins:>3}-{losses:<3} ({ties} ties, {events} events)  {name} (ID: {opponent_id})")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# stat/judge_affinity.py
+# Sparse judge x participant and judge x club affinity of X marks.
+#
+# judgeLike.py folds everything into one score per judge. This model keeps one
+# cell per (judge, couple) and per (judge, club) that met, so it can answer
+# "does judge J systematically favour couple P or club C".
+#
+# Every X decision in a non-final round is compared with what the rest of the
+# panel did: the expected mark is the share of the other judges that gave the
+# couple an X in the same round and dance. Where the judge was alone, whether
+# the couple advanced past the round is used instead. Observed minus expected
+# is summed per cell together with the binomial variance p * (1 - p), so
+# z = residual / sqrt(variance) says how far a judge is from the panel.
+#
+# The marks are read once and reduced with numpy group sums into
+# scipy.sparse CSR matrices, one per judge x participant and judge x club.
+#
+#   python judge_affinity.py --top 20
+#   python judge_affinity.py --by club --judge 12 --min-z 2.5
+#   python judge_affinity.py --participant 2038
+import argparse
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from prepared import FINAL_ROUND, ROUND_ORDER
+
+import scrape_path  # noqa: F401
+import metrics as run_metrics
+
+# --- Configuration ---
+DB_FILE = "dev.db"
+# A cell needs this many marks before it is reported
+MIN_MARKS = 20
+# ... and a z-score at least this far from 0
+MIN_Z = 3.0
+# --- End Configuration ---
+
+
+class AffinityModel:
+    """
+    Residual, variance and mark count matrices of judges against couples and clubs.
+
+    Attributes:
+        judge_ids, participant_ids, clubs: Row and column labels
+        matrices: "participant" or "club" -> {"residual", "variance", "marks"}
+            CSR matrices sharing one sparsity structure, see cell_sums()
+        names: judge id -> name, participant id -> name
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        start = time.perf_counter()
+        conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+        try:
+            marks = load_marks(conn)
+            participants = pd.read_sql_query('SELECT id, name, club FROM "participants"', conn)
+            judges = pd.read_sql_query('SELECT id, name FROM "judges"', conn)
+        finally:
+            conn.close()
+
+        judge_index, self.judge_ids = pd.factorize(marks["judgeId"], sort=True)
+        participant_index, self.participant_ids = pd.factorize(marks["participantId"], sort=True)
+        residual, variance = mark_residuals(marks)
+        measures = {"residual": residual, "variance": variance, "marks": np.ones(len(marks))}
+
+        club_of = participants.set_index("id")["club"].fillna("").str.strip()
+        club_index, self.clubs = pd.factorize(club_of.reindex(self.participant_ids).fillna("").to_numpy(), sort=True)
+        self.matrices = {
+            "participant": cell_sums(judge_index, participant_index, measures,
+                                     (len(self.judge_ids), len(self.participant_ids))),
+            "club": cell_sums(judge_index, club_index[participant_index], measures,
+                              (len(self.judge_ids), len(self.clubs))),
+        }
+
+        self.names = {
+            "judge": dict(zip(judges["id"], judges["name"])),
+            "participant": dict(zip(participants["id"], participants["name"])),
+        }
+        self.mark_count = len(marks)
+        self.load_seconds = time.perf_counter() - start
+
+    def labels(self, kind: str):
+        return self.participant_ids if kind == "participant" else self.clubs
+
+    def column_name(self, kind: str, column: int) -> str:
+        label = self.labels(kind)[column]
+        if kind == "club":
+            return label or "(no club)"
+        return f"{self.names['participant'].get(label, '?')} (ID: {label})"
+
+    def z_scores(self, kind: str) -> sparse.csr_matrix:
+        """z-score of every cell, same structure as the residual matrix."""
+        matrices = self.matrices[kind]
+        z = matrices["residual"].copy()
+        variance = matrices["variance"].data
+        z.data = np.divide(z.data, np.sqrt(variance), out=np.zeros_like(z.data), where=variance > 0)
+        return z
+
+    def top(self, kind: str = "participant", k: int = 20, judge_id: int = None, column=None,
+            min_marks: int = MIN_MARKS, min_z: float = MIN_Z) -> list[dict]:
+        """
+        The k cells furthest from the panel that pass the significance filter.
+
+        Args:
+            kind: "participant" or "club"
+            judge_id: Only this judge's row
+            column: Only this participant id or club name
+            min_marks: Cells with fewer marks are ignored
+            min_z: Cells with a smaller absolute z-score are ignored
+
+        Returns:
+            List of dicts with judge, target, marks, residual and z, largest |z| first;
+            a positive residual means more X than the rest of the panel gave
+        """
+        matrices = self.matrices[kind]
+        z = self.z_scores(kind).tocoo()
+        residual, marks = matrices["residual"].tocoo(), matrices["marks"].tocoo()
+        keep = (marks.data >= min_marks) & (np.abs(z.data) >= min_z)
+        if judge_id is not None:
+            row = np.searchsorted(self.judge_ids, judge_id)
+            keep &= z.row == (row if row < len(self.judge_ids) and self.judge_ids[row] == judge_id else -1)
+        if column is not None:
+            labels = self.labels(kind)
+            matches = np.flatnonzero(labels == column)
+            keep &= z.col == (matches[0] if len(matches) else -1)
+
+        candidates = np.flatnonzero(keep)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-np.abs(z.data[candidates]), k - 1)[:k]]
+        candidates = candidates[np.argsort(-np.abs(z.data[candidates]), kind="stable")]
+        return [
+            {
+                "judgeId": int(self.judge_ids[z.row[cell]]),
+                "judge": self.names["judge"].get(self.judge_ids[z.row[cell]], "?"),
+                "target": self.column_name(kind, z.col[cell]),
+                "marks": int(marks.data[cell]),
+                "residual": float(residual.data[cell]),
+                "z": float(z.data[cell]),
+            }
+            for cell in candidates
+        ]
+
+
+def load_marks(conn: sqlite3.Connection) -> pd.DataFrame:
+    """Marks (X or not) of the non-final rounds with whether the couple advanced past the round."""
+    marks = pd.read_sql_query(
+        """
+        SELECT m.judgeId, m.participantId, m.roundId, m.danceType, m.mark, r.eventId, r.name AS roundName
+        FROM "Mark" m
+        JOIN "Round" r ON r.id = m.roundId
+        WHERE r.name != ?
+        """,
+        conn,
+        params=(FINAL_ROUND,),
+    )
+    marks["order"] = marks["roundName"].map(ROUND_ORDER)
+    marks = marks[marks["order"].notna()]
+
+    # Latest round reached per couple and event, from the section of its result
+    reached = pd.read_sql_query('SELECT eventId, participantId, section FROM "Result"', conn)
+    reached["reached"] = reached["section"].map(ROUND_ORDER)
+    reached = reached.groupby(["eventId", "participantId"], as_index=False)["reached"].max()
+    marks = marks.merge(reached, on=["eventId", "participantId"], how="left")
+    marks["advanced"] = marks["reached"].fillna(-1) > marks["order"]
+    return marks.reset_index(drop=True)
+
+
+def mark_residuals(marks: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Observed minus expected X and its variance for every mark.
+
+    The expectation is the share of the other judges of the panel that gave an
+    X to the same couple in the same round and dance, or whether the couple
+    advanced when no other judge marked it.
+    """
+    observed = marks["mark"].to_numpy(dtype=float)
+    group, _ = pd.factorize(pd.MultiIndex.from_arrays([marks["roundId"], marks["participantId"], marks["danceType"]]))
+    x_given = np.bincount(group, weights=observed)[group]
+    panel = np.bincount(group)[group]
+    others = panel - 1
+    expected = np.where(
+        others > 0,
+        (x_given - observed) / np.maximum(others, 1),
+        marks["advanced"].to_numpy(dtype=float),
+    )
+    return observed - expected, expected * (1 - expected)
+
+
+def cell_sums(rows: np.ndarray, columns: np.ndarray, measures: dict, shape: tuple) -> dict:
+    """
+    Sum every measure per (row, column) cell.
+
+    Returns:
+        measure name -> CSR matrix; all share one structure, including cells
+        whose sum is 0, so their data arrays line up element by element
+    """
+    cells, inverse = np.unique(rows.astype(np.int64) * shape[1] + columns, return_inverse=True)
+    inverse = inverse.ravel()
+    indptr = np.searchsorted(cells // shape[1], np.arange(shape[0] + 1))
+    return {
+        name: sparse.csr_matrix(
+            (np.bincount(inverse, weights=values, minlength=len(cells)), cells % shape[1], indptr), shape=shape
+        )
+        for name, values in measures.items()
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Find judges that mark couples or clubs differently from the rest of the panel.")
+    parser.add_argument("--db", default=DB_FILE, help=f"Path to the SQLite database (default: {DB_FILE}).")
+    parser.add_argument("--by", choices=["participant", "club"], default="participant",
+                        help="Compare judges against couples or clubs (default: participant).")
+    parser.add_argument("--judge", type=int, help="Only this judge id.")
+    parser.add_argument("--participant", type=int, help="Only this participant id (implies --by participant).")
+    parser.add_argument("--club", help="Only this club (implies --by club).")
+    parser.add_argument("--top", type=int, default=20, help="Number of cells to list (default: 20).")
+    parser.add_argument("--min-marks", type=int, default=MIN_MARKS,
+                        help=f"Ignore cells with fewer marks (default: {MIN_MARKS}).")
+    parser.add_argument("--min-z", type=float, default=MIN_Z,
+                        help=f"Ignore cells with a smaller absolute z-score (default: {MIN_Z}).")
+    run_metrics.add_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    kind, column = args.by, None
+    if args.participant is not None:
+        kind, column = "participant", args.participant
+    elif args.club is not None:
+        kind, column = "club", args.club
+
+    with run_metrics.instrument("judge_affinity", args.report, args.profile) as metrics:
+        with metrics.stage("load"):
+            model = AffinityModel(args.db)
+        metrics.add_rows("Mark", model.mark_count)
+        with metrics.stage("query"):
+            rows = model.top(kind, args.top, args.judge, column, args.min_marks, args.min_z)
+
+    print(f"{model.mark_count} non-final marks of {len(model.judge_ids)} judges, "
+          f"{model.matrices[kind]['marks'].nnz} judge-{kind} cells, built in {model.load_seconds:.2f}s")
+    if not rows:
+        print("No cell passes the significance filter.")
+    for row in rows:
+        leaning = "favours" if row["residual"] > 0 else "marks down"
+        print(f"{row['judge']} (ID: {row['judgeId']}) {leaning} {row['target']}: "
+              f"{row['residual']:+.1f} X over {row['marks']} marks, z = {row['z']:+.2f}")
+
+
+if __name__ == "__main__":
+    main()
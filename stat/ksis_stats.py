@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# stat/ksis_stats.py
+# One command line entry point for the stat tools.
+#
+# historical.py and judgeLike.py import pandas and matplotlib and do their work
+# at import time, so even --help takes seconds. Here only argparse is imported
+# up front; each subcommand imports what it needs when it runs. The database
+# is read through prepared.load_cached(), which keeps a pickle of PreparedData
+# in .ksis-stats-cache/ until dev.db changes, so lookups skip the joins.
+#
+#   ./ksis-stats history 580 --last-year-only --top-n 5 [--plot]
+#   ./ksis-stats judge-scores [--participant 2038]
+#   ./ksis-stats top-events --year 2024 --style Latin
+#   ./ksis-stats export [--incremental] [--merge]
+import argparse
+import sys
+
+import scrape_path  # noqa: F401
+import metrics as run_metrics
+
+# --- Configuration ---
+DB_FILE = "dev.db"
+CACHE_DIR = ".ksis-stats-cache"
+TOP_N = 10
+# --- End Configuration ---
+
+
+def load(args):
+    import prepared
+
+    if args.no_cache:
+        return prepared.PreparedData(args.db)
+    return prepared.load_cached(args.db, args.cache_dir)
+
+
+def display_date(date) -> str:
+    return date.strftime("%Y-%m-%d") if date else "?"
+
+
+# --- history ---
+def history(args):
+    """Results over time of the couples that danced in a competition, as historical.py plots them."""
+    from datetime import timedelta
+
+    data = load(args)
+    competition = data.competitions.get(args.competition_id)
+    if competition is None:
+        print(f"Competition {args.competition_id} not found.")
+        return 1
+    events = [event_id for event_id, event in data.events.items() if event["competitionId"] == args.competition_id]
+    entries = {}  # participantId -> best relative position in the competition
+    for event_id in events:
+        for result in data.event_results.get(event_id, []):
+            relative = result["relative"] if result["relative"] is not None else float("inf")
+            entries[result["participantId"]] = min(relative, entries.get(result["participantId"], float("inf")))
+    participants = sorted(entries, key=entries.get)
+    if args.top_n:
+        participants = participants[:args.top_n]
+
+    since = until = None
+    if args.last_year_only:
+        import prepared
+
+        until = prepared.parse_date(competition["date"])
+        if until is None:
+            print(f"Warning: could not parse the date of competition {args.competition_id}, showing all results.")
+        else:
+            since = until - timedelta(days=365)
+
+    series = {}
+    for participant_id in participants:
+        points = [
+            (result["date"], result["relative"])
+            for result in data.results.get(participant_id, [])
+            if result["date"] is not None and result["relative"] is not None
+            and (since is None or since <= result["date"] <= until)
+        ]
+        name = data.participants.get(participant_id, {}).get("name", "?")
+        series[name] = points
+        print(f"{name} (ID: {participant_id}): {len(points)} results")
+        for date, relative in points:
+            print(f"  {display_date(date)}  {relative:.3f}")
+
+    if args.plot and any(series.values()):
+        import matplotlib.pyplot as plt
+
+        plt.figure(figsize=(14, 8))
+        for name, points in series.items():
+            if points:
+                plt.plot(*zip(*points), marker="o", linestyle="-", label=name)
+        plt.xlabel("Date of Competition")
+        plt.ylabel("Relative Position (Position / Total Participants in Event)")
+        plt.title(f"Participants' Performance Over Time (Competition {args.competition_id})")
+        plt.legend(loc="best")
+        plt.xticks(rotation=45, ha="right")
+        plt.grid(True, linestyle="--", alpha=0.7)
+        plt.tight_layout()
+        plt.show()
+    return 0
+
+
+# --- judge-scores ---
+def judge_scores(args):
+    """Refined judge scores of judgeLike.py, overall or towards one couple."""
+    data = load(args)
+    if args.participant is None:
+        print("Refined judge scores (+1 for an X to a couple that did not advance, -1 for a missing X to one that did):")
+        for judge_id, score in data.judge_scores.most_common(args.top):
+            marks = data.judge_mark_counts.get(judge_id, 0)
+            name = data.judges.get(judge_id, {}).get("name", "?")
+            print(f"  {score:>6}  {score / marks if marks else 0:+.3f} per mark  {name} (ID: {judge_id})")
+        return 0
+
+    participant = data.participants.get(args.participant)
+    if participant is None:
+        print(f"Participant {args.participant} not found.")
+        return 1
+    scores = [(judge_id, scores[args.participant]) for judge_id, scores in data.judge_participant_scores.items()
+              if args.participant in scores]
+    event_scores = data.participant_event_scores.get(args.participant, {})
+    print(f"Score for participant {participant['name']} (ID: {args.participant}): {sum(event_scores.values())}")
+    for judge_id, score in sorted(scores, key=lambda item: -item[1])[:args.top]:
+        print(f"  {score:>4}  {data.judges.get(judge_id, {}).get('name', '?')} (ID: {judge_id})")
+    return 0
+
+
+# --- top-events ---
+def top_events(args):
+    """Events with the most couples, as scrape/test.py lists them."""
+    data = load(args)
+    events = []
+    for event in data.events.values():
+        if args.style and event.get("style") != args.style:
+            continue
+        if args.age_group and event.get("ageGroup") != args.age_group:
+            continue
+        if args.year:
+            competition = data.competitions.get(event["competitionId"], {})
+            if not (competition.get("date") or "").startswith(str(args.year)):
+                continue
+        events.append(event)
+    events.sort(key=lambda event: -event["size"])
+    for event in events[:args.top]:
+        print(f"{event['size']:>4} couples  {event['name']} (ID: {event['id']})")
+    return 0
+
+
+# --- export ---
+def export(args):
+    """Run to_csv.py with the remaining arguments."""
+    import to_csv
+
+    to_csv.db_file = args.db
+    to_csv.main(args.to_csv_args)
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="ksis-stats", description="Statistics over the migrated ksis database.")
+    parser.add_argument("--db", default=DB_FILE, help=f"Path to the SQLite database (default: {DB_FILE}).")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help=f"Where prepared data is cached between runs (default: {CACHE_DIR}).")
+    parser.add_argument("--no-cache", action="store_true", help="Load the database without the on-disk cache.")
+    run_metrics.add_arguments(parser)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("history", help="Results over time of the couples of a competition.")
+    command.add_argument("competition_id", type=int, help="Competition id (Competition.id).")
+    command.add_argument("-ly", "--last-year-only", action="store_true",
+                         help="Only results from the 365 days before the competition.")
+    command.add_argument("-tn", "--top-n", type=int, metavar="N",
+                         help="Only the N couples placed best in the competition.")
+    command.add_argument("--plot", action="store_true", help="Plot the results with matplotlib.")
+    command.set_defaults(run=history)
+
+    command = commands.add_parser("judge-scores", help="Refined judge scores, overall or for one couple.")
+    command.add_argument("--participant", type=int, help="Scores of the judges towards this participant id.")
+    command.add_argument("-n", "--top", type=int, default=TOP_N, help=f"Number of judges to list (default: {TOP_N}).")
+    command.set_defaults(run=judge_scores)
+
+    command = commands.add_parser("top-events", help="Events with the most couples.")
+    command.add_argument("--year", type=int, help="Only events of this year.")
+    command.add_argument("--style", help="Only this style (Latin, Standard, ...).")
+    command.add_argument("--age-group", help="Only this age group.")
+    command.add_argument("-n", "--top", type=int, default=TOP_N, help=f"Number of events to list (default: {TOP_N}).")
+    command.set_defaults(run=top_events)
+
+    command = commands.add_parser("export", help="Export the database to CSV (arguments are passed to to_csv.py).")
+    command.add_argument("to_csv_args", nargs=argparse.REMAINDER, help="e.g. --incremental, --merge")
+    command.set_defaults(run=export)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "export":
+        # to_csv.py writes its own run report
+        return args.run(args)
+    with run_metrics.instrument(f"ksis-stats {args.command}", args.report, args.profile):
+        return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+# stat/prepared.py
+# Load dev.db once into in-memory structures shared by the stat tools.
+#
+# historical.py and judgeLike.py each re-read the database (or the CSV export)
+# and redo the same joins for every question. PreparedData does that work once:
+# results per participant ordered by date with relative positions, event sizes,
+# and the refined judge scores of judgeLike.py (a judge earns +1 for an X to a
+# couple that did not advance past the judged round and -1 for withholding one
+# from a couple that did), totalled per judge, per participant and per event.
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+import zlib
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+
+# --- Configuration ---
+DB_FILE = "dev.db"
+# PreparedData pickles kept between runs of ksis_stats.py, see load_cached()
+CACHE_DIR = ".ksis-stats-cache"
+# Lower numbers mean earlier rounds, same order as judgeLike.py
+ROUND_ORDER = {
+    "0.Forduló": 0,
+    "Reményfutam után": 1,
+    "Redance": 2,
+    "1.Forduló": 3,
+    "2.Forduló": 4,
+    "3.Forduló": 5,
+    "4.Forduló": 6,
+    "5.Forduló": 7,
+    "6.Forduló": 8,
+    "9.Forduló": 9,
+    "11.Forduló": 10,
+    "Negyeddöntő": 11,
+    "Elődöntő": 12,
+    "Döntő": 13,
+}
+FINAL_ROUND = "Döntő"
+DATE_FORMATS = [
+    "%Y.%m.%d", "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d", "%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%S",
+]
+# --- End Configuration ---
+
+
+def parse_position(position: str):
+    """Numeric position of a result ("7. - 8." -> 7), None when it is not a number."""
+    cleaned = (position or "").strip()
+    if " - " in cleaned:
+        cleaned = cleaned.split(" - ")[0]
+    if cleaned.endswith("."):
+        cleaned = cleaned[:-1]
+    try:
+        return int(cleaned)
+    except ValueError:
+        return None
+
+
+def parse_date(value: str):
+    """Parse the date formats found in Competition.date, None when none matches."""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except (ValueError, TypeError):
+            continue
+    return None
+
+
+def results_fingerprint(conn: sqlite3.Connection, after_event: int = 0, up_to_event: int = None) -> tuple[int, int]:
+    """
+    Row count and checksum of the Result rows of the events in (after_event, up_to_event].
+
+    The checksum is a sum of one CRC per row, so the fingerprints of adjacent
+    event ranges add up. Tables kept up to date incrementally (head_to_head.py,
+    club_cube.py) store the fingerprint of the events they processed and rebuild
+    when it no longer matches: results were deleted, corrected or re-ingested
+    (migrate.py --ids-file) below their high-water mark.
+    """
+    conn.create_function("result_crc", -1, lambda *values: zlib.crc32(repr(values).encode()), deterministic=True)
+    query = """
+        SELECT COUNT(*), COALESCE(SUM(result_crc(id, eventId, participantId, position, section)), 0)
+        FROM "Result" WHERE eventId > ?
+    """
+    params = [after_event]
+    if up_to_event is not None:
+        query += " AND eventId <= ?"
+        params.append(up_to_event)
+    return tuple(conn.execute(query, params).fetchone())
+
+
+def data_version(db_file) -> tuple:
+    """Cheap fingerprint of the database files, changes whenever the database is written."""
+    version = []
+    for path in (Path(db_file), Path(f"{db_file}-wal")):
+        try:
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+
+class PreparedData:
+    """
+    Everything the participant, judge, competition and ranking questions need, keyed by id.
+
+    Attributes:
+        participants, judges, competitions, events: Rows of the tables as dicts
+        results: participantId -> results ordered by date, each with the parsed
+            position, date and relative position (position / couples in the event)
+        event_results: eventId -> results of the event ordered by position
+        event_judges: eventId -> judge ids, judge_events: judgeId -> event ids
+        judge_scores: judgeId -> total refined score
+        judge_participant_scores: judgeId -> Counter of participantId -> score
+        participant_event_scores: participantId -> Counter of eventId -> score
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = str(db_file)
+        self.version = data_version(db_file)
+        start = time.perf_counter()
+        conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+        try:
+            self._load_entities(conn)
+            self._load_results(conn)
+            self._load_judge_scores(conn)
+        finally:
+            conn.close()
+        self.loaded_at = datetime.now()
+        self.load_seconds = time.perf_counter() - start
+
+    def _load_entities(self, conn):
+        self.participants = {
+            row[0]: {"id": row[0], "name": row[1], "club": row[2]}
+            for row in conn.execute('SELECT id, name, club FROM "participants"')
+        }
+        self.judges = {
+            row[0]: {"id": row[0], "name": row[1], "location": row[2]}
+            for row in conn.execute('SELECT id, name, location FROM "judges"')
+        }
+        self.competitions = {
+            row[0]: {"id": row[0], "title": row[1], "date": row[2], "location": row[3]}
+            for row in conn.execute('SELECT id, title, date, location FROM "Competition"')
+        }
+        columns = {row[1] for row in conn.execute('PRAGMA table_info("Event")')}
+        categories = [name for name in ("ageGroup", "danceClass", "style") if name in columns]
+        self.events = {}
+        for row in conn.execute(f'SELECT id, name, competitionId, falseData{"".join(", " + c for c in categories)} FROM "Event"'):
+            event = {"id": row[0], "name": row[1], "competitionId": row[2], "falseData": bool(row[3])}
+            event.update(zip(categories, row[4:]))
+            self.events[row[0]] = event
+
+        self.event_judges = defaultdict(list)
+        self.judge_events = defaultdict(list)
+        # Implicit many-to-many table of Prisma: A is the Event, B the judge
+        for event_id, judge_id in conn.execute('SELECT A, B FROM "_EventToJudge"'):
+            self.event_judges[event_id].append(judge_id)
+            self.judge_events[judge_id].append(event_id)
+
+    def _load_results(self, conn):
+        rows = conn.execute('SELECT eventId, participantId, section, position FROM "Result"').fetchall()
+        sizes = defaultdict(set)
+        for event_id, participant_id, _, _ in rows:
+            sizes[event_id].add(participant_id)
+        for event_id, event in self.events.items():
+            event["size"] = len(sizes.get(event_id, ()))
+
+        dates = {competition_id: parse_date(competition["date"])
+                 for competition_id, competition in self.competitions.items()}
+        self.results = defaultdict(list)
+        self.event_results = defaultdict(list)
+        self.max_round = {}  # (participantId, eventId) -> latest round order reached
+        for event_id, participant_id, section, position in rows:
+            event = self.events.get(event_id)
+            if event is None:
+                continue
+            place = parse_position(position)
+            size = event["size"]
+            result = {
+                "eventId": event_id,
+                "competitionId": event["competitionId"],
+                "participantId": participant_id,
+                "date": dates.get(event["competitionId"]),
+                "section": section,
+                "position": position,
+                "place": place,
+                "relative": place / size if place is not None and size else None,
+            }
+            self.results[participant_id].append(result)
+            self.event_results[event_id].append(result)
+
+            order = ROUND_ORDER.get(section)
+            if order is not None:
+                key = (participant_id, event_id)
+                self.max_round[key] = max(order, self.max_round.get(key, -1))
+
+        for history in self.results.values():
+            history.sort(key=lambda result: (result["date"] is None, result["date"] or datetime.min))
+        for standings in self.event_results.values():
+            standings.sort(key=lambda result: (result["place"] is None, result["place"] or 0))
+
+    def _load_judge_scores(self, conn):
+        round_orders = {
+            round_id: (event_id, ROUND_ORDER.get(name))
+            for round_id, name, event_id in conn.execute('SELECT id, name, eventId FROM "Round"')
+            if name != FINAL_ROUND
+        }
+        self.judge_scores = Counter()
+        self.judge_participant_scores = defaultdict(Counter)
+        self.participant_event_scores = defaultdict(Counter)
+        self.judge_mark_counts = Counter()
+
+        marks = conn.execute('SELECT roundId, participantId, judgeId, mark FROM "Mark"')
+        while True:
+            batch = marks.fetchmany(50_000)
+            if not batch:
+                break
+            for round_id, participant_id, judge_id, mark in batch:
+                judged = round_orders.get(round_id)
+                # Finals and rounds missing from ROUND_ORDER are not scored
+                if judged is None or judged[1] is None:
+                    continue
+                event_id, judged_order = judged
+                advanced = self.max_round.get((participant_id, event_id), -1) > judged_order
+                self.judge_mark_counts[judge_id] += 1
+                if mark and not advanced:
+                    score = 1
+                elif not mark and advanced:
+                    score = -1
+                else:
+                    continue
+                self.judge_scores[judge_id] += score
+                self.judge_participant_scores[judge_id][participant_id] += score
+                self.participant_event_scores[participant_id][event_id] += score
+
+    def summary(self) -> dict:
+        return {
+            "db": self.db_file,
+            "loadedAt": self.loaded_at.isoformat(timespec="seconds"),
+            "loadSeconds": round(self.load_seconds, 3),
+            "participants": len(self.participants),
+            "judges": len(self.judges),
+            "competitions": len(self.competitions),
+            "events": len(self.events),
+            "results": sum(len(history) for history in self.results.values()),
+        }
+
+
+def load_cached(db_file=DB_FILE, cache_dir=CACHE_DIR) -> PreparedData:
+    """
+    PreparedData of a database, unpickled from `cache_dir` while the database is unchanged.
+
+    The cache file is named after the database path and holds the data_version()
+    it was built from; any write to the database makes it stale and the data is
+    loaded again and re-cached.
+    """
+    key = hashlib.sha1(str(Path(db_file).resolve()).encode()).hexdigest()[:16]
+    path = Path(cache_dir) / f"prepared-{key}.pickle"
+    version = data_version(db_file)
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.version == version:
+            return data
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+
+    data = PreparedData(db_file)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(f"{path}.tmp", "wb") as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f"{path}.tmp", path)
+    return data
@@ -0,0 +1,328 @@
+# stat/query_service.py
+# Long-lived statistics service answering participant, judge, competition and ranking queries.
+#
+# The database is loaded once into PreparedData (see prepared.py) and every
+# answer is kept in an LRU cache. Before each request the database files are
+# stat()ed; when they changed the data is reloaded and the cache cleared, so a
+# migration run never leaves stale answers behind.
+#
+#   python query_service.py --db ../scrape/dev.db             # http://localhost:8765
+#   python query_service.py --socket /tmp/ksis-stats.sock
+#   curl 'localhost:8765/participant?id=2038'
+#   curl --unix-socket /tmp/ksis-stats.sock 'http://x/rankings?style=Latin&year=2024'
+import argparse
+import json
+import os
+import signal
+import socketserver
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import prepared
+
+# --- Configuration ---
+HOST = "localhost"
+PORT = 8765
+CACHE_SIZE = 4096
+TOP_N = 20
+# Rankings only count couples with at least this many results
+MIN_RESULTS = 3
+# --- End Configuration ---
+
+
+# --- Queries ---
+def participant_summary(data: prepared.PreparedData, participant_id: int):
+    participant = data.participants.get(participant_id)
+    if participant is None:
+        return None
+    history = [
+        {
+            "date": result["date"].strftime("%Y-%m-%d") if result["date"] else None,
+            "competitionId": result["competitionId"],
+            "eventId": result["eventId"],
+            "event": data.events[result["eventId"]]["name"],
+            "section": result["section"],
+            "position": result["position"],
+            "relativePosition": result["relative"],
+        }
+        for result in data.results.get(participant_id, [])
+    ]
+    relatives = [entry["relativePosition"] for entry in history if entry["relativePosition"] is not None]
+    event_scores = data.participant_event_scores.get(participant_id, Counter())
+    return {
+        **participant,
+        "results": len(history),
+        "meanRelativePosition": sum(relatives) / len(relatives) if relatives else None,
+        "judgeScore": sum(event_scores.values()),
+        "judgeScoreByEvent": [
+            {"eventId": event_id, "score": score} for event_id, score in event_scores.most_common()
+        ],
+        "history": history,
+    }
+
+
+def judge_summary(data: prepared.PreparedData, judge_id: int, top: int = TOP_N):
+    judge = data.judges.get(judge_id)
+    if judge is None:
+        return None
+    by_participant = data.judge_participant_scores.get(judge_id, Counter())
+    ranked = by_participant.most_common()
+
+    def named(entries):
+        return [
+            {"participantId": participant_id,
+             "name": data.participants.get(participant_id, {}).get("name"),
+             "score": score}
+            for participant_id, score in entries
+        ]
+
+    return {
+        **judge,
+        "events": len(data.judge_events.get(judge_id, ())),
+        "scoredMarks": data.judge_mark_counts.get(judge_id, 0),
+        "score": data.judge_scores.get(judge_id, 0),
+        # Positive: the judge gave X to couples the panel did not put through
+        "mostFavoured": named(entry for entry in ranked[:top] if entry[1] > 0),
+        "leastFavoured": named(entry for entry in reversed(ranked[-top:]) if entry[1] < 0),
+    }
+
+
+def competition_summary(data: prepared.PreparedData, competition_id: int):
+    competition = data.competitions.get(competition_id)
+    if competition is None:
+        return None
+    events = []
+    for event in data.events.values():
+        if event["competitionId"] != competition_id:
+            continue
+        events.append({
+            **event,
+            "judges": [data.judges[judge_id] for judge_id in data.event_judges.get(event["id"], ())
+                       if judge_id in data.judges],
+            "results": [
+                {"participantId": result["participantId"],
+                 "name": data.participants.get(result["participantId"], {}).get("name"),
+                 "section": result["section"],
+                 "position": result["position"]}
+                for result in data.event_results.get(event["id"], [])
+            ],
+        })
+    return {**competition, "events": events}
+
+
+def judge_ranking(data: prepared.PreparedData, top: int = TOP_N):
+    return [
+        {"judgeId": judge_id, "name": data.judges.get(judge_id, {}).get("name"), "score": score}
+        for judge_id, score in data.judge_scores.most_common(top)
+    ]
+
+
+def rankings(data: prepared.PreparedData, style=None, ageGroup=None, danceClass=None, year=None,
+             top: int = TOP_N, min_results: int = MIN_RESULTS):
+    """Couples ordered by mean relative position (lower is better) over the matching events."""
+    totals = {}
+    for participant_id, history in data.results.items():
+        relatives = []
+        for result in history:
+            event = data.events[result["eventId"]]
+            if result["relative"] is None:
+                continue
+            if style and event.get("style") != style:
+                continue
+            if ageGroup and event.get("ageGroup") != ageGroup:
+                continue
+            if danceClass and event.get("danceClass") != danceClass:
+                continue
+            if year and (result["date"] is None or result["date"].year != year):
+                continue
+            relatives.append(result["relative"])
+        if len(relatives) >= min_results:
+            totals[participant_id] = (sum(relatives) / len(relatives), len(relatives))
+
+    ranked = sorted(totals.items(), key=lambda item: item[1])[:top]
+    return [
+        {"rank": rank, "participantId": participant_id,
+         "name": data.participants.get(participant_id, {}).get("name"),
+         "club": data.participants.get(participant_id, {}).get("club"),
+         "meanRelativePosition": mean, "results": count}
+        for rank, (participant_id, (mean, count)) in enumerate(ranked, start=1)
+    ]
+
+
+# --- Service ---
+class StatsService:
+    """PreparedData plus an LRU answer cache, reloaded when the database changes."""
+
+    QUERIES = {
+        "participant": (participant_summary, {"id": int}),
+        "judge": (judge_summary, {"id": int, "top": int}),
+        "competition": (competition_summary, {"id": int}),
+        "judges": (judge_ranking, {"top": int}),
+        "rankings": (rankings, {"style": str, "ageGroup": str, "danceClass": str, "year": int,
+                                "top": int, "min_results": int}),
+    }
+
+    def __init__(self, db_file, cache_size: int = CACHE_SIZE):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self.data = prepared.PreparedData(db_file)
+        self.reloads = 0
+        self._answer = lru_cache(maxsize=cache_size)(self._compute)
+
+    def refresh(self) -> None:
+        """Reload the data and drop every cached answer if the database changed on disk."""
+        if prepared.data_version(self.db_file) == self.data.version:
+            return
+        with self._lock:
+            if prepared.data_version(self.db_file) == self.data.version:
+                return  # another thread already reloaded
+            data = prepared.PreparedData(self.db_file)
+            self.data = data
+            self._answer.cache_clear()
+            self.reloads += 1
+
+    def _compute(self, data: prepared.PreparedData, name: str, params: tuple):
+        function, _ = self.QUERIES[name]
+        if "id" in dict(params):
+            params = dict(params)
+            return function(data, params.pop("id"), **params)
+        return function(data, **dict(params))
+
+    def query(self, name: str, raw_params: dict):
+        """
+        Answer one query.
+
+        Raises:
+            KeyError: Unknown query name
+            ValueError: Missing or malformed parameters
+        """
+        _, types = self.QUERIES[name]
+        params = {}
+        for key, value in raw_params.items():
+            if key not in types:
+                raise ValueError(f"Unknown parameter '{key}' for {name}")
+            try:
+                params[key] = types[key](value)
+            except ValueError:
+                raise ValueError(f"Parameter '{key}' must be {types[key].__name__}") from None
+        if "id" in types and "id" not in params:
+            raise ValueError(f"Parameter 'id' is required for {name}")
+        self.refresh()
+        # The data object is part of the key, so an answer computed from the old
+        # data while another thread reloads can never be served afterwards
+        return self._answer(self.data, name, tuple(sorted(params.items())))
+
+    def status(self) -> dict:
+        info = self._answer.cache_info()
+        return {
+            **self.data.summary(),
+            "reloads": self.reloads,
+            "cache": {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxSize": info.maxsize},
+        }
+
+
+class StatsHandler(BaseHTTPRequestHandler):
+    service = None  # set on a per-server subclass by make_server()
+
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        name = url.path.strip("/")
+        try:
+            if name in ("", "status"):
+                self.service.refresh()
+                status, payload = 200, self.service.status()
+            else:
+                payload = self.service.query(name, dict(parse_qsl(url.query)))
+                status = 200 if payload is not None else 404
+                if payload is None:
+                    payload = {"error": f"No {name} with that id"}
+        except KeyError:
+            status, payload = 404, {"error": f"Unknown query '{name}'",
+                                    "queries": sorted(self.service.QUERIES)}
+        except ValueError as e:
+            status, payload = 400, {"error": str(e)}
+
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Query-Time", f"{(time.perf_counter() - start) * 1000:.2f}ms")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket clients have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        # BaseHTTPRequestHandler expects these from HTTPServer
+        self.server_name, self.server_port = "localhost", 0
+
+
+def make_server(service: StatsService, host=HOST, port=PORT, socket_path=None, verbose=False):
+    handler = type("Handler", (StatsHandler,), {"service": service})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, handler)
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        server.daemon_threads = True
+    server.verbose = verbose
+    return server
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve statistics queries from data loaded once into memory.")
+    parser.add_argument("--db", default=prepared.DB_FILE, help=f"Path to the SQLite database (default: {prepared.DB_FILE}).")
+    parser.add_argument("--host", default=HOST, help=f"Interface to listen on (default: {HOST}).")
+    parser.add_argument("-p", "--port", type=int, default=PORT, help=f"Port to listen on (default: {PORT}).")
+    parser.add_argument("--socket", default=None, help="Listen on this Unix socket instead of TCP.")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE,
+                        help=f"Number of answers kept in the LRU cache (default: {CACHE_SIZE}).")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every request.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.db):
+        print(f"Error: database '{args.db}' not found.")
+        exit(1)
+
+    service = StatsService(args.db, args.cache_size)
+    summary = service.data.summary()
+    print(f"Loaded {summary['participants']} participants, {summary['judges']} judges and "
+          f"{summary['events']} events in {summary['loadSeconds']:.2f}s.")
+
+    server = make_server(service, args.host, args.port, args.socket, args.verbose)
+    where = f"unix:{args.socket}" if args.socket else f"http://{args.host}:{args.port}"
+    # Stop cleanly (and remove the socket) on kill as well as on Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print(f"Serving {', '.join('/' + name for name in StatsService.QUERIES)} and /status on {where} (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# stat/rolling.py
+# Rolling form of every couple over its last N events or the last D days.
+#
+# historical.py --last-year-only parses every date again and filters each
+# couple's results in Python for one fixed 365-day window. RollingForm lays the
+# results of all couples out once, as flat numpy arrays sorted by (couple,
+# date), with prefix sums of the relative position, wins and podiums. A window
+# is then two indices per couple: for "last N events" they come from the couple
+# offsets, for "last D days" from np.searchsorted on the sorted (couple, day)
+# keys. Sums over a window are differences of prefix sums, so the metrics of
+# every couple come out of a handful of vectorized operations.
+#
+# The arrays are built from PreparedData (prepared.py) and only rebuilt when
+# data_version() says the database changed, i.e. after new competitions.
+#
+#   python rolling.py --days 365
+#   python rolling.py --events 5 --as-of 2024.06.30 --participant 2038 2041
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+
+import prepared
+
+# --- Configuration ---
+DB_FILE = "dev.db"
+# Windows of the command line summary when none is given
+DEFAULT_DAYS = (90, 365)
+# A couple needs this many results in the window to be listed
+MIN_EVENTS = 3
+# --- End Configuration ---
+
+# Spacing of the (couple, day) sort keys, larger than any day ordinal
+DAY_SPAN = 1 << 22
+
+
+class RollingForm:
+    """
+    Results of every couple in flat date-sorted arrays with prefix sums.
+
+    Attributes:
+        participant_ids: Sorted ids of the couples with at least one dated,
+            placed result
+        offsets: Results of participant_ids[i] are at offsets[i]:offsets[i + 1]
+        days, relative, place: Per result, date as a day ordinal
+        last_day: Day ordinal of the latest result in the database, 0 when
+            there is none; the default reference date of the windows
+        prefix: Column name -> prefix sums over the results (length + 1)
+        version: data_version() of the database the arrays were built from
+    """
+
+    def __init__(self, data: prepared.PreparedData):
+        self.db_file = data.db_file
+        self.version = data.version
+        start = time.perf_counter()
+
+        participant_ids, days, relative, place = [], [], [], []
+        for participant_id in sorted(data.results):
+            dated = [result for result in data.results[participant_id]
+                     if result["date"] is not None and result["relative"] is not None]
+            if not dated:
+                continue
+            participant_ids.append(participant_id)
+            days.append([result["date"].toordinal() for result in dated])
+            relative.append([result["relative"] for result in dated])
+            place.append([result["place"] for result in dated])
+
+        counts = np.array([len(values) for values in days], dtype=np.int64)
+        self.participant_ids = np.array(participant_ids, dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        # PreparedData keeps every history sorted by date already
+        self.days = np.concatenate(days).astype(np.int64) if days else np.empty(0, dtype=np.int64)
+        self.relative = np.concatenate(relative).astype(float) if relative else np.empty(0)
+        self.place = np.concatenate(place).astype(np.int64) if place else np.empty(0, dtype=np.int64)
+        self.last_day = int(self.days.max()) if len(self.days) else 0
+        self.keys = np.repeat(np.arange(len(counts), dtype=np.int64), counts) * DAY_SPAN + self.days
+
+        self.prefix = {
+            name: np.concatenate([[0], np.cumsum(values)])
+            for name, values in (
+                ("relative", self.relative),
+                ("relativeSquared", self.relative ** 2),
+                ("wins", self.place == 1),
+                ("podiums", self.place <= 3),
+            )
+        }
+        self.names = {participant_id: data.participants.get(participant_id, {}).get("name")
+                      for participant_id in participant_ids}
+        self.build_seconds = time.perf_counter() - start
+
+    def rows(self, participant_ids=None) -> np.ndarray:
+        """Row numbers of the given couples (all when None); unknown ids are dropped."""
+        if participant_ids is None:
+            return np.arange(len(self.participant_ids))
+        wanted = np.asarray(list(participant_ids), dtype=np.int64)
+        rows = np.searchsorted(self.participant_ids, wanted)
+        rows = rows[rows < len(self.participant_ids)]
+        return rows[np.isin(self.participant_ids[rows], wanted)]
+
+    def window(self, rows: np.ndarray, events: int = None, days: int = None, as_of=None):
+        """
+        Start and end (exclusive) result index of every couple's window.
+
+        Args:
+            events: Only the last N results up to `as_of`
+            days: Only the results of the last D days up to `as_of`
+            as_of: Reference date (datetime), default is the latest result in
+                the database
+        """
+        if as_of is None:
+            end = self.offsets[rows + 1]
+        else:
+            end = np.searchsorted(self.keys, rows * DAY_SPAN + as_of.toordinal(), side="right")
+        start = self.offsets[rows]
+        if events is not None:
+            start = np.maximum(start, end - events)
+        if days is not None:
+            # The same reference for every couple, so a couple that stopped competing has an empty window
+            reference = as_of.toordinal() if as_of is not None else self.last_day
+            # Results of the window are on days (reference - days, reference]
+            start = np.maximum(start, np.searchsorted(self.keys, rows * DAY_SPAN + reference - days + 1))
+        return start, np.maximum(start, end)
+
+    def form(self, participant_ids=None, events: int = None, days: int = None, as_of=None) -> dict:
+        """
+        Form metrics of many couples over one window, as parallel arrays.
+
+        Without `as_of`, "last D days" counts back from the latest result in the
+        database.
+
+        Returns:
+            Dict of numpy arrays: participantId, events, meanRelative,
+            stdRelative, wins, podiums, trend (mean relative in the window
+            minus the mean over the couple's whole history, negative means
+            better than usual) and lastDay (day ordinal of the last result)
+        """
+        rows = self.rows(participant_ids)
+        start, end = self.window(rows, events, days, as_of)
+        count = end - start
+
+        def window_sum(name):
+            return self.prefix[name][end] - self.prefix[name][start]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = window_sum("relative") / count
+            variance = np.maximum(window_sum("relativeSquared") / count - mean ** 2, 0)
+            career = (self.prefix["relative"][self.offsets[rows + 1]] - self.prefix["relative"][self.offsets[rows]]) \
+                / (self.offsets[rows + 1] - self.offsets[rows])
+        return {
+            "participantId": self.participant_ids[rows],
+            "events": count,
+            "meanRelative": mean,
+            "stdRelative": np.sqrt(variance),
+            "wins": window_sum("wins"),
+            "podiums": window_sum("podiums"),
+            "trend": mean - career,
+            "lastDay": np.where(count > 0, self.days[np.maximum(end - 1, 0)], 0) if len(self.days) else count,
+        }
+
+
+class FormService:
+    """RollingForm of a database that is rebuilt only when the database changed on disk."""
+
+    def __init__(self, db_file=DB_FILE, cache_dir=prepared.CACHE_DIR):
+        self.db_file = str(db_file)
+        self.cache_dir = cache_dir
+        self.rolling = None
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """Rebuild the arrays if new data arrived, return whether they were rebuilt."""
+        if self.rolling is not None and prepared.data_version(self.db_file) == self.rolling.version:
+            return False
+        self.rolling = RollingForm(prepared.load_cached(self.db_file, self.cache_dir))
+        return True
+
+    def form(self, participant_ids=None, events: int = None, days: int = None, as_of=None) -> dict:
+        self.refresh()
+        return self.rolling.form(participant_ids, events, days, as_of)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rolling form of couples over their last events or days.")
+    parser.add_argument("--db", default=DB_FILE, help=f"Path to the SQLite database (default: {DB_FILE}).")
+    parser.add_argument("--events", type=int, help="Window of the last N results.")
+    parser.add_argument("--days", type=int, nargs="+",
+                        help=f"Windows of the last D days (default: {' '.join(map(str, DEFAULT_DAYS))}).")
+    parser.add_argument("--as-of", help="Reference date yyyy.mm.dd (default: the latest result in the database).")
+    parser.add_argument("--participant", type=int, nargs="+", help="Only these participant ids.")
+    parser.add_argument("--min-events", type=int, default=MIN_EVENTS,
+                        help=f"Only list couples with this many results in the window (default: {MIN_EVENTS}).")
+    parser.add_argument("-n", "--top", type=int, default=20, help="Number of couples to list per window (default: 20).")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    as_of = prepared.parse_date(args.as_of) if args.as_of else None
+    if args.as_of and as_of is None:
+        print(f"Could not parse the date {args.as_of!r}.")
+        exit(1)
+    service = FormService(args.db)
+    rolling = service.rolling
+    print(f"{len(rolling.participant_ids)} couples, {len(rolling.days)} results, "
+          f"arrays built in {rolling.build_seconds:.3f}s")
+
+    windows = []
+    if args.events:
+        windows.append((f"last {args.events} events", {"events": args.events}))
+    for days in args.days or ([] if args.events else DEFAULT_DAYS):
+        windows.append((f"last {days} days", {"days": days}))
+
+    for label, window in windows:
+        start = time.perf_counter()
+        metrics = service.form(args.participant, as_of=as_of, **window)
+        elapsed = time.perf_counter() - start
+        listed = np.flatnonzero(metrics["events"] >= (1 if args.participant else args.min_events))
+        listed = listed[np.argsort(metrics["meanRelative"][listed], kind="stable")][:args.top]
+        print(f"\nForm over the {label} ({len(metrics['participantId'])} couples in {elapsed * 1000:.1f} ms):")
+        for row in listed:
+            participant_id = int(metrics["participantId"][row])
+            last = datetime.fromordinal(int(metrics["lastDay"][row])).strftime("%Y-%m-%d") if metrics["events"][row] else "-"
+            print(f"  {metrics['meanRelative'][row]:.3f} ±{metrics['stdRelative'][row]:.3f}  "
+                  f"trend {metrics['trend'][row]:+.3f}  {metrics['events'][row]:>3} events  "
+                  f"{metrics['wins'][row]:>2} wins {metrics['podiums'][row]:>3} podiums  last {last}  "
+                  f"{rolling.names.get(participant_id)} (ID: {participant_id})")
+
+
+if __name__ == "__main__":
+    main()
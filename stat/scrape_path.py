@@ -0,0 +1,14 @@
+# stat/scrape_path.py
+# Make the shared modules of scrape/ (metrics.py, ...) importable from the stat tools.
+#
+# The stat scripts are run from stat/, so only this directory is on sys.path.
+# Importing this module once adds scrape/ as well:
+#
+#   import scrape_path  # noqa: F401
+#   import metrics as run_metrics
+import sys
+from pathlib import Path
+
+SCRAPE_DIR = str(Path(__file__).resolve().parent.parent / "scrape")
+if SCRAPE_DIR not in sys.path:
+    sys.path.append(SCRAPE_DIR)
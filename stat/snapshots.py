@@ -0,0 +1,427 @@
+# stat/snapshots.py
+# Render static, content-hashed JSON snapshots of dev.db for the web routes.
+#
+# The competition-results, competition-marks, participant and rankings routes
+# re-scrape ksis.szts.sk on every request although the same data is in dev.db
+# after migrate.py. This builder renders those documents from the database:
+#
+#   snapshots/competition-results/<sutaz_id>.<hash>.json   (same shape as the route)
+#   snapshots/competition-marks/<sutaz_id>.<hash>.json
+#   snapshots/participant/<par_id>.<hash>.json
+#   snapshots/rankings/<year>-<age group>-<style>.<hash>.json
+#   snapshots/manifest.json   logical key -> current file, plus the build state
+#
+# File names change whenever the content does, so they can be cached forever.
+# Documents are rendered in a process pool, and after the first build only the
+# entries touched by competitions added since the last build are re-rendered.
+# Every build drops the manifest entries (and files) of keys the database no
+# longer has, e.g. deleted competitions or a changed sourceId.
+#
+#   python snapshots.py --db ../scrape/dev.db --out snapshots -w 8
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from prepared import parse_position
+
+# --- Configuration ---
+DB_FILE = "dev.db"
+OUTPUT_DIR = "snapshots"
+MANIFEST = "manifest.json"
+CHUNK_SIZE = 200
+HASH_LENGTH = 12
+# Rankings only list couples with at least this many results in the group
+MIN_RESULTS = 2
+KINDS = ("competition-results", "competition-marks", "participant", "rankings")
+# --- End Configuration ---
+
+PROFILE_ID_RE = re.compile(r"par\.php\?id=(\d+)")
+MARK_HEADERS = ("Helyezés", "FordulóRsz.")
+MARK_TRAILERS = ("Összesen", "Továbbjutott", "Megjegyzés")
+
+# Connection of the worker process and its competition id -> URL key map, set by init_worker()
+conn = None
+competition_keys = {}
+
+
+def slug(text) -> str:
+    text = unicodedata.normalize("NFKD", str(text or "all"))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-") or "all"
+
+
+def connect(db_file) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+
+
+def has_column(connection, table: str, column: str) -> bool:
+    return any(row[1] == column for row in connection.execute(f'PRAGMA table_info("{table}")'))
+
+
+def public_ids(connection) -> dict:
+    """Competition id -> key used in URLs: the ksis sutaz_id when known, else the database id."""
+    if has_column(connection, "Competition", "sourceId"):
+        rows = connection.execute('SELECT id, COALESCE(sourceId, id) FROM "Competition"')
+    else:
+        rows = connection.execute('SELECT id, id FROM "Competition"')
+    return dict(rows.fetchall())
+
+
+def participant_key(participant_id: int, profile_link: str) -> str:
+    match = PROFILE_ID_RE.search(profile_link or "")
+    return match.group(1) if match else f"db-{participant_id}"
+
+
+# --- Documents ---
+def render_competition_results(competition_id: int) -> dict:
+    title, date, location = conn.execute(
+        'SELECT title, date, location FROM "Competition" WHERE id = ?', (competition_id,)
+    ).fetchone()
+    judges = conn.execute(
+        """
+        SELECT j.name, j.location, j.link FROM "Event" e
+        JOIN "_EventToJudge" ej ON ej.A = e.id
+        JOIN "judges" j ON j.id = ej.B
+        WHERE e.competitionId = ?
+        ORDER BY j.id
+        """,
+        (competition_id,),
+    ).fetchall()
+    results = conn.execute(
+        """
+        SELECT r.position, r.number, p.name, p.club, r.section, p.profileLink FROM "Event" e
+        JOIN "Result" r ON r.eventId = e.id
+        JOIN "participants" p ON p.id = r.participantId
+        WHERE e.competitionId = ?
+        ORDER BY r.id
+        """,
+        (competition_id,),
+    ).fetchall()
+    return {
+        "title": title,
+        "date": date,
+        "location": location,
+        "judges": [{"name": name, "location": where, "link": link} for name, where, link in judges],
+        "participantCount": str(len({number for _, number, _, _, _, _ in results})),
+        "results": [
+            {"position": position, "number": number, "name": name, "club": club,
+             "section": section, "profileLink": link}
+            for position, number, name, club, section, link in results
+        ],
+    }
+
+
+def render_competition_marks(competition_id: int) -> dict:
+    """Rebuild the mark tables from the Mark rows, in the format migrate.py reads."""
+    title = conn.execute('SELECT title FROM "Competition" WHERE id = ?', (competition_id,)).fetchone()[0]
+    rows = conn.execute(
+        """
+        SELECT ro.id, ro.name, r.number, m.danceType, m.mark, m.proposedPlacement FROM "Event" e
+        JOIN "Round" ro ON ro.eventId = e.id
+        JOIN "Mark" m ON m.roundId = ro.id
+        JOIN "Result" r ON r.id = m.resultId
+        WHERE e.competitionId = ?
+        ORDER BY ro.id, m.id
+        """,
+        (competition_id,),
+    ).fetchall()
+
+    sections = {}
+    for round_id, name, number, dance, mark, placement in rows:
+        section = sections.setdefault(round_id, {"title": name, "dances": [], "rows": {}})
+        if dance not in section["dances"]:
+            section["dances"].append(dance)
+        row = section["rows"].setdefault(number, {"FordulóRsz.": number})
+        row[dance] = row.get(dance, "") + ("X" if mark else str(placement) if placement else "-")
+
+    return {
+        "title": title,
+        "sections": [
+            {"title": section["title"],
+             "headers": [*MARK_HEADERS, *section["dances"], *MARK_TRAILERS],
+             "rows": list(section["rows"].values())}
+            for section in sections.values()
+        ],
+    }
+
+
+def render_participant(participant_ids: list) -> dict:
+    """History of a couple profile, across every spelling of the couple's name in participants."""
+    placeholders = ",".join("?" * len(participant_ids))
+    name, club = conn.execute(
+        f'SELECT name, club FROM "participants" WHERE id IN ({placeholders}) ORDER BY id DESC', participant_ids
+    ).fetchone()
+    rows = conn.execute(
+        f"""
+        SELECT c.id, c.date, e.name, e.ageGroup, e.danceClass, e.style, r.section, r.position,
+               (SELECT COUNT(DISTINCT r2.participantId) FROM "Result" r2 WHERE r2.eventId = e.id)
+        FROM "Result" r
+        JOIN "Event" e ON e.id = r.eventId
+        JOIN "Competition" c ON c.id = e.competitionId
+        WHERE r.participantId IN ({placeholders})
+        ORDER BY c.date, c.id
+        """,
+        participant_ids,
+    ).fetchall()
+    return {
+        "name": name,
+        "club": club,
+        "competitions": [
+            {"competitionId": competition_keys.get(competition_id, competition_id), "date": date, "event": event,
+             "ageGroup": age, "danceClass": cls, "style": style,
+             "participantsCount": str(count), "section": section, "position": position}
+            for competition_id, date, event, age, cls, style, section, position, count in rows
+        ],
+    }
+
+
+def render_rankings(group: tuple) -> dict:
+    """Couples of one (year, age group, style) ordered by mean relative position (lower is better)."""
+    year, age_group, style = group
+    rows = conn.execute(
+        """
+        SELECT r.participantId, r.eventId, r.position FROM "Result" r
+        JOIN "Event" e ON e.id = r.eventId
+        JOIN "Competition" c ON c.id = e.competitionId
+        WHERE substr(c.date, 1, 4) = ? AND e.ageGroup IS ? AND e.style IS ?
+        """,
+        (year, age_group, style),
+    ).fetchall()
+    sizes = defaultdict(set)
+    for participant_id, event_id, _ in rows:
+        sizes[event_id].add(participant_id)
+
+    relatives = defaultdict(list)
+    for participant_id, event_id, position in rows:
+        place = parse_position(position)
+        if place is not None:
+            relatives[participant_id].append(place / len(sizes[event_id]))
+    ranked = sorted(
+        (sum(values) / len(values), -len(values), participant_id)
+        for participant_id, values in relatives.items() if len(values) >= MIN_RESULTS
+    )
+    names = {
+        row[0]: row[1:]
+        for row in conn.execute(
+            f'SELECT id, name, club, profileLink FROM "participants" WHERE id IN ({",".join("?" * len(ranked))})',
+            [participant_id for _, _, participant_id in ranked],
+        )
+    } if ranked else {}
+    return {
+        "year": year,
+        "ageGroup": age_group,
+        "style": style,
+        "events": len(sizes),
+        "rankings": [
+            {"position": str(rank), "participant": participant_key(participant_id, names[participant_id][2]),
+             "name": names[participant_id][0], "club": names[participant_id][1],
+             "meanRelativePosition": round(mean, 4), "results": -count}
+            for rank, (mean, count, participant_id) in enumerate(ranked, start=1)
+        ],
+    }
+
+
+RENDERERS = {
+    "competition-results": render_competition_results,
+    "competition-marks": render_competition_marks,
+    "participant": render_participant,
+    "rankings": render_rankings,
+}
+
+
+# --- Building ---
+def init_worker(db_file):
+    global conn, competition_keys
+    conn = connect(db_file)
+    competition_keys = public_ids(conn)
+
+
+def write_document(out_dir: Path, kind: str, key: str, document: dict) -> tuple[str, str]:
+    """Write a document under its content hash unless that file already exists, return (file, hash)."""
+    body = json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode()
+    digest = hashlib.sha256(body).hexdigest()
+    file = f"{kind}/{key}.{digest[:HASH_LENGTH]}.json"
+    path = out_dir / file
+    if not path.exists():
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(body)
+        os.replace(tmp, path)
+    return file, digest
+
+
+def render_chunk(out_dir: str, kind: str, items: list) -> list[tuple]:
+    """Render and write one chunk of (key, source) items, runs in the worker processes."""
+    written = []
+    for key, source in items:
+        file, digest = write_document(Path(out_dir), kind, key, RENDERERS[kind](source))
+        written.append((f"{kind}/{key}", file, digest))
+    return written
+
+
+def plan(connection, since_competition: int = 0) -> dict:
+    """
+    Work out which documents to render.
+
+    Args:
+        since_competition: Only render documents affected by competitions with a
+            larger database id (0 renders everything)
+
+    Returns:
+        kind -> list of (key, render argument) items
+    """
+    ids = public_ids(connection)
+    competitions = [competition_id for competition_id in sorted(ids) if competition_id > since_competition]
+    new = set(competitions)
+
+    profiles = defaultdict(list)
+    for participant_id, link in connection.execute('SELECT id, profileLink FROM "participants" ORDER BY id'):
+        profiles[participant_key(participant_id, link)].append(participant_id)
+    touched = {
+        participant_id for (participant_id,) in connection.execute(
+            'SELECT DISTINCT r.participantId FROM "Result" r JOIN "Event" e ON e.id = r.eventId WHERE e.competitionId > ?',
+            (since_competition,),
+        )
+    }
+    groups = {
+        (date[:4], age_group, style)
+        for competition_id, date, age_group, style in connection.execute(
+            'SELECT c.id, c.date, e.ageGroup, e.style FROM "Event" e JOIN "Competition" c ON c.id = e.competitionId'
+        )
+        if competition_id in new and date and date[:4] != "0000"
+    }
+    return {
+        "competition-results": [(str(ids[competition_id]), competition_id) for competition_id in competitions],
+        "competition-marks": [(str(ids[competition_id]), competition_id) for competition_id in competitions],
+        "participant": [(key, ids) for key, ids in profiles.items() if touched.intersection(ids)],
+        "rankings": [(f"{slug(year)}-{slug(age)}-{slug(style)}", (year, age, style)) for year, age, style in sorted(
+            groups, key=lambda group: tuple(str(part) for part in group))],
+    }
+
+
+def load_manifest(out_dir: Path) -> dict:
+    path = out_dir / MANIFEST
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return {"built": {}, "entries": {}}
+
+
+def save_manifest(out_dir: Path, manifest: dict) -> None:
+    tmp = out_dir / f"{MANIFEST}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, out_dir / MANIFEST)
+
+
+def build(db_file, out_dir, workers: int = 0, full: bool = False, kinds=KINDS) -> dict:
+    """
+    Build or update the snapshot directory.
+
+    Returns:
+        Dictionary with the number of rendered, changed and removed documents
+    """
+    out_dir = Path(out_dir)
+    for kind in kinds:
+        (out_dir / kind).mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    # Last competition id each kind was built up to
+    built = {kind: 0 if full else manifest["built"].get(kind, 0) for kind in kinds}
+
+    connection = connect(db_file)
+    try:
+        last_competition = connection.execute('SELECT COALESCE(MAX(id), 0) FROM "Competition"').fetchone()[0]
+        plans = {}
+        for kind in kinds:
+            if last_competition < built[kind]:
+                print(f"The database has fewer competitions than the last {kind} build, rebuilding {kind}.")
+                built[kind] = 0
+            if built[kind] not in plans:
+                plans[built[kind]] = plan(connection, built[kind])
+        work = {kind: plans[built[kind]][kind] for kind in kinds}
+        # Keys that still exist, whether or not they are re-rendered now
+        if 0 not in plans:
+            plans[0] = plan(connection, 0)
+        existing = {f"{kind}/{key}" for kind in kinds for key, _ in plans[0][kind]}
+    finally:
+        connection.close()
+
+    chunks = [
+        (kind, items[start:start + CHUNK_SIZE])
+        for kind in kinds
+        for items in [work[kind]]
+        for start in range(0, len(items), CHUNK_SIZE)
+    ]
+    written = []
+    if workers > 0:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(db_file,)) as executor:
+            futures = [executor.submit(render_chunk, str(out_dir), kind, items) for kind, items in chunks]
+            for future in futures:
+                written.extend(future.result())
+    else:
+        init_worker(db_file)
+        for kind, items in chunks:
+            written.extend(render_chunk(str(out_dir), kind, items))
+
+    changed, removed = 0, 0
+    previous_entries = dict(manifest["entries"])
+    for key in previous_entries:
+        kind = key.split("/", 1)[0]
+        # A kind built from scratch starts over; any build forgets keys that are gone
+        if kind in kinds and (built[kind] == 0 or key not in existing):
+            del manifest["entries"][key]
+    for key, file, digest in written:
+        previous = previous_entries.get(key)
+        if previous is None or previous["hash"] != digest:
+            changed += 1
+        manifest["entries"][key] = {"file": file, "hash": digest}
+    live = {entry["file"] for entry in manifest["entries"].values()}
+
+    for kind in kinds:
+        manifest["built"][kind] = last_competition
+    manifest["builtAt"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    save_manifest(out_dir, manifest)
+
+    # Drop documents no manifest entry points to any more (replaced versions, or
+    # the documents of keys that no longer exist)
+    for kind in kinds:
+        for path in (out_dir / kind).glob("*.json"):
+            if f"{kind}/{path.name}" not in live:
+                path.unlink()
+                removed += 1
+    return {"rendered": len(written), "changed": changed, "removed": removed, "entries": len(manifest["entries"])}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render content-hashed JSON snapshots of dev.db for the web routes.")
+    parser.add_argument("--db", default=DB_FILE, help=f"Path to the SQLite database (default: {DB_FILE}).")
+    parser.add_argument("-o", "--out", default=OUTPUT_DIR, help=f"Snapshot directory (default: {OUTPUT_DIR}).")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="Number of worker processes, 0 renders in this process (default: CPU count).")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-render everything instead of only what new competitions touched.")
+    parser.add_argument("-k", "--kind", choices=KINDS, nargs="+", default=list(KINDS),
+                        help="Only build these document kinds (default: all).")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.db):
+        print(f"Error: database '{args.db}' not found.")
+        exit(1)
+    start = time.perf_counter()
+    counts = build(args.db, args.out, args.workers, args.full, args.kind)
+    print(f"Rendered {counts['rendered']} documents ({counts['changed']} changed, {counts['removed']} old files removed), "
+          f"{counts['entries']} in the manifest, in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
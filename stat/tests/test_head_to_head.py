@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+
+import head_to_head
+
+
+def rows(conn):
+    return sorted(conn.execute(f'SELECT * FROM "{head_to_head.TABLE}"').fetchall())
+
+
+@pytest.fixture
+def half_loaded(db_file):
+    """Connection to a database whose later half of results arrives after the first update."""
+    conn = sqlite3.connect(db_file)
+    half = conn.execute('SELECT MAX("eventId") / 2 FROM "Result"').fetchone()[0]
+    conn.execute('CREATE TEMP TABLE "later" AS SELECT * FROM "Result" WHERE "eventId" > ?', (half,))
+    conn.execute('DELETE FROM "Result" WHERE "eventId" > ?', (half,))
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_first_update_is_not_a_rebuild(half_loaded):
+    counts = head_to_head.update(half_loaded)
+    assert counts["pairs"] > 0
+    assert not counts["rebuilt"]
+
+
+def test_incremental_update_matches_full_build(half_loaded):
+    head_to_head.update(half_loaded)
+    half_loaded.execute('INSERT INTO "Result" SELECT * FROM "later"')
+    half_loaded.commit()
+    counts = head_to_head.update(half_loaded)
+    assert counts["pairs"] > 0
+    assert not counts["rebuilt"]
+    incremental = rows(half_loaded)
+
+    head_to_head.update(half_loaded, full=True)
+    assert incremental == rows(half_loaded)
+    assert head_to_head.update(half_loaded)["pairs"] == 0
+
+
+def test_changed_results_rebuild_the_table(half_loaded):
+    head_to_head.update(half_loaded)
+    # A re-ingested competition: its results move to a new event id, another event is corrected
+    new_event = half_loaded.execute('SELECT MAX(id) + 1 FROM "Event"').fetchone()[0]
+    half_loaded.execute(
+        'INSERT INTO "Event" (id, name, "competitionId", "falseData") '
+        'SELECT ?, name, "competitionId", "falseData" FROM "Event" WHERE id = 3',
+        (new_event,),
+    )
+    half_loaded.execute('UPDATE "Result" SET "eventId" = ? WHERE "eventId" = 3', (new_event,))
+    half_loaded.execute('UPDATE "Result" SET "position" = \'1.\' WHERE "eventId" = 5 AND "position" = \'2.\'')
+    half_loaded.commit()
+
+    assert head_to_head.update(half_loaded)["rebuilt"]
+    incremental = rows(half_loaded)
+    head_to_head.update(half_loaded, full=True)
+    assert incremental == rows(half_loaded)
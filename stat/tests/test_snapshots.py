@@ -0,0 +1,78 @@
+import json
+import sqlite3
+
+import snapshots
+
+
+def delete_competitions(db_file, competition_ids):
+    """Remove competitions with everything recorded for them."""
+    conn = sqlite3.connect(db_file)
+    placeholders = ",".join("?" * len(competition_ids))
+    events = f'SELECT id FROM "Event" WHERE "competitionId" IN ({placeholders})'
+    rounds = f'SELECT id FROM "Round" WHERE "eventId" IN ({events})'
+    for statement in (
+        f'DELETE FROM "Mark" WHERE "roundId" IN ({rounds})',
+        f'DELETE FROM "_ParticipantToRound" WHERE "B" IN ({rounds})',
+        f'DELETE FROM "Round" WHERE "eventId" IN ({events})',
+        f'DELETE FROM "Result" WHERE "eventId" IN ({events})',
+        f'DELETE FROM "_EventToJudge" WHERE "A" IN ({events})',
+        f'DELETE FROM "Event" WHERE "competitionId" IN ({placeholders})',
+        f'DELETE FROM "Competition" WHERE id IN ({placeholders})',
+    ):
+        conn.execute(statement, list(competition_ids))
+    conn.commit()
+    conn.close()
+
+
+def manifest_files(out_dir):
+    manifest = json.loads((out_dir / snapshots.MANIFEST).read_text())
+    return manifest["entries"], {entry["file"] for entry in manifest["entries"].values()}
+
+
+def files_on_disk(out_dir):
+    return {f"{kind}/{path.name}" for kind in snapshots.KINDS for path in (out_dir / kind).glob("*.json")}
+
+
+def test_full_build_drops_keys_that_no_longer_exist(db_file, tmp_path):
+    out_dir = tmp_path / "snapshots"
+    snapshots.build(str(db_file), out_dir)
+    conn = sqlite3.connect(db_file)
+    conn.execute('UPDATE "Competition" SET "sourceId" = 99999 WHERE "sourceId" = 1')
+    conn.commit()
+    conn.close()
+
+    snapshots.build(str(db_file), out_dir, full=True)
+    entries, files = manifest_files(out_dir)
+    assert "competition-results/99999" in entries
+    assert "competition-results/1" not in entries
+    assert "competition-marks/1" not in entries
+    assert files_on_disk(out_dir) == files
+
+
+def test_incremental_build_drops_deleted_competitions(db_file, tmp_path):
+    out_dir = tmp_path / "snapshots"
+    snapshots.build(str(db_file), out_dir)
+    delete_competitions(db_file, [5])
+
+    counts = snapshots.build(str(db_file), out_dir)
+    entries, files = manifest_files(out_dir)
+    assert counts["removed"] >= 2
+    assert "competition-results/5" not in entries
+    assert "competition-marks/5" not in entries
+    assert files_on_disk(out_dir) == files
+
+
+def test_incremental_build_matches_full_build(synthetic_db, tmp_path):
+    partial = tmp_path / "partial.db"
+    partial.write_bytes(synthetic_db.read_bytes())
+    conn = sqlite3.connect(partial)
+    last = conn.execute('SELECT MAX(id) FROM "Competition"').fetchone()[0]
+    conn.close()
+    delete_competitions(partial, range(last // 2 + 1, last + 1))
+
+    incremental, full = tmp_path / "incremental", tmp_path / "full"
+    snapshots.build(str(partial), incremental)
+    snapshots.build(str(synthetic_db), incremental)
+    snapshots.build(str(synthetic_db), full)
+    assert manifest_files(incremental) == manifest_files(full)
+    assert files_on_disk(incremental) == files_on_disk(full)
@@ -0,0 +1,77 @@
+import csv
+import shutil
+import sqlite3
+
+import metrics as run_metrics
+import to_csv
+
+
+def read_tables(out_dir):
+    """Table name -> rows of every base CSV file of an export."""
+    tables = {}
+    for path in sorted(out_dir.glob("*.csv")):
+        with open(path, newline="") as f:
+            tables[path.stem] = list(csv.reader(f))
+    return tables
+
+
+def change_rows(db_file):
+    """Insert, update and delete rows of id tables and of a table without ids."""
+    conn = sqlite3.connect(db_file)
+    conn.execute('UPDATE "Result" SET "position" = \'1.\' WHERE id = 3')
+    conn.execute('DELETE FROM "Mark" WHERE id = 10')
+    conn.execute(
+        'INSERT INTO "Result" ("eventId", "participantId", "number", "section", "position") '
+        'SELECT "eventId", "participantId", "number", "section", "position" FROM "Result" WHERE id = 1'
+    )
+    conn.execute('DELETE FROM "_EventToJudge" WHERE rowid = (SELECT MIN(rowid) FROM "_EventToJudge")')
+    conn.commit()
+    conn.close()
+
+
+def test_incremental_and_merge_match_full_export(db_file, tmp_path):
+    incremental_dir, full_dir = tmp_path / "incremental", tmp_path / "full"
+    incremental_dir.mkdir()
+    full_dir.mkdir()
+    metrics = run_metrics.RunMetrics("to_csv")
+
+    conn = sqlite3.connect(db_file)
+    to_csv.export_incremental(conn, str(incremental_dir), metrics)
+    conn.close()
+    change_rows(db_file)
+    conn = sqlite3.connect(db_file)
+    written = to_csv.export_incremental(conn, str(incremental_dir), metrics)
+    conn.close()
+    assert written["Result"] == 2
+    assert written["Mark"] == 1
+    to_csv.merge_deltas(str(incremental_dir))
+
+    full_db = tmp_path / "full.db"
+    shutil.copy(db_file, full_db)
+    conn = sqlite3.connect(full_db)
+    to_csv.export_full(conn, str(full_dir), metrics)
+    conn.close()
+
+    full = read_tables(full_dir)
+    incremental = read_tables(incremental_dir)
+    assert "sqlite_sequence" in full
+    del full["sqlite_sequence"]
+    assert incremental == full
+
+
+def test_full_export_removes_the_change_log(db_file, tmp_path):
+    metrics = run_metrics.RunMetrics("to_csv")
+    conn = sqlite3.connect(db_file)
+    to_csv.export_incremental(conn, str(tmp_path), metrics)
+    to_csv.export_full(conn, str(tmp_path), metrics)
+    leftovers = conn.execute(
+        "SELECT name FROM sqlite_master WHERE name = ? OR (type = 'trigger' AND name LIKE ?)",
+        (to_csv.CHANGE_LOG, f"{to_csv.CHANGE_LOG}%"),
+    ).fetchall()
+    # A trigger left behind would fail here, writing to the dropped table
+    conn.execute('UPDATE "Result" SET "position" = \'1.\' WHERE id = 3')
+    conn.commit()
+    conn.close()
+    assert leftovers == []
+    assert not (tmp_path / to_csv.STATE_FILE).exists()
+    assert (tmp_path / "sqlite_sequence.csv").exists()
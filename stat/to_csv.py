@@ -1,46 +1,349 @@
 import sqlite3
 import csv
 import os
+import argparse
+import hashlib
+import json
+import shutil
+from pathlib import Path
+
+import scrape_path  # noqa: F401
+import metrics as run_metrics
+from db_tables import data_tables
 
 # Define the database file and the output directory
 db_file = 'dev.db'
 output_dir = 'csv'
 
-# Create the output directory if it doesn't exist
-os.makedirs(output_dir, exist_ok=True)
+# --- Incremental export ---
+# Tables with an AUTOINCREMENT id are exported past the high-water mark kept in
+# sqlite_sequence; updates and deletes of older rows are captured by triggers
+# in the ChangeLog table. Each run writes csv/deltas/<run>/<table>.csv with an
+# extra _op column (upsert/delete), other tables are rewritten only when their
+# content changed. merge_deltas() folds pending deltas into csv/<table>.csv.
+CHANGE_LOG = "ChangeLog"
+STATE_FILE = "_export_state.json"
+DELTA_DIR = "deltas"
+OP_COLUMN = "_op"
 
-# Connect to the SQLite database
-conn = sqlite3.connect(db_file)
-cursor = conn.cursor()
 
-# Get a list of all tables in the database
-cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-tables = cursor.fetchall()
+def export_table(cursor, table_name, path):
+    """Write a whole table to a CSV file, return the number of rows."""
+    cursor.execute(f'SELECT * FROM "{table_name}"')
+    column_headers = [description[0] for description in cursor.description]
+    count = 0
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', newline='') as csv_file:
+        csv_writer = csv.writer(csv_file)
+        csv_writer.writerow(column_headers)  # Write headers
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            csv_writer.writerows(rows)          # Write data rows
+            count += len(rows)
+    os.replace(tmp_path, path)
+    return count
 
-# Loop through each table
-for table_name_tuple in tables:
-    table_name = table_name_tuple[0]
-    print(f"Processing table: {table_name}")
 
-    # Query all data from the table
-    cursor.execute(f"SELECT * FROM {table_name}")
-    rows = cursor.fetchall()
+def list_tables(cursor):
+    # Same tables replica_sync.py ships: no sqlite_sequence, no search index or its shadow tables
+    return [name for name, _ in data_tables(cursor.connection) if name != CHANGE_LOG]
 
-    # Get column headers
-    column_headers = [description[0] for description in cursor.description]
 
-    # Define the CSV file path
-    csv_file_path = os.path.join(output_dir, f"{table_name}.csv")
+def sequences(cursor):
+    """High-water marks of the AUTOINCREMENT tables."""
+    cursor.execute("SELECT name, seq FROM sqlite_sequence")
+    return dict(cursor.fetchall())
 
-    # Write the data to a CSV file
-    with open(csv_file_path, 'w', newline='') as csv_file:
-        csv_writer = csv.writer(csv_file)
-        csv_writer.writerow(column_headers)  # Write headers
-        csv_writer.writerows(rows)          # Write data rows
 
-    print(f"Table {table_name} successfully written to {csv_file_path}")
+def install_change_log(conn, tables):
+    """Create the ChangeLog table and the update/delete triggers of every id table."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS "{CHANGE_LOG}" (
+            "id" INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            "tableName" TEXT NOT NULL,
+            "rowId" INTEGER NOT NULL,
+            "op" TEXT NOT NULL,
+            "changedAt" TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    for table_name in tables:
+        for op, row in (("update", "NEW"), ("delete", "OLD")):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS "{CHANGE_LOG}_{table_name}_{op}"
+                AFTER {op.upper()} ON "{table_name}"
+                BEGIN
+                    INSERT INTO "{CHANGE_LOG}" ("tableName", "rowId", "op") VALUES ('{table_name}', {row}.id, '{op}');
+                END
+            """)
+    conn.commit()
+
+
+def remove_change_log(conn):
+    """Drop the ChangeLog table and its triggers, so nothing is logged until the next incremental run."""
+    triggers = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")]
+    for name in triggers:
+        if name.startswith(f"{CHANGE_LOG}_"):
+            conn.execute(f'DROP TRIGGER "{name}"')
+    conn.execute(f'DROP TABLE IF EXISTS "{CHANGE_LOG}"')
+    conn.commit()
+
+
+def table_hash(cursor, table_name):
+    digest = hashlib.sha256()
+    cursor.execute(f'SELECT * FROM "{table_name}"')
+    while True:
+        rows = cursor.fetchmany(10000)
+        if not rows:
+            break
+        digest.update(repr(rows).encode())
+    return digest.hexdigest()
+
+
+def load_state(out_dir):
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(out_dir, state):
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def pending_deltas(out_dir):
+    delta_root = Path(out_dir) / DELTA_DIR
+    if not delta_root.exists():
+        return []
+    return sorted(path for path in delta_root.iterdir() if path.is_dir())
+
+
+def drop_deltas(out_dir, table_name):
+    """Forget pending deltas of a table whose base file was just rewritten."""
+    for delta in pending_deltas(out_dir):
+        path = delta / f"{table_name}.csv"
+        if path.exists():
+            path.unlink()
+
+
+def export_full(conn, out_dir, metrics):
+    """
+    Export every table to <out_dir>/<table>.csv.
+
+    Replaces whatever an incremental run left behind: the state file, pending
+    deltas and the change log with its triggers.
+
+    Returns:
+        Dictionary of table -> number of rows written
+    """
+    cursor = conn.cursor()
+    # A full export stops the change log, which only incremental runs empty
+    remove_change_log(conn)
+    # and also keeps the AUTOINCREMENT counters
+    tables = list_tables(cursor)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone():
+        tables.append("sqlite_sequence")
+    written = {}
+    # Loop through each table
+    for table_name in tables:
+        print(f"Processing table: {table_name}")
+        metrics.checkpoint(table_name)
+        csv_file_path = os.path.join(out_dir, f"{table_name}.csv")
+        written[table_name] = export_table(cursor, table_name, csv_file_path)
+        print(f"Table {table_name} successfully written to {csv_file_path}")
+    if os.path.exists(os.path.join(out_dir, STATE_FILE)):
+        os.remove(os.path.join(out_dir, STATE_FILE))
+    for delta in pending_deltas(out_dir):
+        shutil.rmtree(delta)
+    return written
+
+
+def export_incremental(conn, out_dir, metrics):
+    """
+    Export only what changed since the last run.
+
+    The first run (no state file) exports everything, installs the change log
+    and records the high-water marks.
+
+    Returns:
+        Dictionary of table -> number of rows written
+    """
+    cursor = conn.cursor()
+    tables = list_tables(cursor)
+    state = load_state(out_dir)
+    seqs = sequences(cursor)
+    id_tables = [name for name in tables if name in seqs]
+    written = {}
+
+    if state is None:
+        install_change_log(conn, id_tables)
+        last_change = conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM "{CHANGE_LOG}"').fetchone()[0]
+        state = {"run": 0, "changeId": last_change, "seq": {}, "hash": {}}
+        for table_name in tables:
+            metrics.checkpoint(table_name)
+            written[table_name] = export_table(cursor, table_name, os.path.join(out_dir, f"{table_name}.csv"))
+            if table_name in seqs:
+                state["seq"][table_name] = seqs[table_name]
+            else:
+                state["hash"][table_name] = table_hash(cursor, table_name)
+            print(f"Table {table_name} exported in full ({written[table_name]} rows)")
+        save_state(out_dir, state)
+        return written
+
+    # Tables created since the last run get their triggers now
+    install_change_log(conn, id_tables)
+    last_change = conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM "{CHANGE_LOG}"').fetchone()[0]
+    changes = {}
+    for table_name, row_id, op in conn.execute(
+        f'SELECT "tableName", "rowId", "op" FROM "{CHANGE_LOG}" WHERE id > ? AND id <= ? ORDER BY id',
+        (state["changeId"], last_change),
+    ):
+        changes.setdefault(table_name, set()).add(row_id)
+
+    run = state["run"] + 1
+    delta_dir = os.path.join(out_dir, DELTA_DIR, f"{run:06d}")
+    for table_name in tables:
+        metrics.checkpoint(table_name)
+        base_path = os.path.join(out_dir, f"{table_name}.csv")
+
+        if table_name not in seqs:
+            digest = table_hash(cursor, table_name)
+            if digest != state["hash"].get(table_name):
+                written[table_name] = export_table(cursor, table_name, base_path)
+                drop_deltas(out_dir, table_name)
+                state["hash"][table_name] = digest
+                print(f"Table {table_name} changed, rewritten ({written[table_name]} rows)")
+            continue
+
+        last_seq = state["seq"].get(table_name, 0)
+        if seqs[table_name] < last_seq or not os.path.exists(base_path):
+            # The table was emptied and refilled (e.g. dancers.py --resolve), start over
+            written[table_name] = export_table(cursor, table_name, base_path)
+            drop_deltas(out_dir, table_name)
+            state["seq"][table_name] = seqs[table_name]
+            print(f"Table {table_name} was rebuilt, rewritten ({written[table_name]} rows)")
+            continue
+
+        # New rows past the high-water mark
+        cursor.execute(f'SELECT * FROM "{table_name}" WHERE id > ? AND id <= ? ORDER BY id',
+                       (last_seq, seqs[table_name]))
+        column_headers = [description[0] for description in cursor.description]
+        rows = [("upsert", *row) for row in cursor.fetchall()]
+
+        # Updated or deleted rows the consumers already have
+        changed_ids = sorted(row_id for row_id in changes.get(table_name, ()) if row_id <= last_seq)
+        for start in range(0, len(changed_ids), 500):
+            chunk = changed_ids[start:start + 500]
+            cursor.execute(f'SELECT * FROM "{table_name}" WHERE id IN ({",".join("?" * len(chunk))})', chunk)
+            current = {row[0]: row for row in cursor.fetchall()}
+            for row_id in chunk:
+                if row_id in current:
+                    rows.append(("upsert", *current[row_id]))
+                else:
+                    rows.append(("delete", row_id, *[""] * (len(column_headers) - 1)))
+
+        state["seq"][table_name] = seqs[table_name]
+        if not rows:
+            continue
+        os.makedirs(delta_dir, exist_ok=True)
+        with open(os.path.join(delta_dir, f"{table_name}.csv"), 'w', newline='') as csv_file:
+            csv_writer = csv.writer(csv_file)
+            csv_writer.writerow([OP_COLUMN, *column_headers])
+            csv_writer.writerows(rows)
+        written[table_name] = len(rows)
+        print(f"Table {table_name}: {len(rows)} new or changed rows")
+
+    # The log is only needed until the changes are exported
+    conn.execute(f'DELETE FROM "{CHANGE_LOG}" WHERE id <= ?', (last_change,))
+    conn.commit()
+    state["run"] = run
+    state["changeId"] = last_change
+    save_state(out_dir, state)
+    return written
+
+
+def merge_deltas(out_dir):
+    """
+    Fold every pending delta into csv/<table>.csv and remove the deltas.
+
+    Only rows named in a delta are touched: the base file is streamed once,
+    changed rows are replaced, deleted ones dropped and new ones appended.
+
+    Returns:
+        Dictionary of table -> number of delta rows applied
+    """
+    deltas = pending_deltas(out_dir)
+    tables = sorted({path.stem for delta in deltas for path in delta.glob("*.csv")})
+    applied = {}
+    for table_name in tables:
+        changes = {}  # id -> row, or None when deleted; later deltas win
+        for delta in deltas:
+            path = delta / f"{table_name}.csv"
+            if not path.exists():
+                continue
+            with open(path, newline='') as f:
+                reader = csv.reader(f)
+                next(reader)
+                for op, *row in reader:
+                    changes[row[0]] = row if op == "upsert" else None
+        applied[table_name] = len(changes)
+
+        base_path = os.path.join(out_dir, f"{table_name}.csv")
+        with open(base_path, newline='') as base, open(f"{base_path}.tmp", 'w', newline='') as out:
+            reader, writer = csv.reader(base), csv.writer(out)
+            writer.writerow(next(reader))
+            for row in reader:
+                if row[0] in changes:
+                    row = changes.pop(row[0])
+                    if row is None:
+                        continue
+                writer.writerow(row)
+            writer.writerows(row for _, row in sorted(changes.items(), key=lambda item: int(item[0])) if row is not None)
+        os.replace(f"{base_path}.tmp", base_path)
+        print(f"Merged {applied[table_name]} changed rows into {base_path}")
+
+    for delta in deltas:
+        shutil.rmtree(delta)
+    return applied
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export every table of dev.db to csv/<table>.csv.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only export rows added or changed since the last incremental run, as delta files.")
+    parser.add_argument("--merge", action="store_true",
+                        help="Fold pending delta files into csv/<table>.csv (after exporting, with --incremental).")
+    run_metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+    metrics = run_metrics.instrument_script("to_csv", args.report, args.profile)
+
+    # Create the output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+
+    if args.incremental or not args.merge:
+        # Connect to the SQLite database
+        conn = sqlite3.connect(db_file)
+        metrics.trace_connection(conn)
+        if args.incremental:
+            for table_name, count in export_incremental(conn, output_dir, metrics).items():
+                metrics.add_rows(table_name, count)
+        else:
+            for table_name, count in export_full(conn, output_dir, metrics).items():
+                metrics.add_rows(table_name, count)
+        # Close the database connection
+        conn.close()
+
+    if args.merge:
+        metrics.checkpoint("merge")
+        merge_deltas(output_dir)
+
+    print("All tables have been converted to CSV files.")
 
-# Close the database connection
-conn.close()
 
-print("All tables have been converted to CSV files.")
+if __name__ == "__main__":
+    main()